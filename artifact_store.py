@@ -0,0 +1,178 @@
+import logging
+import os
+import re
+import shutil
+import threading
+import uuid
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 多worker/多主机部署时，各进程之间共享的状态都经过产物存储：
+# 上传的流程图、渲染的SVG、报告JSON、任务记录、增量分析基线、fast-then-upgrade 的升级结果。
+# 以下状态按主机（或按进程）保存，不随产物存储共享：
+#   运行历史 RUN_HISTORY_PATH（SQLite，见 run_history.py）、LLM响应缓存 LLM_CACHE_PATH（见 llm_cache.py）、
+#   同一份DOT的渲染去重（进程内，见 render_service.py）、metagpt 日志 logs/（见 backend/main.py 的 LOG_PER_WORKER）。
+
+# 产物存储配置（可通过环境变量覆盖）
+# 存储类型，见 ARTIFACT_STORES；多worker/多副本部署时各进程需指向同一个存储
+ARTIFACT_STORE = os.getenv("ARTIFACT_STORE", "local")
+# local 存储的目录（兼容原来的 RENDER_DIR）；多台主机时应为共享卷。
+# 存储中有用户上传的流程图和任务记录，不能放在 /static 公开的目录下，产物只通过 /artifacts/{name} 发送
+ARTIFACT_STORE_DIR = Path(os.getenv("ARTIFACT_STORE_DIR", os.getenv("RENDER_DIR", ".cache/artifacts")))
+
+# 过期产物的清理间隔（秒），服务启动时先清理一次，见 prune_artifacts
+ARTIFACT_PRUNE_INTERVAL = int(os.getenv("ARTIFACT_PRUNE_INTERVAL", "3600"))
+
+# 产物名只允许字母数字、下划线、点和横线，不能包含路径
+_NAME_RE = re.compile(r'^[A-Za-z0-9_][A-Za-z0-9_.-]{0,199}$')
+
+
+class ArtifactStore:
+    """
+    分析产物（SVG、报告JSON、上传的流程图、任务记录）的存储。
+    产物按名称存取，写入是原子的：并发写入同名产物时读方只会看到完整内容。
+    """
+
+    def put(self, name: str, data: bytes):
+        raise NotImplementedError
+
+    def put_file(self, name: str, path: Path):
+        """写入本地文件的内容；子类可以用更省的方式（如硬链接）实现"""
+        self.put(name, Path(path).read_bytes())
+
+    def get(self, name: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def exists(self, name: str) -> bool:
+        return self.get(name) is not None
+
+    def local_path(self, name: str) -> Optional[Path]:
+        """产物在本机上的文件路径（可直接发送），远程存储返回 None"""
+        return None
+
+    def ref(self, name: str) -> str:
+        """报告中记录的产物引用：本地存储为文件路径，其余为产物名"""
+        return name
+
+    def prune(self, prefix: str, keep: int):
+        """只保留名称以 prefix 开头的最新 keep 个产物（连同其派生产物）；远程存储由其自身的过期规则清理，默认不做处理"""
+
+
+def check_name(name: str) -> str:
+    if not _NAME_RE.match(name or "") or ".." in name:
+        raise ValueError(f"Invalid artifact name: {name!r}")
+    return name
+
+
+class LocalArtifactStore(ArtifactStore):
+    """本地目录中的产物存储；同一主机上的多个worker（或挂载同一共享卷的多台主机）共用一个目录"""
+
+    def __init__(self, root: Path = ARTIFACT_STORE_DIR):
+        self.root = Path(root)
+
+    def _path(self, name: str) -> Path:
+        return self.root / check_name(name)
+
+    def put(self, name: str, data: bytes):
+        path = self._path(name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 先写临时文件再原子替换，其他进程不会读到半个文件
+        tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def put_file(self, name: str, path: Path):
+        target = self._path(name)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = target.with_name(f".{target.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            try:
+                # 同一文件系统上用硬链接，不复制内容
+                os.link(path, tmp_path)
+            except OSError:
+                shutil.copyfile(path, tmp_path)
+            os.replace(tmp_path, target)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+
+    def get(self, name: str) -> Optional[bytes]:
+        try:
+            return self._path(name).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def exists(self, name: str) -> bool:
+        return self._path(name).is_file()
+
+    def local_path(self, name: str) -> Optional[Path]:
+        path = self._path(name)
+        return path if path.is_file() else None
+
+    def ref(self, name: str) -> str:
+        return str(self._path(name))
+
+    def prune(self, prefix: str, keep: int):
+        # 派生产物（如预压缩的 report_x.json.gz）与原产物按第一个 . 之前的名称归为一组，一起计数和删除
+        groups: Dict[str, List[Path]] = {}
+        mtimes: Dict[str, float] = {}
+        for path in self.root.glob(f"{check_name(prefix)}*"):
+            try:
+                mtime = path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            key = path.name.split(".", 1)[0]
+            groups.setdefault(key, []).append(path)
+            mtimes[key] = max(mtimes.get(key, mtime), mtime)
+        expired = sorted(groups, key=mtimes.get)[:max(len(groups) - keep, 0)]
+        for key in expired:
+            for path in groups[key]:
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    logger.error(f"删除过期产物失败: {str(e)}")
+
+
+# 存储类型 → 工厂函数；其他实现（如对象存储）通过 register_artifact_store 注册后由 ARTIFACT_STORE 选择
+ARTIFACT_STORES: Dict[str, Callable[[], ArtifactStore]] = {
+    "local": lambda: LocalArtifactStore(ARTIFACT_STORE_DIR)
+}
+
+_store: Optional[ArtifactStore] = None
+_lock = threading.Lock()
+
+
+def register_artifact_store(kind: str, factory: Callable[[], ArtifactStore]):
+    ARTIFACT_STORES[kind] = factory
+
+
+def prune_artifacts(retention: Dict[str, int], store: Optional[ArtifactStore] = None):
+    """
+    按名称前缀清理过期产物，retention 为 前缀 → 保留的最新产物数。
+    会遍历整个存储目录，由服务启动时和定期清理任务调用，不在每次分析中调用；阻塞调用。
+    """
+    store = store or get_artifact_store()
+    for prefix, keep in retention.items():
+        try:
+            store.prune(prefix, keep)
+        except (OSError, ValueError) as e:
+            logger.error(f"清理产物 {prefix}* 失败: {str(e)}")
+
+
+def get_artifact_store() -> ArtifactStore:
+    """获取进程级共享的产物存储（首次使用时按 ARTIFACT_STORE 创建）"""
+    global _store
+    with _lock:
+        if _store is None:
+            if ARTIFACT_STORE not in ARTIFACT_STORES:
+                raise ValueError(f"Unknown ARTIFACT_STORE: {ARTIFACT_STORE}, expected one of {list(ARTIFACT_STORES)}")
+            _store = ARTIFACT_STORES[ARTIFACT_STORE]()
+        return _store
@@ -0,0 +1,170 @@
+# backend/artifacts.py
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+from pathlib import Path
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, Request
+from fastapi.responses import FileResponse, Response
+
+from artifact_store import ArtifactStore, get_artifact_store
+
+try:
+    import brotli
+except ImportError:  # 未安装 brotli 时只提供 gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# 报告产物配置（可通过环境变量覆盖）
+# 返回给前端的URL前缀；为空时返回以 / 开头的相对地址
+ARTIFACT_BASE_URL = os.getenv("ARTIFACT_BASE_URL", "http://localhost:8000").rstrip("/")
+# 小于该字节数的产物不压缩
+ARTIFACT_MIN_COMPRESS_BYTES = 1024
+# 压缩级别：每个产物只压缩一次，但都在请求路径上（首次请求时），取压缩率与CPU耗时的折中
+ARTIFACT_GZIP_LEVEL = int(os.getenv("ARTIFACT_GZIP_LEVEL", "6"))
+ARTIFACT_BROTLI_QUALITY = int(os.getenv("ARTIFACT_BROTLI_QUALITY", "5"))
+ARTIFACT_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REPORT_ARTIFACT_PREFIX = "report_"
+
+# 产物文件名：前缀 + 32位内容哈希 + 扩展名，哈希同时用作 ETag
+_ARTIFACT_NAME_RE = re.compile(r'^(?:bpmn|report)_([0-9a-f]{32})\.(svg|json)$')
+_MEDIA_TYPES = {"svg": "image/svg+xml", "json": "application/json"}
+# (Accept-Encoding 中的名称, 预压缩文件后缀)，按优先级排列
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def artifact_url(name: str) -> str:
+    return f"{ARTIFACT_BASE_URL}/artifacts/{name}"
+
+
+def diagram_url(diagram_svg: Optional[str], store: Optional[ArtifactStore] = None) -> str:
+    """
+    渲染结果的访问地址：产物存储中按内容哈希命名的SVG走 /artifacts，static 目录下的文件沿用静态地址，
+    其余（如产物存储的本地路径）不对外公开，返回默认图。阻塞调用（会检查产物是否存在）。
+    """
+    default = f"{ARTIFACT_BASE_URL}/static/default_diagram.svg"
+    if not diagram_svg:
+        return default
+    name = Path(diagram_svg).name
+    if _ARTIFACT_NAME_RE.match(name) and (store or get_artifact_store()).exists(name):
+        return artifact_url(name)
+    if Path(diagram_svg).parts[:1] == ("static",) and ".." not in Path(diagram_svg).parts:
+        return f"{ARTIFACT_BASE_URL}/{diagram_svg}"
+    return default
+
+
+# 内容太小、不需要压缩的产物名（产物内容不变，记住后不必再读取）
+_small_artifacts = set()
+
+
+def _compress(store: ArtifactStore, name: str, data: Optional[bytes] = None):
+    """为产物生成预压缩版本（.gz/.br），之后的请求直接发送压缩结果，不再消耗CPU"""
+    codecs = [(".gz", lambda raw: gzip.compress(raw, compresslevel=ARTIFACT_GZIP_LEVEL, mtime=0))]
+    if brotli is not None:
+        codecs.append((".br", lambda raw: brotli.compress(raw, quality=ARTIFACT_BROTLI_QUALITY)))
+    missing = [(suffix, codec) for suffix, codec in codecs if not store.exists(name + suffix)]
+    if not missing or name in _small_artifacts:
+        return
+    data = store.get(name) if data is None else data
+    if data is None:
+        return
+    if len(data) < ARTIFACT_MIN_COMPRESS_BYTES:
+        if len(_small_artifacts) >= 10000:
+            _small_artifacts.clear()
+        _small_artifacts.add(name)
+        return
+    for suffix, codec in missing:
+        store.put(name + suffix, codec(data))
+
+
+def publish_report(report: dict, store: Optional[ArtifactStore] = None) -> str:
+    """
+    把报告JSON写为按内容哈希命名的产物（相同内容只写一次），返回产物名。
+    压缩版本在第一次带 Accept-Encoding 的请求时才生成（见 artifact_response），大多数报告不会被下载。
+    阻塞调用，异步代码中通过 asyncio.to_thread 调用。
+    """
+    store = store or get_artifact_store()
+    data = json.dumps(report, ensure_ascii=False, sort_keys=True, default=str).encode("utf-8")
+    name = f"{REPORT_ARTIFACT_PREFIX}{hashlib.sha256(data).hexdigest()[:32]}.json"
+    if not store.exists(name):
+        store.put(name, data)
+    return name
+
+
+def _etag_matches(if_none_match: str, digest: str) -> bool:
+    """If-None-Match 中任一ETag（忽略弱标记和编码后缀）与产物哈希相同即视为命中"""
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag.strip('"').split("-", 1)[0] == digest:
+            return True
+    return False
+
+
+def _accepts(accept_encoding: str, encoding: str) -> bool:
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        if name.strip().lower() in (encoding, "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+    return False
+
+
+async def artifact_response(name: str, request: Request, store: Optional[ArtifactStore] = None) -> Response:
+    """
+    发送按内容哈希命名的产物：长期缓存（immutable），支持 If-None-Match 条件请求（304），
+    按 Accept-Encoding 发送预压缩的 br/gzip 文件（首次请求时生成）。
+    """
+    match = _ARTIFACT_NAME_RE.match(name)
+    if not match:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    digest, extension = match.groups()
+    store = store or get_artifact_store()
+    if not await asyncio.to_thread(store.exists, name):
+        raise HTTPException(status_code=404, detail="Artifact not found")
+
+    headers = {"Cache-Control": ARTIFACT_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if _etag_matches(request.headers.get("if-none-match", ""), digest):
+        return Response(status_code=304, headers={**headers, "ETag": f'"{digest}"'})
+
+    encoding = await asyncio.to_thread(_pick_encoding, store, name, request.headers.get("accept-encoding", ""))
+    if encoding is not None:
+        encoding, suffix = encoding
+        return await _send(store, name + suffix, _MEDIA_TYPES[extension],
+                           {**headers, "ETag": f'"{digest}-{encoding}"', "Content-Encoding": encoding})
+    return await _send(store, name, _MEDIA_TYPES[extension], {**headers, "ETag": f'"{digest}"'})
+
+
+def _pick_encoding(store: ArtifactStore, name: str, accept_encoding: str) -> Optional[Tuple[str, str]]:
+    """按 Accept-Encoding 选出要发送的预压缩版本 (编码, 后缀)，必要时先生成；阻塞调用"""
+    accepted = [(encoding, suffix) for encoding, suffix in _ENCODINGS if _accepts(accept_encoding, encoding)]
+    if not accepted:
+        return None
+    try:
+        _compress(store, name)
+    except OSError as e:
+        logger.error(f"产物压缩失败: {str(e)}")
+    for encoding, suffix in accepted:
+        if store.exists(name + suffix):
+            return encoding, suffix
+    return None
+
+
+async def _send(store: ArtifactStore, name: str, media_type: str, headers: dict) -> Response:
+    """本地存储直接发送文件，其他存储读出内容后返回"""
+    path = await asyncio.to_thread(store.local_path, name)
+    if path is not None:
+        return FileResponse(path, media_type=media_type, headers=headers)
+    data = await asyncio.to_thread(store.get, name)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    return Response(content=data, media_type=media_type, headers=headers)
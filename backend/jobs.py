@@ -0,0 +1,153 @@
+# backend/jobs.py
+
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """任务队列已满"""
+
+
+class Job:
+    def __init__(self, payload: Any):
+        self.id = uuid.uuid4().hex
+        self.payload = payload
+        self.status = JOB_QUEUED
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at
+        }
+
+    def to_record(self) -> dict:
+        """持久化用的任务记录（含结果）"""
+        return {**self.to_dict(), "result": self.result}
+
+
+class JobQueue:
+    """
+    进程内的分析任务队列。
+    固定数量的worker从队列取任务执行，队列深度超过上限时拒绝新任务，
+    以此限制同时运行的 Environment 数量和LLM并发。
+    on_update 在任务提交和每次状态变化后被调用（如把任务记录写入共享存储，供其他worker查询）：
+    状态变化时在事件循环中取下任务记录的快照，由后台写入任务按顺序在线程中调用 on_update，不阻塞事件循环。
+    """
+
+    def __init__(self, runner: Callable[[Any], Awaitable[dict]], workers: int = 2,
+                 max_depth: int = 20, max_finished: int = 500,
+                 on_update: Optional[Callable[[dict], None]] = None):
+        self.runner = runner
+        self.on_update = on_update
+        self.workers = workers
+        self.max_depth = max_depth
+        self.max_finished = max_finished
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._updates: Optional[asyncio.Queue] = None
+        self._writer: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_depth)
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        if self.on_update is not None:
+            self._updates = asyncio.Queue()
+            self._writer = asyncio.create_task(self._write_updates())
+        logger.info(f"任务队列已启动: workers={self.workers}, max_depth={self.max_depth}")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._writer is not None:
+            # 先写完已排队的任务记录（包括刚被取消的任务）
+            await self._updates.join()
+            self._writer.cancel()
+            await asyncio.gather(self._writer, return_exceptions=True)
+            self._writer = None
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def submit(self, payload: Any) -> Job:
+        """提交任务；队列已满时抛出 QueueFullError"""
+        if self._queue is None:
+            raise RuntimeError("JobQueue not started")
+        job = Job(payload)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"Queue depth limit {self.max_depth} reached")
+        self.jobs[job.id] = job
+        self._prune()
+        self._notify(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    def _notify(self, job: Job):
+        """取下任务记录的快照交给后台写入任务，任务记录按状态变化的顺序写入"""
+        if self._updates is not None:
+            self._updates.put_nowait(job.to_record())
+
+    async def _write_updates(self):
+        while True:
+            record = await self._updates.get()
+            try:
+                await asyncio.to_thread(self.on_update, record)
+            except Exception as e:
+                logger.error(f"任务 {record['job_id']} 状态回调失败: {str(e)}")
+            finally:
+                self._updates.task_done()
+
+    def _prune(self):
+        """只保留最近 max_finished 个已结束的任务"""
+        finished = [j.id for j in self.jobs.values() if j.status in (JOB_DONE, JOB_FAILED)]
+        for job_id in finished[:max(len(finished) - self.max_finished, 0)]:
+            self.jobs.pop(job_id, None)
+
+    async def _worker(self, index: int):
+        while True:
+            job = await self._queue.get()
+            job.status = JOB_RUNNING
+            job.started_at = time.time()
+            self._notify(job)
+            try:
+                job.result = await self.runner(job.payload)
+                job.status = JOB_DONE
+            except asyncio.CancelledError:
+                job.status = JOB_FAILED
+                job.error = "cancelled"
+                raise
+            except Exception as e:
+                logger.error(f"任务 {job.id} 失败: {str(e)}", exc_info=True)
+                job.status = JOB_FAILED
+                job.error = getattr(e, "detail", None) or str(e)
+            finally:
+                job.finished_at = time.time()
+                self._queue.task_done()
+            self._notify(job)
@@ -1,16 +1,35 @@
 # backend/main.py
 
 from team import analyze_bpmn_flow
-from fastapi import FastAPI, HTTPException, File, UploadFile
+from llm_cache import get_llm_cache
+from llm_scheduler import get_llm_scheduler
+from corrector_strategy import CORRECTOR_STRATEGIES
+from backend.jobs import JobQueue, QueueFullError, JOB_DONE, JOB_FAILED
+from backend.uploads import UploadSizeLimitMiddleware, UploadTooLargeError, store_upload
+from metrics import ANALYZE_COALESCED, HTTP_SECONDS, JOB_QUEUE_DEPTH, render_prometheus
+from role_pool import get_role_pool, warm_from_env
+from run_history import HISTORY_MAX_PAGE_SIZE, HISTORY_MAX_RUNS, STATUS_COMPLETED, get_run_history, input_hash
+from backend.singleflight import SingleFlight
+from backend.artifacts import REPORT_ARTIFACT_PREFIX, artifact_response, artifact_url, diagram_url, publish_report
+from artifact_store import ARTIFACT_PRUNE_INTERVAL, get_artifact_store, prune_artifacts
+from incremental import BASELINE_ARTIFACT_PREFIX, BASELINE_KEEP
+from render_service import SVG_ARTIFACT_PREFIX
+from workspace import UPLOAD_ARTIFACT_PREFIX, input_available, resolve_input, upload_artifact_name
+from fastapi import FastAPI, HTTPException, File, UploadFile, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 import sys
 import os
+import json
+import asyncio
+import hashlib
+from typing import Callable, Dict, Optional
 from pathlib import Path
 import logging
 import base64
+import time
 from fastapi.staticfiles import StaticFiles
-import aiofiles
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -19,13 +38,14 @@ logger = logging.getLogger(__name__)
 
 
 app = FastAPI()
-UPLOAD_DIR = Path("/tmp/uploads")
-REPORTS_DIR = Path("static/reports")
-# 新增static目录创建
+# 上传文件先保存在本机，再发布到各worker/主机共用的产物存储
+UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "/tmp/uploads"))
+# 为 1 时每个worker进程写自己的 metagpt 日志文件（logs/worker-<pid>_<日期>.txt），多worker时不互相交错
+LOG_PER_WORKER = os.getenv("LOG_PER_WORKER", "1") == "1"
+# 新增static目录创建（只放前端用的静态文件，分析产物在产物存储中，经 /artifacts 发送）
 STATIC_DIR = Path("static")
 STATIC_DIR.mkdir(exist_ok=True, parents=True)
 UPLOAD_DIR.mkdir(exist_ok=True, parents=True)
-REPORTS_DIR.mkdir(exist_ok=True, parents=True)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 class BPMNAnalysisRequest(BaseModel):
@@ -35,6 +55,13 @@ class BPMNAnalysisRequest(BaseModel):
     text_checker_model: str
     corrector_model: str
     fast_corrector_model: str
+    use_cache: bool = True  # 为False时本次分析绕过LLM响应缓存
+    corrector_strategy: Optional[str] = None  # race / fast-then-upgrade / single，未指定时为 race
+    upgrade_deadline: float = 30.0  # fast-then-upgrade 下等待综合修正结果的秒数
+    baseline_run_id: Optional[str] = None  # 上一版本的 run_id，指定时进行增量分析
+    adaptive: bool = False  # 为True时按流程图大小选择模型（显式指定的修正策略保留），默认严格按请求中的模型执行
+    max_latency: Optional[float] = None  # 时延预算（秒）
+    max_cost: Optional[float] = None  # 费用预算（美元）
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -43,65 +70,170 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["Content-Type", "Authorization"]
 )
+# 上传请求体在解析前按字节数限制（不依赖 Content-Length）
+app.add_middleware(UploadSizeLimitMiddleware)
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        # 使用路由模板作为标签（如 /jobs/{job_id}），避免标签基数随ID增长
+        route = request.scope.get("route")
+        HTTP_SECONDS.observe(time.perf_counter() - started, method=request.method,
+                             path=getattr(route, "path", "unmatched"), status=str(status))
 
 @app.post("/api/upload")
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(request: Request, file: UploadFile = File(...)):
+    """
+    分块流式保存上传文件，按内容哈希命名（不同用户上传同名文件不会互相覆盖），
+    相同内容重复上传时返回已有路径。超过 UPLOAD_MAX_BYTES 时返回413
+    （请求体在解析前由 UploadSizeLimitMiddleware 限制，这里按文件内容精确检查）。
+    """
     try:
         # 添加空文件名检查
         if not file.filename:
             raise HTTPException(status_code=400, detail="Missing filename")
-            
-        file_path = UPLOAD_DIR / file.filename
-        
-        # 确保上传目录存在
-        file_path.parent.mkdir(parents=True, exist_ok=True)
-        
-        # 使用异步文件写入
-        async with aiofiles.open(file_path, "wb") as buffer:
-            await buffer.write(await file.read())
-            
-        # 验证文件是否实际存在
-        if not file_path.exists():
-            raise HTTPException(status_code=500, detail="File save failed")
-        else:
-            print(f"File saved to: {file_path.absolute()}")
-            
-        return {"path": str(file_path.absolute())}
+
+        file_path, sha256, size, deduplicated = await store_upload(file, UPLOAD_DIR)
+        # 其他worker/主机收到的分析请求从产物存储取回该文件
+        store = get_artifact_store()
+        if not await asyncio.to_thread(store.exists, upload_artifact_name(file_path.name)):
+            await asyncio.to_thread(store.put_file, upload_artifact_name(file_path.name), file_path)
+        logger.info(f"File saved to: {file_path.absolute()}" + ("（已存在，复用）" if deduplicated else ""))
+
+        return {
+            "path": str(file_path.absolute()),
+            "sha256": sha256,
+            "size": size,
+            "deduplicated": deduplicated
+        }
     except HTTPException:
         raise
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         logger.error(f"Upload failed: {str(e)}")
         raise HTTPException(status_code=500, detail="File upload failed")
+    finally:
+        await file.close()
+
+def _is_run_id(run_id: str) -> bool:
+    """run_id/job_id 都是 uuid4().hex"""
+    return len(run_id) == 32 and all(c in "0123456789abcdef" for c in run_id)
+
+# fast-then-upgrade 策略下稍后送达的综合修正结果按 run_id 写入产物存储，轮询落到任一worker/主机都能取到
+UPGRADE_ARTIFACT_PREFIX = "upgrade_"
+
+def _upgrade_artifact_name(run_id: str) -> str:
+    return f"{UPGRADE_ARTIFACT_PREFIX}{run_id}.json"
+
+async def _to_response(result: dict) -> dict:
+    """生成接口返回的报告；查询和写入产物存储是阻塞操作，放到线程中执行，不占用事件循环"""
+    return await asyncio.to_thread(_build_response, result)
+
+def _build_response(result: dict) -> dict:
+    # SVG 和报告JSON都通过按内容哈希命名的 /artifacts 地址返回，前缀由 ARTIFACT_BASE_URL 配置
+    response = {
+        "diagram_svg": diagram_url(result.get("diagram_svg")),
+        "suggestions": result.get("suggestions", []),
+        "corrections": result.get("corrections", []),
+        "run_id": result.get("run_id"),
+        "corrector_strategy": result.get("corrector_strategy"),
+        "upgrade_pending": result.get("upgrade_pending", False),
+        "timings": result.get("timings"),
+        "incremental": result.get("incremental"),
+        "dot_error": result.get("dot_error"),
+        "plan": result.get("plan")
+    }
+    try:
+        response["report_url"] = artifact_url(publish_report(response))
+    except OSError as e:
+        logger.error(f"保存报告产物失败: {str(e)}")
+        response["report_url"] = None
+    return response
+
+async def _validate_request(request: BPMNAnalysisRequest):
+    # Validate file existence（本机文件或已发布到产物存储的上传文件）
+    if not await asyncio.to_thread(input_available, request.bpmn_path):
+        raise HTTPException(status_code=404, detail="File not found")
+    if request.corrector_strategy is not None and request.corrector_strategy not in CORRECTOR_STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"Unknown corrector_strategy, expected one of {CORRECTOR_STRATEGIES}")
+    for name in ("max_latency", "max_cost"):
+        value = getattr(request, name)
+        if value is not None and value <= 0:
+            raise HTTPException(status_code=400, detail=f"{name} must be positive")
+
+# 相同输入、相同参数的并发分析请求合并为一次执行
+analysis_flight = SingleFlight(on_coalesced=ANALYZE_COALESCED.inc)
+
+async def _coalesce_key(request: BPMNAnalysisRequest) -> str:
+    """合并键：流程图内容与描述的哈希 + 其余请求参数（模型、策略等）"""
+    local_path = await asyncio.to_thread(resolve_input, request.bpmn_path)
+    content_hash = await asyncio.to_thread(input_hash, local_path, request.description)
+    params = json.dumps(request.dict(exclude={"bpmn_path", "description"}), sort_keys=True)
+    return f"{content_hash}:{hashlib.sha256(params.encode('utf-8')).hexdigest()}"
+
+async def _run_analysis(request: BPMNAnalysisRequest,
+                        on_event: Optional[Callable[[dict], None]] = None,
+                        upgrade_listener: Optional[Callable[[dict], None]] = None) -> dict:
+    """
+    执行一次完整的多专家分析，/analyze、任务队列与流式接口共用。
+    不需要进度推送的请求按合并键去重：与正在运行的相同分析共享同一个结果。
+    """
+    if on_event is not None or upgrade_listener is not None:
+        return await _execute_analysis(request, on_event, upgrade_listener)
+    key = await _coalesce_key(request)
+    return await analysis_flight.run(key, lambda: _execute_analysis(request))
+
+async def _execute_analysis(request: BPMNAnalysisRequest,
+                            on_event: Optional[Callable[[dict], None]] = None,
+                            upgrade_listener: Optional[Callable[[dict], None]] = None) -> dict:
+    async def on_upgrade(report: dict):
+        response = await _to_response(report)
+        try:
+            await asyncio.to_thread(get_artifact_store().put, _upgrade_artifact_name(report["run_id"]),
+                                    json.dumps(response, ensure_ascii=False, default=str).encode("utf-8"))
+        except (OSError, ValueError) as e:
+            logger.error(f"保存升级结果失败: {str(e)}")
+        if upgrade_listener is not None:
+            upgrade_listener(response)
+
+    # Run analysis
+    result = await analyze_bpmn_flow(
+        request.description,
+        request.bpmn_path,
+        
+        agent_configs={
+           "checker": request.checker_model,
+            "text_checker": request.text_checker_model,
+            "corrector": request.corrector_model,
+            "fast_corrector": request.fast_corrector_model
+        },
+        use_cache=request.use_cache,
+        corrector_strategy=request.corrector_strategy,
+        upgrade_deadline=request.upgrade_deadline,
+        on_upgrade=on_upgrade,
+        on_event=on_event,
+        baseline_run_id=request.baseline_run_id,
+        adaptive=request.adaptive,
+        max_latency=request.max_latency,
+        max_cost=request.max_cost
+    )
+    return await _to_response(result)
 
 @app.post("/analyze")
 async def analyze_bpmn(request: BPMNAnalysisRequest):
     try:
-        print("开始分析")
-        # Validate file existence
-        if not Path(request.bpmn_path).exists():
-            raise HTTPException(status_code=404, detail="File not found")
-        
-        # Run analysis
-        result = await analyze_bpmn_flow(
-            request.description,
-            request.bpmn_path,
-            
-            agent_configs={
-               "checker": request.checker_model,
-                "text_checker": request.text_checker_model,
-                "corrector": request.corrector_model,
-                "fast_corrector": request.fast_corrector_model
-            }
-        )
-         # 确保result.diagram_svg存在有效值
-        print("Response Data:", result)  # 查看实际返回内容
-        # 返回正确的URL路径
-        return {
-            "diagram_svg": f"http://localhost:8000/{result.get('diagram_svg', 'static/default_diagram.svg')}",
-            "suggestions": result.get("suggestions", []),
-            "corrections": result.get("corrections", [])
-        }
+        await _validate_request(request)
+        return await _run_analysis(request)
         # return result
+    except HTTPException:
+        raise
     except FileNotFoundError as e:
         logger.error(f"File not found: {request.bpmn_path}")
         raise HTTPException(status_code=404, detail="File not found")
@@ -109,6 +241,223 @@ async def analyze_bpmn(request: BPMNAnalysisRequest):
         logger.error(f"Analysis failed: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail="Analysis failed")
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/analyze/stream")
+async def analyze_bpmn_stream(request: BPMNAnalysisRequest, http_request: Request):
+    """
+    以SSE方式推送分析进度：检测专家的发现、各修正专家的DOT，最后是包含SVG地址的报告。
+    fast-then-upgrade 策略下，连接会保持到综合修正结果送达（upgrade事件）。
+    """
+    await _validate_request(request)
+    events: asyncio.Queue = asyncio.Queue()
+
+    async def run():
+        try:
+            result = await _run_analysis(
+                request,
+                on_event=events.put_nowait,
+                upgrade_listener=lambda report: (events.put_nowait({"event": "upgrade", **report}),
+                                                 events.put_nowait(None))
+            )
+            events.put_nowait({"event": "report", **result})
+            if not result.get("upgrade_pending"):
+                events.put_nowait(None)
+        except Exception as e:
+            logger.error(f"Analysis failed: {str(e)}", exc_info=True)
+            events.put_nowait({"event": "error", "detail": "Analysis failed"})
+            events.put_nowait(None)
+
+    async def stream():
+        task = asyncio.create_task(run())
+        yield _sse("started", {"bpmn_path": request.bpmn_path})
+        try:
+            while True:
+                event = await events.get()
+                if event is None:
+                    break
+                yield _sse(event.pop("event"), event)
+                if await http_request.is_disconnected():
+                    break
+        finally:
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+JOB_ARTIFACT_PREFIX = "job_"
+
+def _job_artifact_name(job_id: str) -> str:
+    return f"{JOB_ARTIFACT_PREFIX}{job_id}.json"
+
+def _save_job(record: dict):
+    """把任务记录写入产物存储，轮询请求落到其他worker/主机时也能查到；由任务队列的后台写入任务在线程中调用"""
+    get_artifact_store().put(_job_artifact_name(record["job_id"]),
+                             json.dumps(record, ensure_ascii=False, default=str).encode("utf-8"))
+
+def _load_job(job_id: str) -> Optional[dict]:
+    """本进程中没有的任务从产物存储读取；job_id 不是本服务生成的格式时视为不存在"""
+    if not _is_run_id(job_id):
+        return None
+    data = get_artifact_store().get(_job_artifact_name(job_id))
+    return json.loads(data) if data is not None else None
+
+# 异步任务队列：/jobs 立即返回 job_id，由固定数量的worker执行分析
+job_queue = JobQueue(
+    _run_analysis,
+    workers=int(os.getenv("ANALYZE_WORKERS", "2")),
+    max_depth=int(os.getenv("ANALYZE_QUEUE_MAX", "20")),
+    on_update=_save_job
+)
+
+# 后台预热任务的引用
+_warm_up_tasks = set()
+_prune_task: Optional[asyncio.Task] = None
+
+def _artifact_retention() -> Dict[str, int]:
+    """各类产物的保留数：任务记录与任务队列保留的已结束任务数一致，其余与运行历史保留的运行数一致"""
+    return {
+        JOB_ARTIFACT_PREFIX: job_queue.max_finished,
+        BASELINE_ARTIFACT_PREFIX: BASELINE_KEEP,
+        UPGRADE_ARTIFACT_PREFIX: HISTORY_MAX_RUNS,
+        UPLOAD_ARTIFACT_PREFIX: HISTORY_MAX_RUNS,
+        REPORT_ARTIFACT_PREFIX: HISTORY_MAX_RUNS,
+        SVG_ARTIFACT_PREFIX: HISTORY_MAX_RUNS,
+    }
+
+async def _prune_artifacts_periodically():
+    """启动时及之后每 ARTIFACT_PRUNE_INTERVAL 秒清理一次产物存储（多个worker各自清理，结果相同）"""
+    while True:
+        await asyncio.to_thread(prune_artifacts, _artifact_retention())
+        await asyncio.sleep(ARTIFACT_PRUNE_INTERVAL)
+
+@app.on_event("startup")
+async def start_job_queue():
+    if LOG_PER_WORKER:
+        # metagpt 默认所有进程写同一个 logs/<日期>.txt
+        from metagpt.logs import define_log_level
+        define_log_level(name=f"worker-{os.getpid()}")
+    await job_queue.start()
+    global _prune_task
+    _prune_task = asyncio.create_task(_prune_artifacts_periodically())
+    # 在线程中导入 metagpt 并预建角色组，不阻塞服务启动（冷启动时端口尽快可用）
+    task = asyncio.create_task(asyncio.to_thread(warm_from_env))
+    _warm_up_tasks.add(task)
+    task.add_done_callback(_warm_up_tasks.discard)
+
+@app.on_event("shutdown")
+async def stop_job_queue():
+    await job_queue.stop()
+    if _prune_task is not None:
+        _prune_task.cancel()
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: BPMNAnalysisRequest):
+    """提交分析任务，立即返回 job_id；队列已满时返回429"""
+    await _validate_request(request)
+    try:
+        job = job_queue.submit(request)
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e), headers={"Retry-After": "30"})
+    return {**job.to_dict(), "queue_depth": job_queue.depth}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = job_queue.get(job_id)
+    if job is None:
+        record = await asyncio.to_thread(_load_job, job_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+        record.pop("result", None)
+        return {**record, "queue_depth": job_queue.depth}
+    return {**job.to_dict(), "queue_depth": job_queue.depth}
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    job = job_queue.get(job_id)
+    if job is not None:
+        record = {**job.to_dict(), "result": job.result}
+    else:
+        record = await asyncio.to_thread(_load_job, job_id)
+        if record is None:
+            raise HTTPException(status_code=404, detail="Job not found")
+    if record["status"] == JOB_FAILED:
+        raise HTTPException(status_code=500, detail=record["error"] or "Analysis failed")
+    if record["status"] != JOB_DONE:
+        record.pop("result", None)
+        return JSONResponse(status_code=202, content=record)
+    return record["result"]
+
+@app.get("/analyze/{run_id}/upgrade")
+async def get_upgraded_report(run_id: str):
+    """获取 fast-then-upgrade 策略下稍后完成的综合修正结果"""
+    if not _is_run_id(run_id):
+        raise HTTPException(status_code=404, detail="Upgrade not ready or unknown run_id")
+    data = await asyncio.to_thread(get_artifact_store().get, _upgrade_artifact_name(run_id))
+    report = json.loads(data) if data is not None else None
+    if report is None:
+        # 产物存储中没有升级结果（如写入失败）时从本机的运行历史中读取
+        run = await asyncio.to_thread(lambda: get_run_history().get_run(run_id))
+        if run is None or run["status"] != STATUS_COMPLETED or not run.get("report"):
+            raise HTTPException(status_code=404, detail="Upgrade not ready or unknown run_id")
+        report = await _to_response(run["report"])
+    return report
+
+@app.get("/artifacts/{name}")
+async def get_artifact(name: str, request: Request):
+    """按内容哈希命名的报告产物（SVG/JSON），可被浏览器和代理长期缓存"""
+    return await artifact_response(name, request)
+
+@app.get("/api/runs")
+async def list_runs(
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    input_hash: Optional[str] = None,
+    model: Optional[str] = None,
+    since: Optional[float] = Query(None, description="Unix时间戳，只返回此后的运行"),
+    until: Optional[float] = Query(None, description="Unix时间戳，只返回此前的运行")
+):
+    """分页查询历史运行（按时间倒序），可按输入哈希、模型和时间范围过滤"""
+    # SQLite 查询是阻塞调用，放到线程中执行
+    return await asyncio.to_thread(lambda: get_run_history().list_runs(
+        page=page, page_size=page_size, input_hash=input_hash, model=model, since=since, until=until))
+
+@app.get("/api/runs/{run_id}")
+async def get_run(run_id: str, include_messages: bool = False):
+    """查询一次运行的完整记录：检测结果、修正DOT、SVG路径、耗时，以及可选的各专家消息"""
+    run = await asyncio.to_thread(lambda: get_run_history().get_run(run_id, include_messages=include_messages))
+    if run is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    return run
+
+@app.get("/api/cache/stats")
+async def cache_stats():
+    """LLM响应缓存的命中/未命中统计"""
+    return await asyncio.to_thread(lambda: get_llm_cache().stats())
+
+@app.get("/api/analyze/inflight")
+async def analyze_inflight_stats():
+    """正在运行的合并分析数、启动次数和被合并的请求数"""
+    return analysis_flight.stats()
+
+@app.get("/api/llm/stats")
+async def llm_scheduler_stats():
+    """LLM调度层：共享的LLM实例数，各模型的并发上限、进行中的调用数和限流配置"""
+    return get_llm_scheduler().stats()
+
+@app.get("/api/pool/stats")
+async def role_pool_stats():
+    """角色池的创建/复用次数及各模型组合的空闲角色组数"""
+    return get_role_pool().stats()
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 文本格式的指标：各阶段耗时、LLM调用/token/费用、HTTP延迟"""
+    JOB_QUEUE_DEPTH.set(job_queue.depth)
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
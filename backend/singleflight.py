@@ -0,0 +1,47 @@
+# backend/singleflight.py
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    相同键的并发调用只执行一次：第一个请求启动任务，其后到达的相同请求
+    等待同一个任务并获得同一个结果（或同一个异常）。任务结束后键即释放，
+    之后的请求会重新执行。
+    """
+
+    def __init__(self, on_coalesced: Optional[Callable[[], None]] = None):
+        self._inflight: Dict[str, "asyncio.Future"] = {}
+        self.on_coalesced = on_coalesced
+        self.started = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            if self.on_coalesced is not None:
+                self.on_coalesced()
+        else:
+            self.started += 1
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        # shield：某个客户端断开只取消它自己的等待，不影响共享的分析任务
+        return await asyncio.shield(task)
+
+    def _finish(self, key: str, task: "asyncio.Future"):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 所有等待方都已离开时，读取异常以免事件循环报告 "exception was never retrieved"
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {"inflight": len(self._inflight), "started": self.started, "coalesced": self.coalesced}
@@ -0,0 +1,108 @@
+# backend/uploads.py
+
+import hashlib
+import logging
+import os
+import re
+import uuid
+from pathlib import Path
+from typing import Tuple
+
+import aiofiles
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+# 上传配置（可通过环境变量覆盖）
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(256 * 1024)))
+# multipart 请求体中边界和各部分头部的额外字节
+UPLOAD_MULTIPART_OVERHEAD = 64 * 1024
+
+# 保留的扩展名：只允许短的字母数字后缀，用于区分 .bpmn / .svg 等输入类型
+_SUFFIX_RE = re.compile(r'^\.[A-Za-z0-9]{1,10}$')
+
+
+class UploadTooLargeError(Exception):
+    """上传文件超过大小限制"""
+
+
+class UploadSizeLimitMiddleware:
+    """
+    ASGI中间件：在 Starlette 解析 multipart（把文件写入临时文件）之前统计上传接口的请求体字节数，
+    超过 UPLOAD_MAX_BYTES（加上 multipart 开销）立即以413终止。
+    声明的 Content-Length 已超限时不读取请求体直接拒绝；分块传输（没有 Content-Length）
+    或长度声明不实的请求在读取过程中累计字节数，超限即中止。
+    """
+
+    def __init__(self, app, paths=("/api/upload",), max_bytes: int = UPLOAD_MAX_BYTES + UPLOAD_MULTIPART_OVERHEAD):
+        self.app = app
+        self.paths = set(paths)
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        detail = f"File exceeds {UPLOAD_MAX_BYTES} bytes"
+        content_length = dict(scope["headers"]).get(b"content-length", b"")
+        if content_length.isdigit() and int(content_length) > self.max_bytes:
+            await JSONResponse(status_code=413, content={"detail": detail})(scope, receive, send)
+            return
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # 在读取请求体时抛出，FastAPI 原样转换为413响应
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def _safe_suffix(filename: str) -> str:
+    suffix = Path(filename or "").suffix.lower()
+    return suffix if _SUFFIX_RE.match(suffix) else ""
+
+
+async def store_upload(file: UploadFile, upload_dir: Path,
+                       max_bytes: int = UPLOAD_MAX_BYTES) -> Tuple[Path, str, int, bool]:
+    """
+    分块写入上传文件，边写边计算 SHA-256，文件按内容哈希命名。
+    相同内容再次上传时直接返回已有文件，不重复写入。
+    返回 (文件路径, sha256, 字节数, 是否为重复上传)；超过 max_bytes 时抛出 UploadTooLargeError。
+    """
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = upload_dir / f".upload-{uuid.uuid4().hex}.part"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(tmp_path, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLargeError(f"Upload exceeds {max_bytes} bytes")
+                digest.update(chunk)
+                await out.write(chunk)
+
+        sha256 = digest.hexdigest()
+        final_path = upload_dir / f"{sha256}{_safe_suffix(file.filename)}"
+        if final_path.exists():
+            return final_path, sha256, size, True
+        # 原子替换：并发上传相同内容时，后完成的一方覆盖为同样的内容
+        os.replace(tmp_path, final_path)
+        return final_path, sha256, size, False
+    finally:
+        if tmp_path.exists():
+            try:
+                tmp_path.unlink()
+            except OSError as e:
+                logger.error(f"删除临时上传文件失败: {str(e)}")
@@ -0,0 +1,171 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+# 可作为流程图输入的文件类型
+DIAGRAM_SUFFIXES = (".bpmn", ".bpmn2", ".xml", ".svg")
+DESCRIPTION_SUFFIXES = (".txt", ".md")
+
+STATUS_OK = "ok"
+STATUS_FAILED = "failed"
+
+
+class BatchItem(BaseModel):
+    """批量分析的一项：流程图文件 + 文本描述文件"""
+    id: str
+    diagram: str
+    description: str
+
+
+def _pair_key(path: Path) -> str:
+    """用文件名末尾的编号配对，如 sample1.bpmn ↔ text1.txt"""
+    m = re.search(r'(\d+)$', path.stem)
+    return m.group(1) if m else ""
+
+
+def discover_items(root: str) -> List[BatchItem]:
+    """
+    扫描目录树，在每个目录内把流程图与文本描述配对。
+    目录内只有一个描述文件时所有流程图共用它，否则按文件名末尾编号配对。
+    """
+    root_path = Path(root)
+    items = []
+    for directory in sorted({p.parent for p in root_path.rglob("*") if p.is_file()}):
+        files = sorted(p for p in directory.iterdir() if p.is_file())
+        diagrams = [p for p in files if p.suffix.lower() in DIAGRAM_SUFFIXES]
+        texts = [p for p in files if p.suffix.lower() in DESCRIPTION_SUFFIXES]
+        if not diagrams or not texts:
+            continue
+        by_key = {_pair_key(t): t for t in texts}
+        for diagram in diagrams:
+            text = texts[0] if len(texts) == 1 else by_key.get(_pair_key(diagram))
+            if text is None:
+                logger.error(f"找不到与 {diagram} 对应的文本描述，已跳过")
+                continue
+            items.append(BatchItem(
+                id=diagram.relative_to(root_path).as_posix(),
+                diagram=str(diagram),
+                description=str(text)
+            ))
+    return items
+
+
+def load_manifest(manifest: str) -> List[BatchItem]:
+    """
+    读取清单文件（JSON 数组或 JSONL），每项包含 diagram、description，可选 id。
+    相对路径按清单文件所在目录解析。
+    """
+    manifest_path = Path(manifest)
+    base = manifest_path.parent
+    text = manifest_path.read_text(encoding="utf-8").strip()
+    if text.startswith("["):
+        entries = json.loads(text)
+    else:
+        entries = [json.loads(line) for line in text.splitlines() if line.strip()]
+
+    items = []
+    for entry in entries:
+        diagram = base / entry["diagram"]
+        description = base / entry["description"]
+        items.append(BatchItem(
+            id=entry.get("id") or entry["diagram"],
+            diagram=str(diagram),
+            description=str(description)
+        ))
+    return items
+
+
+def completed_ids(output: str, retry_failed: bool = True) -> Set[str]:
+    """读取已有的输出文件，返回已完成的项；中断时写了一半的行会被忽略"""
+    done = set()
+    path = Path(output)
+    if not path.exists():
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if record.get("status") == STATUS_OK or not retry_failed:
+                done.add(record.get("id"))
+    return done
+
+
+class JsonlWriter:
+    """逐行追加写入结果，每行写完即刷新，进程中断后已写入的结果仍然有效"""
+
+    def __init__(self, output: str, append: bool = True):
+        path = Path(output)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        needs_newline = False
+        if append and path.exists() and path.stat().st_size > 0:
+            # 上次中断可能留下不完整的最后一行，先补一个换行
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+        self._file = open(path, "a" if append else "w", encoding="utf-8")
+        if needs_newline:
+            self._file.write("\n")
+
+    def write(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+
+async def run_batch(items: Iterable[BatchItem], output: str,
+                    analyze: Callable[[BatchItem], Awaitable[dict]],
+                    concurrency: int = 4, resume: bool = True, retry_failed: bool = True,
+                    item_timeout: Optional[float] = None) -> Dict[str, int]:
+    """
+    并发分析多个流程，同时运行的分析数不超过 concurrency。
+    每完成一项就向 output 追加一行JSON；resume 时跳过输出文件中已成功的项。
+    """
+    items = list(items)
+    skip = completed_ids(output, retry_failed) if resume else set()
+    pending = [item for item in items if item.id not in skip]
+    stats = {"total": len(items), "skipped": len(items) - len(pending), STATUS_OK: 0, STATUS_FAILED: 0}
+
+    writer = JsonlWriter(output, append=resume)
+    queue: asyncio.Queue = asyncio.Queue()
+    for item in pending:
+        queue.put_nowait(item)
+
+    async def worker():
+        while True:
+            try:
+                item = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            started = time.monotonic()
+            record = {"id": item.id, "diagram": item.diagram, "description": item.description}
+            try:
+                report = await asyncio.wait_for(analyze(item), item_timeout)
+                record.update({"status": STATUS_OK, "report": report})
+            except asyncio.TimeoutError:
+                record.update({"status": STATUS_FAILED, "error": f"timeout after {item_timeout}s"})
+            except Exception as e:
+                logger.error(f"批量分析 {item.id} 失败: {str(e)}")
+                record.update({"status": STATUS_FAILED, "error": str(e)})
+            record["duration"] = round(time.monotonic() - started, 3)
+            stats[record["status"]] += 1
+            writer.write(record)
+
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(min(concurrency, len(pending)), 1))))
+    finally:
+        writer.close()
+    return stats
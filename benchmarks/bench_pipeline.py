@@ -0,0 +1,243 @@
+"""
+离线端到端基准测试：使用 StubLLM 代替真实模型，测量流程分析各阶段的耗时、内存峰值和吞吐量。
+
+    python -m benchmarks.bench_pipeline --sizes 50,500,2000 --output bench.json
+    python -m benchmarks.bench_pipeline --baseline bench.json   # 与基线比较，出现退化时返回非零
+
+阶段说明：
+    ingest      读取流程图并转换为DOT（.bpmn 走 bpmn_reader，.svg 走 svg_to_dot）
+    structural  本地结构检查
+    check       从发布需求到两个检测专家都产生结果
+    correct     检测结果齐备到修正结果产生
+    report      结果收集、清洗和渲染，直到 analyze_bpmn_flow 返回
+    render      单独渲染修正后DOT为SVG（未安装 Graphviz 时为空）
+"""
+import asyncio
+import json
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+# 渲染输出放到临时目录，避免基准测试污染产物存储目录
+_WORKDIR = Path(tempfile.mkdtemp(prefix="bpmn_bench_"))
+os.environ.setdefault("RENDER_DIR", str(_WORKDIR / "render"))
+
+import typer
+from pydantic import BaseModel
+
+from batch_runner import discover_items
+from bpmn_graph import BPMNGraph
+from benchmarks.stub_llm import (STAGE_CHECKER, STAGE_CORRECTOR, STAGE_FAST_CORRECTOR, STAGE_TEXT_CHECKER,
+                                 stub_llm_provider)
+from benchmarks.synthetic import write_synthetic_bpmn, write_synthetic_svg
+from corrector_strategy import STRATEGY_RACE
+from artifact_store import LocalArtifactStore
+from render_service import render_svg
+from structural_analyzer import analyze_structure
+from team import analyze_bpmn_flow, load_dot
+
+STUB_AGENT_CONFIGS = {
+    "checker": "Spark",
+    "text_checker": "Spark",
+    "corrector": "Spark",
+    "fast_corrector": "Spark"
+}
+TIME_METRICS = ("ingest", "structural", "check", "correct", "report", "total", "render")
+
+app = typer.Typer()
+
+
+class BenchCase(BaseModel):
+    name: str
+    diagram: str
+    description: str
+    synthetic: bool = False
+
+
+def build_cases(sample_root: str, sizes: List[int], workdir: Path) -> List[BenchCase]:
+    """test_sample 中的样例 + 不同规模的合成流程（BPMN XML 与 SVG 各一份）"""
+    cases = [
+        BenchCase(name=item.id, diagram=item.diagram,
+                  description=Path(item.description).read_text(encoding="utf-8"))
+        for item in discover_items(sample_root)
+    ]
+    workdir.mkdir(parents=True, exist_ok=True)
+    for size in sizes:
+        description = f"合成流程：{size} 个节点的顺序审批流程，每隔若干步骤并行执行审批与通知。"
+        for suffix, writer in ((".bpmn", write_synthetic_bpmn), (".svg", write_synthetic_svg)):
+            path = writer(size, workdir / f"synthetic_{size}{suffix}")
+            cases.append(BenchCase(name=path.name, diagram=str(path), description=description, synthetic=True))
+    return cases
+
+
+def _median_time(fn: Callable[[], object], repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+async def _run_pipeline(case: BenchCase, strategy: str) -> Dict[str, float]:
+    """运行一次完整流程，根据收集器事件的时间点拆分各阶段耗时"""
+    started = time.perf_counter()
+    timeline = {"findings": [], "correction": []}
+
+    def on_event(event: dict):
+        timeline.setdefault(event["event"], []).append(time.perf_counter() - started)
+
+    await analyze_bpmn_flow(case.description, case.diagram, agent_configs=STUB_AGENT_CONFIGS,
+                            use_cache=False, corrector_strategy=strategy, on_event=on_event)
+    total = time.perf_counter() - started
+    check = max(timeline["findings"], default=0.0)
+    corrected = max(timeline["correction"], default=check)
+    return {"check": check, "correct": corrected - check, "report": total - corrected, "total": total}
+
+
+async def measure_case(case: BenchCase, repeat: int, strategy: str, memory: bool) -> dict:
+    dot = load_dot(case.diagram)
+    result = {
+        "case": case.name,
+        "nodes": len(BPMNGraph.from_dot(dot)),
+        "dot_bytes": len(dot.encode("utf-8")),
+        "ingest": _median_time(lambda: load_dot(case.diagram), repeat),
+        "structural": _median_time(lambda: analyze_structure(dot), repeat),
+    }
+
+    runs = [await _run_pipeline(case, strategy) for _ in range(repeat)]
+    for stage in ("check", "correct", "report", "total"):
+        result[stage] = statistics.median(run[stage] for run in runs)
+
+    # 每次渲染使用新目录，避免命中按内容哈希的SVG缓存
+    render_times = []
+    for n in range(repeat):
+        started = time.perf_counter()
+        svg = await render_svg(dot, LocalArtifactStore(_WORKDIR / f"render_{case.name}_{n}"))
+        if svg is None:
+            break
+        render_times.append(time.perf_counter() - started)
+    result["render"] = statistics.median(render_times) if render_times else None
+
+    if memory:
+        tracemalloc.start()
+        try:
+            await _run_pipeline(case, strategy)
+            result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+async def measure_throughput(cases: List[BenchCase], runs: int, concurrency: int, strategy: str) -> dict:
+    """并发运行 runs 轮全部样例，统计每秒完成的分析数"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(case: BenchCase):
+        async with semaphore:
+            await analyze_bpmn_flow(case.description, case.diagram, agent_configs=STUB_AGENT_CONFIGS,
+                                    use_cache=False, corrector_strategy=strategy)
+
+    jobs = [case for _ in range(runs) for case in cases]
+    started = time.perf_counter()
+    await asyncio.gather(*(one(case) for case in jobs))
+    elapsed = time.perf_counter() - started
+    return {"analyses": len(jobs), "concurrency": concurrency, "seconds": elapsed,
+            "per_second": len(jobs) / elapsed if elapsed else None}
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """与基线逐项比较，超过容差（且绝对差值有意义）的指标视为退化"""
+    previous = {row["case"]: row for row in baseline.get("cases", [])}
+    regressions = []
+    for row in results["cases"]:
+        old = previous.get(row["case"])
+        if not old:
+            continue
+        for metric, min_delta in [(m, 0.005) for m in TIME_METRICS] + [("peak_mb", 1.0)]:
+            new_value, old_value = row.get(metric), old.get(metric)
+            if new_value is None or old_value is None:
+                continue
+            if new_value > old_value * (1 + tolerance) and new_value - old_value > min_delta:
+                regressions.append(f"{row['case']}.{metric}: {old_value:.4f} -> {new_value:.4f}")
+    old_tp = (baseline.get("throughput") or {}).get("per_second")
+    new_tp = (results.get("throughput") or {}).get("per_second")
+    if old_tp and new_tp and new_tp < old_tp / (1 + tolerance):
+        regressions.append(f"throughput.per_second: {old_tp:.2f} -> {new_tp:.2f}")
+    return regressions
+
+
+def _format_table(rows: List[dict]) -> str:
+    columns = ["case", "nodes", "dot_bytes", *TIME_METRICS, "peak_mb"]
+    lines = [" | ".join(columns)]
+    for row in rows:
+        cells = []
+        for column in columns:
+            value = row.get(column)
+            if isinstance(value, float):
+                cells.append(f"{value * 1000:.1f}ms" if column in TIME_METRICS else f"{value:.1f}")
+            else:
+                cells.append("-" if value is None else str(value))
+        lines.append(" | ".join(cells))
+    return "\n".join(lines)
+
+
+@app.command()
+def main(
+    samples: str = typer.Option("test_sample", help="样例目录"),
+    sizes: str = typer.Option("50,500,2000", help="合成流程的节点数，逗号分隔"),
+    repeat: int = typer.Option(3, help="每个阶段重复次数，取中位数"),
+    latency: float = typer.Option(0.0, help="检测专家的模拟LLM延迟（秒）"),
+    corrector_latency: Optional[float] = typer.Option(None, help="修正专家的模拟延迟，默认与 latency 相同"),
+    strategy: str = typer.Option(STRATEGY_RACE, help="修正策略 (race/single)"),
+    throughput_runs: int = typer.Option(3, help="吞吐量测试中全部样例的运行轮数"),
+    concurrency: int = typer.Option(4, help="吞吐量测试的并发数"),
+    memory: bool = typer.Option(True, help="是否额外运行一次 tracemalloc 统计内存峰值"),
+    output: Optional[str] = typer.Option(None, help="结果JSON输出路径"),
+    baseline: Optional[str] = typer.Option(None, help="基线结果JSON，用于检测性能退化"),
+    tolerance: float = typer.Option(0.25, help="允许的相对退化比例")
+):
+    corrector_latency = latency if corrector_latency is None else corrector_latency
+    stub_latency = {
+        STAGE_CHECKER: latency,
+        STAGE_TEXT_CHECKER: latency,
+        STAGE_CORRECTOR: corrector_latency,
+        STAGE_FAST_CORRECTOR: corrector_latency
+    }
+    size_list = [int(s) for s in sizes.split(",") if s.strip()]
+    cases = build_cases(samples, size_list, _WORKDIR / "inputs")
+
+    async def _main() -> dict:
+        rows = []
+        for case in cases:
+            rows.append(await measure_case(case, repeat, strategy, memory))
+            typer.echo(f"  {case.name}: total {rows[-1]['total'] * 1000:.1f}ms", err=True)
+        sample_cases = [case for case in cases if not case.synthetic] or cases
+        throughput = await measure_throughput(sample_cases, throughput_runs, concurrency, strategy)
+        return {"cases": rows, "throughput": throughput,
+                "settings": {"repeat": repeat, "latency": stub_latency, "strategy": strategy}}
+
+    with stub_llm_provider(stub_latency):
+        results = asyncio.run(_main())
+
+    typer.echo(_format_table(results["cases"]))
+    tp = results["throughput"]
+    typer.echo(f"throughput: {tp['analyses']} analyses in {tp['seconds']:.2f}s "
+               f"({tp['per_second']:.2f}/s, concurrency={tp['concurrency']})")
+    if output:
+        Path(output).write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    if baseline:
+        regressions = compare(results, json.loads(Path(baseline).read_text(encoding="utf-8")), tolerance)
+        for line in regressions:
+            typer.echo(f"REGRESSION {line}", err=True)
+        if regressions:
+            raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    app()
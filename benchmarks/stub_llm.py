@@ -0,0 +1,101 @@
+import asyncio
+import json
+import re
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from metagpt.configs.llm_config import LLMConfig
+from metagpt.const import USE_CONFIG_TIMEOUT
+from metagpt.provider.base_llm import BaseLLM
+from metagpt.provider.llm_provider_registry import LLM_REGISTRY
+
+from llm_scheduler import get_llm_scheduler
+from role_pool import get_role_pool
+
+# 各阶段的模拟延迟（秒），由 stub_llm_provider 设置
+STAGE_CHECKER = "checker"
+STAGE_TEXT_CHECKER = "text_checker"
+STAGE_CORRECTOR = "corrector"
+STAGE_FAST_CORRECTOR = "fast_corrector"
+_latency: Dict[str, float] = {}
+
+_ORIGINAL_DOT_RE = re.compile(r'(?:Original BPMN DOT description|Region DOT):\s*(.*?)\s*Identified issues', re.DOTALL)
+_NODE_ID_RE = re.compile(r'^\s*"?([^"\s\[]+)"?\s*\[', re.MULTILINE)
+
+
+def _stage_of(system: str, prompt: str) -> str:
+    if "Dot correction expert" in prompt:
+        return STAGE_FAST_CORRECTOR if "快速" in system else STAGE_CORRECTOR
+    if "text description" in prompt:
+        return STAGE_TEXT_CHECKER
+    return STAGE_CHECKER
+
+
+def _findings(prompt: str, error_type: str) -> str:
+    node = _NODE_ID_RE.search(prompt)
+    element_id = node.group(1) if node else "start"
+    return json.dumps({
+        "error_type": error_type,
+        "errors": [{
+            "element_id": element_id,
+            "description": f"模拟问题：{element_id} 缺少条件表达式",
+            "suggestion": "为分支补充条件表达式"
+        }]
+    }, ensure_ascii=False)
+
+
+def canned_response(stage: str, prompt: str) -> str:
+    """按阶段返回固定格式的响应：检测专家返回JSON，修正专家原样返回输入的DOT"""
+    if stage in (STAGE_CORRECTOR, STAGE_FAST_CORRECTOR):
+        m = _ORIGINAL_DOT_RE.search(prompt)
+        dot = m.group(1) if m else 'digraph { start -> end }'
+        return f"```dot\n{dot}\n```"
+    if stage == STAGE_TEXT_CHECKER:
+        return _findings(prompt, "description_mismatch")
+    return _findings(prompt, "Gateway type/flow mismatch")
+
+
+class StubLLM(BaseLLM):
+    """离线模拟的LLM：不访问网络，按配置的延迟返回固定响应"""
+
+    def __init__(self, config: LLMConfig):
+        self.config = config
+        self.calls = 0
+
+    async def _respond(self, messages: list[dict]) -> str:
+        system = "\n".join(m["content"] for m in messages if m.get("role") == "system")
+        prompt = "\n".join(str(m["content"]) for m in messages if m.get("role") == "user")
+        stage = _stage_of(system, prompt)
+        self.calls += 1
+        await asyncio.sleep(_latency.get(stage, 0.0))
+        return canned_response(stage, prompt)
+
+    async def _achat_completion(self, messages: list[dict], timeout=USE_CONFIG_TIMEOUT) -> dict:
+        return {"choices": [{"message": {"role": "assistant", "content": await self._respond(messages)}}]}
+
+    async def acompletion(self, messages: list[dict], timeout=USE_CONFIG_TIMEOUT) -> dict:
+        return await self._achat_completion(messages, timeout=timeout)
+
+    async def _achat_completion_stream(self, messages: list[dict], timeout: int = USE_CONFIG_TIMEOUT) -> str:
+        return await self._respond(messages)
+
+
+@contextmanager
+def stub_llm_provider(latency: Optional[Dict[str, float]] = None):
+    """在上下文内把所有已注册的模型提供方替换为 StubLLM，退出时恢复"""
+    global _latency
+    saved_providers = dict(LLM_REGISTRY.providers)
+    saved_latency = _latency
+    _latency = dict(latency or {})
+    for key in saved_providers:
+        LLM_REGISTRY.register(key, StubLLM)
+    # 角色池中的角色持有各自的LLM实例，切换 provider 前后都要清空
+    get_role_pool().clear()
+    get_llm_scheduler().reset()
+    try:
+        yield
+    finally:
+        LLM_REGISTRY.providers = saved_providers
+        _latency = saved_latency
+        get_role_pool().clear()
+        get_llm_scheduler().reset()
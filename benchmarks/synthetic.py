@@ -0,0 +1,74 @@
+from pathlib import Path
+from typing import List, Tuple
+from xml.sax.saxutils import quoteattr
+
+BPMN_NS = "http://www.omg.org/spec/BPMN/20100524/MODEL"
+
+
+def _layout(size: int) -> Tuple[List[Tuple[str, str, str]], List[Tuple[str, str]]]:
+    """
+    生成约 size 个节点的流程：顺序任务链，每隔若干任务插入一组并行分支/汇聚。
+    返回 (节点列表[(id, 类型, 名称)], 边列表[(源, 目标)])
+    """
+    nodes = [("StartEvent1", "startEvent", "开始")]
+    edges = []
+    prev = "StartEvent1"
+    i = 0
+    while len(nodes) < max(size, 4) - 1:
+        i += 1
+        if i % 8 == 0:
+            split, join = f"Fork{i}", f"Join{i}"
+            left, right = f"Task{i}a", f"Task{i}b"
+            nodes += [(split, "parallelGateway", f"并行分支{i}"), (left, "userTask", f"审批{i}a"),
+                      (right, "serviceTask", f"通知{i}b"), (join, "parallelGateway", f"并行汇聚{i}")]
+            edges += [(prev, split), (split, left), (split, right), (left, join), (right, join)]
+            prev = join
+        else:
+            task = f"Task{i}"
+            nodes.append((task, "userTask", f"处理步骤{i}"))
+            edges.append((prev, task))
+            prev = task
+    nodes.append(("EndEvent1", "endEvent", "结束"))
+    edges.append((prev, "EndEvent1"))
+    return nodes, edges
+
+
+def write_synthetic_bpmn(size: int, path: Path) -> Path:
+    """写出带泳道和图形信息的 BPMN 2.0 XML"""
+    nodes, edges = _layout(size)
+    half = len(nodes) // 2
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f'<?xml version="1.0" encoding="UTF-8"?>\n<bpmn:definitions xmlns:bpmn="{BPMN_NS}" '
+                f'xmlns:bpmndi="http://www.omg.org/spec/BPMN/20100524/DI" '
+                f'xmlns:dc="http://www.omg.org/spec/DD/20100524/DC" id="Definitions1">\n')
+        f.write('<bpmn:process id="Process1" isExecutable="false">\n<bpmn:laneSet id="LaneSet1">\n')
+        for lane, members in (("申请部门", nodes[:half]), ("审批部门", nodes[half:])):
+            f.write(f'<bpmn:lane id="Lane{lane}" name="{lane}">\n')
+            f.writelines(f'<bpmn:flowNodeRef>{node_id}</bpmn:flowNodeRef>\n' for node_id, _, _ in members)
+            f.write('</bpmn:lane>\n')
+        f.write('</bpmn:laneSet>\n')
+        for node_id, kind, name in nodes:
+            f.write(f'<bpmn:{kind} id="{node_id}" name={quoteattr(name)} />\n')
+        for n, (source, target) in enumerate(edges):
+            f.write(f'<bpmn:sequenceFlow id="Flow{n}" sourceRef="{source}" targetRef="{target}" />\n')
+        f.write('</bpmn:process>\n<bpmndi:BPMNDiagram id="Diagram1"><bpmndi:BPMNPlane id="Plane1" bpmnElement="Process1">\n')
+        for n, (node_id, _, _) in enumerate(nodes):
+            f.write(f'<bpmndi:BPMNShape id="{node_id}_di" bpmnElement="{node_id}">'
+                    f'<dc:Bounds x="{n * 120}" y="100" width="100" height="80" /></bpmndi:BPMNShape>\n')
+        f.write('</bpmndi:BPMNPlane></bpmndi:BPMNDiagram>\n</bpmn:definitions>\n')
+    return path
+
+
+def write_synthetic_svg(size: int, path: Path) -> Path:
+    """写出 svg_to_dot 可读取的SVG：节点为带 bpmn:type 的图形，连线的 bpmnElement 为 源_目标"""
+    nodes, edges = _layout(size)
+    types = {"startEvent": "Event", "endEvent": "Event", "parallelGateway": "Gateway"}
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:bpmn="{BPMN_NS}">\n')
+        for n, (node_id, kind, name) in enumerate(nodes):
+            tag = "circle" if kind.endswith("Event") else "rect"
+            f.write(f'<{tag} id="{node_id}" name={quoteattr(name)} bpmn:type="{types.get(kind, "Task")}" x="{n * 120}" />\n')
+        for source, target in edges:
+            f.write(f'<path bpmnElement="{source}_{target}" d="M0 0" />\n')
+        f.write('</svg>\n')
+    return path
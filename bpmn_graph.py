@@ -0,0 +1,418 @@
+import re
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+# DOT 词法：注释、带引号字符串、HTML标签、标识符/数字、边操作符及符号
+_TOKEN_RE = re.compile(
+    r'(?P<comment>//[^\n]*|/\*.*?\*/|^\s*#[^\n]*)'
+    r'|(?P<string>"(?:\\.|[^"\\])*")'
+    r'|(?P<html><[^<>]*(?:<[^<>]*>[^<>]*)*>)'
+    r'|(?P<edgeop>->|--)'
+    r'|(?P<id>[A-Za-z_\u0080-\uffff][\w\u0080-\uffff.]*|-?(?:\.\d+|\d+(?:\.\d*)?))'
+    r'|(?P<punct>[\[\]{};,=:])'
+    r'|(?P<space>\s+)'
+    r'|(?P<other>.)',
+    re.DOTALL | re.MULTILINE
+)
+
+_KEYWORDS = {"graph", "digraph", "subgraph", "node", "edge", "strict"}
+
+# 节点类型判定关键字
+_START_WORDS = ("start", "开始", "begin")
+_END_WORDS = ("end", "结束", "finish")
+# 并行网关关键字按子串匹配（中文标签没有空格分词，如"并行网关"），"+"、"and"太短，只按整词匹配
+_PARALLEL_WORDS = ("parallel", "并行")
+_PARALLEL_SYMBOLS = ("+", "and")
+
+# BPMN元素类型 → DOT节点样式
+BPMN_STYLES = {
+    'Task': {'shape': 'rectangle', 'style': 'filled', 'fillcolor': '#90EE90'},
+    'Event': {'shape': 'circle', 'style': 'filled', 'fillcolor': '#FFD700'},
+    'EndEvent': {'shape': 'doublecircle', 'style': 'filled', 'fillcolor': '#FFD700'},
+    'Gateway': {'shape': 'diamond', 'style': 'filled', 'fillcolor': '#FFA07A'},
+    'SequenceFlow': {'arrowhead': 'normal', 'color': '#000000'}
+}
+
+
+# 没有BPMN类型信息时，按形状补充渲染样式
+_SHAPE_STYLES = {
+    'circle': BPMN_STYLES['Event'],
+    'doublecircle': BPMN_STYLES['EndEvent'],
+    'diamond': BPMN_STYLES['Gateway'],
+    'rectangle': BPMN_STYLES['Task'],
+    'box': BPMN_STYLES['Task'],
+}
+
+
+def _unquote(value: str) -> str:
+    """去掉DOT字符串外层引号（svg_to_dot会多包一层引号）"""
+    while len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        value = value[1:-1].replace('\\"', '"')
+    return value
+
+
+def quote(value: str) -> str:
+    """按DOT语法为ID/标签加引号"""
+    return '"' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+
+
+_PLAIN_ID_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def _dot_id(value: str) -> str:
+    """简单ID原样输出，其余加引号"""
+    return value if _PLAIN_ID_RE.match(value) else quote(value)
+
+
+def scan_dot(dot: str) -> List[Tuple[str, str, int]]:
+    """DOT词法分析，返回 (类型, 文本, 起始位置)，跳过注释和空白"""
+    tokens = []
+    for m in _TOKEN_RE.finditer(dot):
+        kind = m.lastgroup
+        if kind in ("comment", "space"):
+            continue
+        tokens.append((kind, m.group(), m.start()))
+    return tokens
+
+
+def tokenize_dot(dot: str) -> List[Tuple[str, str]]:
+    return [(kind, value) for kind, value, _ in scan_dot(dot)]
+
+
+class GraphNode:
+    """流程节点；kind 为BPMN元素类型（如 userTask、parallelGateway），来自DOT时为空"""
+    __slots__ = ("index", "id", "label", "kind", "lane", "attrs")
+
+    def __init__(self, index: int, node_id: str):
+        self.index = index
+        self.id = node_id
+        self.label: Optional[str] = None
+        self.kind: Optional[str] = None
+        self.lane: Optional[str] = None
+        self.attrs: Optional[Dict[str, str]] = None
+
+    @property
+    def shape(self) -> Optional[str]:
+        return self.attrs.get("shape") if self.attrs else None
+
+
+class GraphEdge:
+    """顺序流；source/target 为节点下标"""
+    __slots__ = ("source", "target", "label", "attrs")
+
+    def __init__(self, source: int, target: int, label: Optional[str] = None,
+                 attrs: Optional[Dict[str, str]] = None):
+        self.source = source
+        self.target = target
+        self.label = label
+        self.attrs = attrs
+
+
+class BPMNGraph:
+    """
+    紧凑的流程图模型：节点按整数下标存放，邻接表也使用下标，
+    DOT解析和BPMN XML读取都构建该模型，结构分析直接在下标上运行。
+    """
+    __slots__ = ("nodes", "edges", "index", "successors", "predecessors")
+
+    def __init__(self):
+        self.nodes: List[GraphNode] = []
+        self.edges: List[GraphEdge] = []
+        self.index: Dict[str, int] = {}
+        self.successors: List[List[int]] = []
+        self.predecessors: List[List[int]] = []
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    def node_index(self, node_id: str) -> int:
+        """返回节点下标，不存在时创建占位节点（允许先引用后声明）"""
+        idx = self.index.get(node_id)
+        if idx is None:
+            idx = len(self.nodes)
+            self.index[node_id] = idx
+            self.nodes.append(GraphNode(idx, node_id))
+            self.successors.append([])
+            self.predecessors.append([])
+        return idx
+
+    def add_node(self, node_id: str, attrs: Optional[dict] = None, kind: Optional[str] = None,
+                 label: Optional[str] = None) -> GraphNode:
+        node = self.nodes[self.node_index(node_id)]
+        if attrs:
+            attrs = dict(attrs)
+            label = attrs.pop("label", label)
+            # 紧凑DOT中的 type/lane 属性对应BPMN元素类型和泳道
+            kind = attrs.pop("type", kind)
+            node.lane = attrs.pop("lane", node.lane)
+            if attrs:
+                node.attrs = {**(node.attrs or {}), **attrs}
+        if label:
+            node.label = label
+        if kind:
+            node.kind = kind
+        return node
+
+    def add_edge(self, source: str, target: str, attrs: Optional[dict] = None,
+                 label: Optional[str] = None) -> GraphEdge:
+        s, t = self.node_index(source), self.node_index(target)
+        if attrs:
+            attrs = dict(attrs)
+            label = attrs.pop("label", label)
+        edge = GraphEdge(s, t, label, attrs or None)
+        self.edges.append(edge)
+        self.successors[s].append(t)
+        self.predecessors[t].append(s)
+        return edge
+
+    def iter_indices(self) -> Iterator[int]:
+        return iter(range(len(self.nodes)))
+
+    def label(self, idx: int) -> str:
+        node = self.nodes[idx]
+        return node.label or node.id
+
+    def _text(self, idx: int) -> str:
+        node = self.nodes[idx]
+        return f"{node.id} {node.label or ''} {node.kind or ''}".lower()
+
+    def is_start(self, idx: int) -> bool:
+        node = self.nodes[idx]
+        if self.predecessors[idx]:
+            return False
+        if node.kind:
+            return node.kind == "startEvent"
+        return node.shape == "circle" or any(w in self._text(idx) for w in _START_WORDS)
+
+    def is_end(self, idx: int) -> bool:
+        node = self.nodes[idx]
+        if node.kind:
+            return node.kind == "endEvent"
+        if node.shape == "doublecircle":
+            return True
+        return any(w in self._text(idx) for w in _END_WORDS) and not self.successors[idx]
+
+    def is_gateway(self, idx: int) -> bool:
+        node = self.nodes[idx]
+        if node.kind:
+            return node.kind.endswith("Gateway")
+        return node.shape == "diamond" or "gateway" in self._text(idx)
+
+    def is_parallel_gateway(self, idx: int) -> bool:
+        if not self.is_gateway(idx):
+            return False
+        if self.nodes[idx].kind:
+            return self.nodes[idx].kind == "parallelGateway"
+        text = self._text(idx)
+        if any(w in text for w in _PARALLEL_WORDS):
+            return True
+        words = set(re.split(r'[\s_\-]+', text))
+        return any(w in words for w in _PARALLEL_SYMBOLS)
+
+    def start_nodes(self) -> List[int]:
+        starts = [i for i in self.iter_indices() if self.is_start(i)]
+        if not starts:
+            # 没有显式开始事件时，以没有入边但有出边的节点作为起点
+            starts = [i for i in self.iter_indices() if not self.predecessors[i] and self.successors[i]]
+        return starts
+
+    def _style_of(self, node: GraphNode) -> dict:
+        kind = node.kind or ""
+        if kind == "endEvent":
+            return BPMN_STYLES["EndEvent"]
+        if kind.endswith("Event"):
+            return BPMN_STYLES["Event"]
+        if kind.endswith("Gateway"):
+            return BPMN_STYLES["Gateway"]
+        if kind:
+            return BPMN_STYLES["Task"]
+        return _SHAPE_STYLES.get(node.shape, {"shape": node.shape or "box"})
+
+    def _compact_shape(self, node: GraphNode) -> Optional[str]:
+        """紧凑DOT中保留的形状：开始/结束事件与网关的形状在检查中有语义"""
+        if node.kind:
+            return self._style_of(node)["shape"]
+        return node.shape
+
+    def to_dot(self) -> str:
+        """输出与 svg_to_dot 风格一致的DOT"""
+        lines = ["// BPMN Diagram", "digraph {", "\trankdir=LR"]
+        for node in self.nodes:
+            attrs = {"label": node.label or node.id, **self._style_of(node)}
+            lines.append(f"\t{quote(node.id)} [" + " ".join(f"{k}={quote(v)}" for k, v in attrs.items()) + "]")
+        edge_style = " ".join(f"{k}={quote(v)}" for k, v in BPMN_STYLES["SequenceFlow"].items())
+        for edge in self.edges:
+            label = f" label={quote(edge.label)}" if edge.label else ""
+            lines.append(f"\t{quote(self.nodes[edge.source].id)} -> {quote(self.nodes[edge.target].id)}"
+                         f" [{edge_style}{label}]")
+        lines.append("\tcompound=true")
+        lines.append('\tsplines="ortho";')
+        lines.append('\tranksep="1.5 equally";')
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+    def compact_ids(self) -> List[str]:
+        """紧凑DOT使用的短ID（按节点下标依次为 n1、n2 …，同一张图每次生成的结果相同）"""
+        return [f"n{i + 1}" for i in range(len(self.nodes))]
+
+    def to_compact_dot(self, members: Optional[Sequence[int]] = None, context: Sequence[int] = (),
+                       keep_ids: bool = False) -> str:
+        """
+        用于提示词的规范紧凑DOT：短ID，每个节点只保留 label/shape/type/lane，
+        不含颜色、填充和布局属性，这些属性只在渲染时由 to_dot 补充。
+        members 指定时只输出这些节点（分片），context 为仅作上下文的相邻节点；
+        分片沿用整张图的短ID，各分片的检查结果可以直接合并。
+        keep_ids 时沿用节点自身的ID（图本身由紧凑DOT解析而来、ID已经是短ID时使用）。
+        """
+        ids = [_dot_id(node.id) for node in self.nodes] if keep_ids else self.compact_ids()
+        selected = list(self.iter_indices()) if members is None else list(members)
+        member_set = set(selected)
+        visible = member_set.union(context)
+        lines = ["digraph {"]
+        if context:
+            lines.append("// context-only nodes, checked in another shard: " + ", ".join(ids[i] for i in context))
+        for idx in selected + [i for i in context if i not in member_set]:
+            node = self.nodes[idx]
+            attrs = [f"label={quote(node.label or node.id)}"]
+            shape = self._compact_shape(node)
+            if shape:
+                attrs.append(f"shape={shape}")
+            if node.kind:
+                attrs.append(f"type={node.kind}")
+            if node.lane:
+                attrs.append(f"lane={quote(node.lane)}")
+            lines.append(f"{ids[idx]} [{' '.join(attrs)}]")
+        for edge in self.edges:
+            if members is not None and not (
+                    (edge.source in member_set or edge.target in member_set)
+                    and edge.source in visible and edge.target in visible):
+                continue
+            label = f" [label={quote(edge.label)}]" if edge.label else ""
+            lines.append(f"{ids[edge.source]} -> {ids[edge.target]}{label}")
+        lines.append("}")
+        return "\n".join(lines) + "\n"
+
+    def _copy_node(self, node: GraphNode):
+        copied = self.add_node(node.id, node.attrs, kind=node.kind, label=node.label)
+        copied.lane = node.lane
+
+    def replace_region(self, members: Sequence[int], fragment: "BPMNGraph") -> "BPMNGraph":
+        """
+        用修正后的区域片段替换 members 节点及与之相连的连线，返回新图，其余节点和连线保持不变。
+        片段中出现的区域外节点只作为连线端点（保留原有属性），两端都在区域外的连线忽略。
+        """
+        member_ids = {self.nodes[i].id for i in members}
+        merged = BPMNGraph()
+        for node in self.nodes:
+            if node.id not in member_ids:
+                merged._copy_node(node)
+        for node in fragment.nodes:
+            original = self.index.get(node.id)
+            if original is not None and node.id not in member_ids:
+                continue
+            if original is not None and not node.label and not node.kind and not node.attrs:
+                # 片段只在连线中引用了该节点，沿用原来的属性
+                merged._copy_node(self.nodes[original])
+            else:
+                merged._copy_node(node)
+        for edge in self.edges:
+            source, target = self.nodes[edge.source].id, self.nodes[edge.target].id
+            if source not in member_ids and target not in member_ids:
+                merged.add_edge(source, target, edge.attrs, label=edge.label)
+        for edge in fragment.edges:
+            source, target = fragment.nodes[edge.source].id, fragment.nodes[edge.target].id
+            if source in member_ids or target in member_ids or source not in self.index or target not in self.index:
+                merged.add_edge(source, target, edge.attrs, label=edge.label)
+        return merged
+
+    @classmethod
+    def from_dot(cls, dot: str) -> "BPMNGraph":
+        """宽松解析DOT：忽略无法识别的语句，只提取节点、边及其属性"""
+        graph = cls()
+        tokens = tokenize_dot(dot)
+        i, n = 0, len(tokens)
+
+        def parse_attrs(pos: int) -> Tuple[dict, int]:
+            attrs = {}
+            while pos < n and tokens[pos][1] == "[":
+                pos += 1
+                while pos < n and tokens[pos][1] != "]":
+                    key = tokens[pos][1]
+                    if pos + 2 < n and tokens[pos + 1][1] == "=":
+                        attrs[_unquote(key)] = _unquote(tokens[pos + 2][1])
+                        pos += 3
+                    else:
+                        pos += 1
+                    if pos < n and tokens[pos][1] in (",", ";"):
+                        pos += 1
+                pos += 1
+            return attrs, pos
+
+        while i < n:
+            kind, value = tokens[i]
+            if value.lower() in ("strict", "digraph", "subgraph") or (
+                    value.lower() == "graph" and i + 1 < n and tokens[i + 1][1] != "["):
+                # 图/子图声明，跳过可选的图名
+                i += 1
+                if i < n and tokens[i][0] in ("id", "string") and tokens[i][1].lower() not in _KEYWORDS:
+                    i += 1
+                continue
+            if kind in ("id", "string", "html") and value.lower() not in _KEYWORDS:
+                # 节点ID后可能跟端口 a:port
+                node_id = _unquote(value)
+                j = i + 1
+                if j + 1 < n and tokens[j][1] == ":":
+                    j += 2
+                if j < n and tokens[j][1] == "=":
+                    # 图属性 key=value
+                    i = j + 2
+                    continue
+                chain = [node_id]
+                while j + 1 < n and tokens[j][0] == "edgeop" and tokens[j + 1][0] in ("id", "string", "html"):
+                    chain.append(_unquote(tokens[j + 1][1]))
+                    j += 2
+                    if j + 1 < n and tokens[j][1] == ":":
+                        j += 2
+                attrs, j = parse_attrs(j)
+                if len(chain) == 1:
+                    graph.add_node(node_id, attrs)
+                else:
+                    for source, target in zip(chain, chain[1:]):
+                        graph.add_edge(source, target, attrs)
+                i = j
+            elif value.lower() in ("graph", "node", "edge") and i + 1 < n and tokens[i + 1][1] == "[":
+                # 默认属性语句
+                _, i = parse_attrs(i + 1)
+            else:
+                i += 1
+        return graph
+
+    def to_dict(self) -> dict:
+        """序列化为可写入JSON的结构（保留原始节点ID），用于保存分析基线"""
+        return {
+            "nodes": [{"id": n.id, "label": n.label, "kind": n.kind, "lane": n.lane, "attrs": n.attrs}
+                      for n in self.nodes],
+            "edges": [{"source": self.nodes[e.source].id, "target": self.nodes[e.target].id, "label": e.label}
+                      for e in self.edges]
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BPMNGraph":
+        graph = cls()
+        for item in data.get("nodes", []):
+            node = graph.add_node(item["id"], item.get("attrs"), kind=item.get("kind"), label=item.get("label"))
+            node.lane = item.get("lane")
+        for item in data.get("edges", []):
+            graph.add_edge(item["source"], item["target"], label=item.get("label"))
+        return graph
+
+
+def compact_dot(dot: str) -> str:
+    """把任意DOT转换为用于提示词的紧凑形式；无法解析出节点时原样返回"""
+    graph = BPMNGraph.from_dot(dot)
+    return graph.to_compact_dot() if graph.nodes else dot
+
+
+def render_dot(dot: str) -> str:
+    """渲染前为（紧凑）DOT补回BPMN样式和布局属性；无法解析出节点时原样返回"""
+    graph = BPMNGraph.from_dot(dot)
+    return graph.to_dot() if graph.nodes else dot
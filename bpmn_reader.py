@@ -0,0 +1,181 @@
+import codecs
+import io
+import logging
+import re
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from typing import BinaryIO, Union
+
+from bpmn_graph import BPMNGraph
+
+logger = logging.getLogger(__name__)
+
+BPMN_NS = "http://www.omg.org/spec/BPMN/20100524/MODEL"
+
+# 很多导出文件（如 test_sample/test*/sample*.bpmn）使用 bpmn: 前缀却没有声明命名空间，
+# 读取时用一个声明了常用前缀的外层元素包裹整个文档
+_WRAPPER_START = (
+    '<bpmn-reader-root'
+    ' xmlns:bpmn="http://www.omg.org/spec/BPMN/20100524/MODEL"'
+    ' xmlns:bpmn2="http://www.omg.org/spec/BPMN/20100524/MODEL"'
+    ' xmlns:bpmndi="http://www.omg.org/spec/BPMN/20100524/DI"'
+    ' xmlns:dc="http://www.omg.org/spec/DD/20100524/DC"'
+    ' xmlns:di="http://www.omg.org/spec/DD/20100524/DI"'
+    ' xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance"'
+    ' xmlns:camunda="http://camunda.org/schema/1.0/bpmn"'
+    ' xmlns:activiti="http://activiti.org/bpmn"'
+    ' xmlns:flowable="http://flowable.org/bpmn">'
+).encode("utf-8")
+_WRAPPER_END = b"</bpmn-reader-root>"
+_PROLOG_RE = re.compile(rb'^\s*(<\?xml[^>]*\?>)?\s*(<!DOCTYPE[^>]*>)?', re.IGNORECASE)
+_ENCODING_RE = re.compile(rb'encoding\s*=\s*["\']([A-Za-z0-9._-]+)["\']')
+# expat 能直接解析的编码；其余（如 GBK 等多字节编码）在读取时转为UTF-8
+_EXPAT_ENCODINGS = {"utf-8", "ascii", "iso8859-1"}
+
+# 作为流程节点读取的BPMN元素
+FLOW_NODE_TAGS = {
+    "startEvent", "endEvent", "intermediateCatchEvent", "intermediateThrowEvent", "boundaryEvent",
+    "task", "userTask", "serviceTask", "scriptTask", "manualTask", "sendTask", "receiveTask",
+    "businessRuleTask", "callActivity", "subProcess", "transaction",
+    "exclusiveGateway", "parallelGateway", "inclusiveGateway", "eventBasedGateway", "complexGateway",
+}
+# 图形信息（bpmndi）不参与建模，读到即丢弃
+_DIAGRAM_TAGS = {"BPMNShape", "BPMNEdge", "BPMNPlane", "BPMNDiagram", "BPMNLabel"}
+
+
+class _WrappedStream(io.RawIOBase):
+    """在原始字节流外包裹命名空间声明，逐块读取，不把整个文件读入内存"""
+
+    def __init__(self, raw: BinaryIO, chunk_size: int = 64 * 1024):
+        self._raw = raw
+        self._chunk_size = chunk_size
+        self._pending = b""
+        self._stage = 0  # 0: 未开始 1: 正文 2: 已结束
+        self._decoder = None  # 声明了 expat 不支持的编码时，把正文转为UTF-8
+
+    def readable(self) -> bool:
+        return True
+
+    def _start(self) -> bytes:
+        head = self._raw.read(self._chunk_size)
+        if head.startswith(codecs.BOM_UTF8):
+            head = head[len(codecs.BOM_UTF8):]
+        # XML声明（含 encoding）保留在外层元素之前；DOCTYPE 只能出现在根元素之前，去掉
+        prolog = _PROLOG_RE.match(head)
+        declaration, body = prolog.group(1) or b"", head[prolog.end():]
+        encoding = _ENCODING_RE.search(declaration)
+        if encoding:
+            try:
+                name = codecs.lookup(encoding.group(1).decode("ascii")).name
+            except LookupError:
+                name = None  # 未知编码交给 expat 报错
+            if name and name not in _EXPAT_ENCODINGS:
+                self._decoder = codecs.getincrementaldecoder(name)()
+                declaration, body = b"", self._decoder.decode(body).encode("utf-8")
+        return declaration + _WRAPPER_START + body
+
+    def _next_chunk(self) -> bytes:
+        if self._stage == 0:
+            self._stage = 1
+            return self._start()
+        while self._stage == 1:
+            chunk = self._raw.read(self._chunk_size)
+            if self._decoder is not None:
+                # 多字节字符可能跨块，解码器会留到下一块再输出
+                text = self._decoder.decode(chunk, final=not chunk)
+                if text:
+                    return text.encode("utf-8")
+            elif chunk:
+                return chunk
+            if not chunk:
+                self._stage = 2
+                return _WRAPPER_END
+        return b""
+
+    def readinto(self, buffer) -> int:
+        while not self._pending:
+            chunk = self._next_chunk()
+            if not chunk:
+                return 0
+            self._pending = chunk
+        n = min(len(buffer), len(self._pending))
+        buffer[:n] = self._pending[:n]
+        self._pending = self._pending[n:]
+        return n
+
+
+def _local(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def read_bpmn(source: Union[str, Path, BinaryIO]) -> BPMNGraph:
+    """
+    单遍流式读取 BPMN 2.0 XML，构建紧凑的 BPMNGraph。
+    元素处理完即从树上移除，内存占用与图模型本身成正比，而不是与XML文件大小成正比。
+    """
+    graph = BPMNGraph()
+    close = False
+    if isinstance(source, (str, Path)):
+        raw = open(source, "rb")
+        close = True
+    else:
+        raw = source
+    try:
+        stream = io.BufferedReader(_WrappedStream(raw))
+        parents = []
+        lane_stack = []
+        for event, elem in ET.iterparse(stream, events=("start", "end")):
+            if event == "start":
+                parents.append(elem)
+                if _local(elem.tag) == "lane":
+                    lane_stack.append(elem.get("name") or elem.get("id"))
+                continue
+
+            parents.pop()
+            tag = _local(elem.tag)
+            handled = True
+            if tag in FLOW_NODE_TAGS and elem.get("id"):
+                graph.add_node(elem.get("id"), kind=tag, label=(elem.get("name") or "").strip() or None)
+            elif tag == "sequenceFlow" and elem.get("sourceRef") and elem.get("targetRef"):
+                label = elem.get("name")
+                if not label:
+                    for child in elem:
+                        if _local(child.tag) == "conditionExpression" and (child.text or "").strip():
+                            label = child.text.strip()
+                graph.add_edge(elem.get("sourceRef"), elem.get("targetRef"), label=label)
+            elif tag == "flowNodeRef" and lane_stack and (elem.text or "").strip():
+                graph.nodes[graph.node_index(elem.text.strip())].lane = lane_stack[-1]
+            elif tag == "lane":
+                lane_stack.pop()
+            elif tag not in _DIAGRAM_TAGS:
+                handled = False
+
+            if handled:
+                # 释放已处理的元素，并从父节点中移除，保持内存有界
+                elem.clear()
+                if parents and len(parents[-1]) and parents[-1][-1] is elem:
+                    del parents[-1][-1]
+    finally:
+        if close:
+            raw.close()
+    return graph
+
+
+def bpmn_to_dot(source: Union[str, Path, BinaryIO]) -> str:
+    """读取BPMN XML并直接输出DOT（不经过SVG）"""
+    return read_bpmn(source).to_dot()
+
+
+def is_bpmn_file(path: Union[str, Path]) -> bool:
+    """根据扩展名或文件头判断是否为BPMN XML"""
+    path = Path(path)
+    if path.suffix.lower() in (".bpmn", ".bpmn2", ".xml"):
+        return True
+    if path.suffix.lower() == ".svg":
+        return False
+    try:
+        with open(path, "rb") as f:
+            head = f.read(2048)
+    except OSError:
+        return False
+    return b"bpmn" in head.lower() and b"<svg" not in head.lower()
@@ -0,0 +1,24 @@
+import re
+from typing import Iterable, List, Optional
+
+from pydantic import BaseModel
+
+
+class ErrorInfo(BaseModel):
+    error_type: str  # 错误分类
+    description: str    # 错误描述
+    suggestion: str     # 错误修复建议
+    source : str        # 错误来源
+    element_id: Optional[str] = None  # 相关节点ID（可选），用于增量分析时定位结果
+
+
+def dedupe_errors(errors: Iterable[ErrorInfo]) -> List[ErrorInfo]:
+    """合并多份检查结果，去掉类型和描述相同的重复项（忽略大小写和空白差异），保持原有顺序"""
+    seen = set()
+    merged = []
+    for error in errors:
+        key = (error.error_type.strip().lower(), re.sub(r'\s+', ' ', error.description).strip().lower())
+        if key not in seen:
+            seen.add(key)
+            merged.append(error)
+    return merged
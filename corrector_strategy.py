@@ -0,0 +1,52 @@
+import asyncio
+import logging
+from typing import Awaitable, Dict, Optional
+
+from dot_validator import is_valid_dot
+
+logger = logging.getLogger(__name__)
+
+# 修正策略
+STRATEGY_RACE = "race"                            # 两个修正专家同时运行，取第一个有效结果并取消另一个
+STRATEGY_FAST_THEN_UPGRADE = "fast-then-upgrade"  # 先返回快速修正结果，综合修正结果稍后送达
+STRATEGY_SINGLE = "single"                        # 只运行综合修正专家
+CORRECTOR_STRATEGIES = (STRATEGY_RACE, STRATEGY_FAST_THEN_UPGRADE, STRATEGY_SINGLE)
+
+
+class CorrectionRace:
+    """
+    race 策略下两个修正专家共享的协调器。
+    第一个产生有效DOT的专家获胜，其余仍在进行的LLM调用被取消。
+    取消只停止等待：异步 provider 的请求随之中断，同步 provider 的调用在线程中继续运行到模型返回，
+    结果被丢弃但费用照常产生（见 LLMScheduler.aask）。
+    """
+
+    def __init__(self):
+        self.winner: Optional[str] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def run(self, name: str, coro: Awaitable[str]) -> Optional[str]:
+        """执行一次修正调用；若被其他专家抢先则返回 None"""
+        if self.winner is not None:
+            coro.close()
+            return None
+        task = asyncio.ensure_future(coro)
+        self._tasks[name] = task
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if self.winner is not None and self.winner != name:
+                logger.info(f"{name} 的修正已被 {self.winner} 抢先完成，取消本次调用")
+                return None
+            raise
+        finally:
+            self._tasks.pop(name, None)
+
+        if self.winner is None and is_valid_dot(result):
+            self.winner = name
+            for other, other_task in list(self._tasks.items()):
+                if other != name and not other_task.done():
+                    other_task.cancel()
+        elif self.winner is not None and self.winner != name:
+            return None
+        return result
@@ -0,0 +1,315 @@
+import logging
+import re
+from typing import List, Optional, Tuple
+
+from bpmn_graph import scan_dot
+
+logger = logging.getLogger(__name__)
+
+_KEYWORDS = {"strict", "graph", "digraph", "subgraph", "node", "edge"}
+
+_FENCE_RE = re.compile(r'```[\w-]*')
+# { 可以写在下一行（digraph G 换行后再 {），此时 graph 与 { 之间只能有图名
+_HEADER_RE = re.compile(r'\b(?:strict\s+)?(?:di)?graph\b(?:[^{\n]*|[ \t]*(?:"[^"\n]*"|[\w.]+)?[ \t]*\n\s*)\{',
+                        re.IGNORECASE)
+# 单独成行的图/子图头部（{ 在下一行），不是说明文字
+_GRAPH_HEADER_LINE_RE = re.compile(r'^(?:strict\s+)?(?:sub|di)?graph(?:\s+(?:"[^"]*"|[\w.]+))?$', re.IGNORECASE)
+# A[Start] / A [Start Event]：方括号内只有文字、没有 key=value
+_BARE_LABEL_RE = re.compile(r'\[\s*([^\[\]=",;]+?)\s*\]')
+# label=Start Event：未加引号且含空格等字符的标签
+_UNQUOTED_LABEL_RE = re.compile(r'\blabel\s*=\s*(?!["<])([^,;\]\n]*?)(?=\s*(?:[,;\]]|\s\w+\s*=|$))')
+# 连线中间带属性的节点：A[label="Start"] -> B
+_DOT_ID = r'(?:"(?:\\.|[^"\\])*"|[A-Za-z_\u0080-\uffff][\w\u0080-\uffff]*|-?\d+(?:\.\d+)?)'
+_NODE_ATTRS_RE = re.compile(rf'({_DOT_ID})\s*(\[[^\[\]]*\])')
+_EDGE_CHAIN_RE = re.compile(rf'{_DOT_ID}\s*(?:\[[^\[\]]*\])?(?:\s*(?:->|--)\s*{_DOT_ID}\s*(?:\[[^\[\]]*\])?)+')
+_SIMPLE_ID_RE = re.compile(r'^(?:[A-Za-z_\u0080-\uffff][\w\u0080-\uffff]*|-?(?:\.\d+|\d+(?:\.\d*)?))$')
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "„": '"', "＂": '"'})
+
+
+class DotSyntaxError(ValueError):
+    """DOT语法错误，带行号和列号，用于提示模型具体修复哪里"""
+
+    def __init__(self, message: str, line: int, column: int):
+        super().__init__(f"line {line}, column {column}: {message}")
+        self.line = line
+        self.column = column
+
+
+class _Parser:
+    """按 Graphviz 的DOT文法做严格的递归下降解析，只校验语法，不构建图"""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.tokens = scan_dot(text)
+        self.pos = 0
+        self.directed = True
+        self.statements = 0
+
+    def _peek(self) -> Optional[Tuple[str, str, int]]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def _value(self) -> Optional[str]:
+        token = self._peek()
+        return token[1] if token else None
+
+    def _error(self, message: str) -> DotSyntaxError:
+        token = self._peek()
+        offset = token[2] if token else len(self.text)
+        line = self.text.count("\n", 0, offset) + 1
+        column = offset - (self.text.rfind("\n", 0, offset) + 1) + 1
+        return DotSyntaxError(message, line, column)
+
+    def _found(self) -> str:
+        token = self._peek()
+        if token is None:
+            return "end of input"
+        if token[0] == "other" and token[1] == '"':
+            return "an unterminated string"
+        return f"'{token[1]}'"
+
+    def _expect(self, value: str):
+        if self._value() != value:
+            raise self._error(f"expected '{value}', found {self._found()}")
+        self.pos += 1
+
+    def _keyword(self) -> Optional[str]:
+        token = self._peek()
+        if token and token[0] == "id" and token[1].lower() in _KEYWORDS:
+            return token[1].lower()
+        return None
+
+    def _is_id(self) -> bool:
+        token = self._peek()
+        if token is None or token[0] not in ("id", "string", "html") or self._keyword() is not None:
+            return False
+        if token[0] == "id" and not _SIMPLE_ID_RE.match(token[1]):
+            # 词法分析为兼容旧数据允许ID中出现 '.'，Graphviz 不接受
+            raise self._error(f"invalid id '{token[1]}', quote ids that contain punctuation")
+        return True
+
+    def _id(self, what: str):
+        if not self._is_id():
+            raise self._error(f"expected {what}, found {self._found()}")
+        self.pos += 1
+
+    def parse(self) -> int:
+        if self._keyword() == "strict":
+            self.pos += 1
+        keyword = self._keyword()
+        if keyword not in ("graph", "digraph"):
+            raise self._error(f"expected 'digraph' or 'graph', found {self._found()}")
+        self.directed = keyword == "digraph"
+        self.pos += 1
+        if self._is_id():
+            self.pos += 1
+        self._expect("{")
+        self._stmt_list()
+        self._expect("}")
+        if self._peek() is not None:
+            raise self._error(f"unexpected {self._found()} after the closing '}}'")
+        return self.statements
+
+    def _stmt_list(self):
+        while self._peek() is not None and self._value() != "}":
+            self._stmt()
+            if self._value() == ";":
+                self.pos += 1
+
+    def _stmt(self):
+        keyword = self._keyword()
+        if keyword in ("graph", "node", "edge"):
+            self.pos += 1
+            if self._value() != "[":
+                raise self._error(f"expected '[' after '{keyword}', found {self._found()}")
+            self._attr_list()
+            return
+        if keyword == "subgraph" or self._value() == "{":
+            self._subgraph()
+            self._edge_rhs()
+            self._attr_list()
+            return
+        if not self._is_id():
+            raise self._error(f"unexpected {self._found()}")
+        self.pos += 1
+        if self._value() == "=":
+            self.pos += 1
+            self._id("a value after '='")
+            return
+        self._port()
+        self.statements += 1
+        self._edge_rhs()
+        self._attr_list()
+
+    def _port(self):
+        for _ in range(2):
+            if self._value() != ":":
+                return
+            self.pos += 1
+            self._id("a port name after ':'")
+
+    def _edge_rhs(self):
+        while self._peek() is not None and self._peek()[0] == "edgeop":
+            op = self._value()
+            if self.directed and op == "--":
+                raise self._error("'--' is not allowed in a digraph, use '->'")
+            if not self.directed and op == "->":
+                raise self._error("'->' is not allowed in an undirected graph, use '--'")
+            self.pos += 1
+            if self._keyword() == "subgraph" or self._value() == "{":
+                self._subgraph()
+            else:
+                self._id(f"a node id after '{op}'")
+                self._port()
+
+    def _subgraph(self):
+        if self._keyword() == "subgraph":
+            self.pos += 1
+            if self._is_id():
+                self.pos += 1
+        self._expect("{")
+        self._stmt_list()
+        self._expect("}")
+
+    def _attr_list(self):
+        while self._value() == "[":
+            self.pos += 1
+            while self._value() != "]":
+                if self._peek() is None:
+                    raise self._error("missing ']' to close the attribute list")
+                if not self._is_id():
+                    raise self._error(f"expected an attribute name or ']', found {self._found()}")
+                name = self._value()
+                self.pos += 1
+                if self._value() != "=":
+                    raise self._error(f"expected '=' after attribute '{name}', found {self._found()} "
+                                      f"(write attributes as key=\"value\", e.g. [label=\"{name}\"])")
+                self.pos += 1
+                self._id(f"a value for attribute '{name}'")
+                if self._value() in (",", ";"):
+                    self.pos += 1
+            self.pos += 1
+
+
+def validate_dot(text: str) -> int:
+    """严格校验DOT语法，返回节点/连线语句数；有错误时抛出 DotSyntaxError"""
+    return _Parser(text).parse()
+
+
+def _quote_label(match: re.Match) -> str:
+    value = match.group(1).strip()
+    if _SIMPLE_ID_RE.match(value):
+        return match.group(0)
+    return 'label="' + value.replace('"', '\\"') + '"'
+
+
+def _hoist_node_attrs(line: str) -> str:
+    """
+    A[label="Start"] -> B[label="End"]：节点属性写在了连线中间（DOT只允许写在语句末尾）。
+    把这条连线中所有节点的属性拆成单独的节点语句放在连线之前，连线只保留节点ID。
+    """
+    def split_chain(chain: re.Match) -> str:
+        text = chain.group(0)
+        if not re.search(r'\]\s*(?:->|--)', text):
+            # 只有末尾的属性时是合法的连线属性
+            return text
+        declarations = []
+
+        def hoist(match: re.Match) -> str:
+            declarations.append(f"{match.group(1)} {match.group(2)};")
+            return match.group(1)
+
+        edge = _NODE_ATTRS_RE.sub(hoist, text)
+        return " ".join(declarations + [edge])
+
+    return _EDGE_CHAIN_RE.sub(split_chain, line)
+
+
+def _is_prose(line: str) -> bool:
+    """不含任何DOT符号、却含有空格的行视为说明文字（裸节点语句不会含空格）；单独成行的 digraph G、subgraph cluster_x 除外"""
+    stripped = line.strip()
+    return bool(stripped) and " " in stripped and not _GRAPH_HEADER_LINE_RE.match(stripped) and not any(ch in stripped for ch in '[]{}=;"<>') \
+        and "->" not in stripped and "--" not in stripped
+
+
+def repair_dot(text: str) -> str:
+    """
+    修复模型输出中常见的DOT错误：markdown 代码块、前后的说明文字、字面量 \\n、
+    中文引号、A[Start] 形式的节点（包括写在连线中间的 A[Start] -> B）、未加引号的标签、
+    缺少的 ] 和 }、digraph 中的 --。
+    只做确定性的文本修补，结果仍需 validate_dot 校验。
+    """
+    text = _FENCE_RE.sub("", text or "").replace("\r\n", "\n").translate(_SMART_QUOTES)
+    # 整段输出被转义成一行时还原换行（标签内的 \n 是合法转义，不能无条件替换）
+    if "\n" not in text.strip() and "\\n" in text:
+        text = text.replace("\\n", "\n").replace('\\"', '"')
+
+    header = _HEADER_RE.search(text)
+    if header:
+        text = text[header.start():]
+        end = text.rfind("}")
+        if end >= 0:
+            text = text[:end + 1]
+    else:
+        body = [line for line in text.splitlines() if "->" in line or "--" in line or "[" in line]
+        text = "digraph {\n" + "\n".join(body) + "\n}"
+    directed = not re.match(r'\s*(?:strict\s+)?graph\b', text, re.IGNORECASE)
+
+    lines: List[str] = []
+    for line in text.splitlines():
+        if _is_prose(line):
+            continue
+        line = _BARE_LABEL_RE.sub(lambda m: f'[label="{m.group(1).strip()}"]', line)
+        line = _UNQUOTED_LABEL_RE.sub(_quote_label, line)
+        if directed:
+            line = re.sub(r'\s--\s', ' -> ', line)
+        opened = sum(1 for _, value, _ in scan_dot(line) if value == "[")
+        closed = sum(1 for _, value, _ in scan_dot(line) if value == "]")
+        if opened > closed:
+            stripped = line.rstrip()
+            suffix = ";" if stripped.endswith(";") else ""
+            line = stripped[:len(stripped) - len(suffix)] + "]" * (opened - closed) + suffix
+        lines.append(_hoist_node_attrs(line))
+    text = "\n".join(lines)
+
+    depth = 0
+    for _, value, _ in scan_dot(text):
+        if value == "{":
+            depth += 1
+        elif value == "}":
+            depth -= 1
+    if depth > 0:
+        text += "\n" + "}" * depth
+    while depth < 0 and text.rstrip().endswith("}"):
+        text = text.rstrip()[:-1]
+        depth += 1
+    return text.strip() + "\n"
+
+
+def normalize_dot(text: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    校验（必要时自动修复）模型输出的DOT。
+    返回 (可用的DOT, None)；无法修复时返回 (None, 修复后仍存在的解析错误)。
+    """
+    if not text or not text.strip():
+        return None, "empty output, expected DOT code"
+    candidate = text.strip()
+    try:
+        # 语法上合法的说明文字（如 "Note that I added"）会被当成节点，也需要修复
+        if validate_dot(candidate) and not any(_is_prose(line) for line in candidate.splitlines()):
+            return candidate + "\n", None
+    except DotSyntaxError:
+        pass
+    if not _HEADER_RE.search(text) and "->" not in text and "--" not in text:
+        return None, "no 'digraph { ... }' block found in the output"
+    repaired = repair_dot(text)
+    try:
+        if not validate_dot(repaired):
+            return None, "the graph has no nodes or edges"
+    except DotSyntaxError as e:
+        return None, str(e)
+    return repaired, None
+
+
+def is_valid_dot(text: Optional[str]) -> bool:
+    """修正结果是否为可用（或可自动修复）的DOT"""
+    return normalize_dot(text)[0] is not None
@@ -0,0 +1,112 @@
+from collections import Counter, deque
+from typing import Dict, List, Optional, Set, Tuple
+
+from bpmn_graph import BPMNGraph
+
+
+def _signature(graph: BPMNGraph, idx: int) -> Tuple[Optional[str], ...]:
+    node = graph.nodes[idx]
+    return node.label, node.kind, node.lane, node.shape
+
+
+class GraphDiff:
+    """
+    两个版本流程图的结构差异。
+    mapping 为旧图下标 → 新图下标；added/changed 为新图下标，removed 为旧图下标；
+    连线以 (起点, 终点, 标签) 表示，新增连线使用新图下标，删除连线使用旧图下标。
+    """
+    __slots__ = ("mapping", "added_nodes", "removed_nodes", "changed_nodes", "added_edges", "removed_edges")
+
+    def __init__(self):
+        self.mapping: Dict[int, int] = {}
+        self.added_nodes: List[int] = []
+        self.removed_nodes: List[int] = []
+        self.changed_nodes: List[int] = []
+        self.added_edges: List[Tuple[int, int, Optional[str]]] = []
+        self.removed_edges: List[Tuple[int, int, Optional[str]]] = []
+
+    def __len__(self) -> int:
+        return (len(self.added_nodes) + len(self.removed_nodes) + len(self.changed_nodes)
+                + len(self.added_edges) + len(self.removed_edges))
+
+    def affected(self, old: BPMNGraph, new: BPMNGraph, hops: int = 1) -> Set[int]:
+        """受修改影响的新图节点：新增/修改的节点、变化连线的端点、被删节点的邻居，再向外扩展 hops 跳"""
+        seeds = set(self.added_nodes) | set(self.changed_nodes)
+        for source, target, _ in self.added_edges:
+            seeds.update((source, target))
+        for source, target, _ in self.removed_edges:
+            seeds.update(self.mapping[i] for i in (source, target) if i in self.mapping)
+        for idx in self.removed_nodes:
+            seeds.update(self.mapping[i] for i in old.successors[idx] + old.predecessors[idx] if i in self.mapping)
+
+        affected = set(seeds)
+        frontier = deque((idx, 0) for idx in seeds)
+        while frontier:
+            idx, depth = frontier.popleft()
+            if depth >= hops:
+                continue
+            for nxt in new.successors[idx] + new.predecessors[idx]:
+                if nxt not in affected:
+                    affected.add(nxt)
+                    frontier.append((nxt, depth + 1))
+        return affected
+
+    def describe(self, old: BPMNGraph, new: BPMNGraph) -> List[str]:
+        """可读的修改明细"""
+        details = [f"新增节点 {new.label(i)}（{new.nodes[i].id}）" for i in self.added_nodes]
+        details += [f"删除节点 {old.label(i)}（{old.nodes[i].id}）" for i in self.removed_nodes]
+        old_index = {new_idx: old_idx for old_idx, new_idx in self.mapping.items()}
+        for idx in self.changed_nodes:
+            before, after = _signature(old, old_index[idx]), _signature(new, idx)
+            fields = [f"{name} {b or '-'} → {a or '-'}"
+                      for name, b, a in zip(("标签", "类型", "泳道", "形状"), before, after) if b != a]
+            details.append(f"修改节点 {new.nodes[idx].id}：{'，'.join(fields)}")
+        details += [f"新增连线 {new.label(s)} → {new.label(t)}" for s, t, _ in self.added_edges]
+        details += [f"删除连线 {old.label(s)} → {old.label(t)}" for s, t, _ in self.removed_edges]
+        return details
+
+
+def diff_graphs(old: BPMNGraph, new: BPMNGraph) -> GraphDiff:
+    """
+    计算两个版本之间的节点/连线差异。
+    节点先按ID匹配；剩余节点再按 (标签, 类型) 唯一匹配，以兼容重新编号的ID。
+    """
+    diff = GraphDiff()
+    for idx, node in enumerate(old.nodes):
+        new_idx = new.index.get(node.id)
+        if new_idx is not None:
+            diff.mapping[idx] = new_idx
+
+    matched_new = set(diff.mapping.values())
+    unmatched_old: Dict[Tuple, List[int]] = {}
+    unmatched_new: Dict[Tuple, List[int]] = {}
+    for idx, node in enumerate(old.nodes):
+        if idx not in diff.mapping:
+            unmatched_old.setdefault((node.label, node.kind), []).append(idx)
+    for idx, node in enumerate(new.nodes):
+        if idx not in matched_new:
+            unmatched_new.setdefault((node.label, node.kind), []).append(idx)
+    for key, old_indices in unmatched_old.items():
+        new_indices = unmatched_new.get(key, [])
+        if key[0] and len(old_indices) == 1 and len(new_indices) == 1:
+            diff.mapping[old_indices[0]] = new_indices[0]
+
+    matched_new = set(diff.mapping.values())
+    diff.removed_nodes = [i for i in old.iter_indices() if i not in diff.mapping]
+    diff.added_nodes = [i for i in new.iter_indices() if i not in matched_new]
+    diff.changed_nodes = sorted(new_idx for old_idx, new_idx in diff.mapping.items()
+                                if _signature(old, old_idx) != _signature(new, new_idx))
+
+    # 旧连线换算到新图下标后按多重集合比较
+    old_edges = Counter()
+    for edge in old.edges:
+        source, target = diff.mapping.get(edge.source), diff.mapping.get(edge.target)
+        if source is None or target is None:
+            diff.removed_edges.append((edge.source, edge.target, edge.label))
+        else:
+            old_edges[(source, target, edge.label)] += 1
+    new_edges = Counter((edge.source, edge.target, edge.label) for edge in new.edges)
+    diff.added_edges = list((new_edges - old_edges).elements())
+    new_index = {new_idx: old_idx for old_idx, new_idx in diff.mapping.items()}
+    diff.removed_edges += [(new_index[s], new_index[t], label) for s, t, label in (old_edges - new_edges).elements()]
+    return diff
@@ -0,0 +1,124 @@
+import logging
+import os
+from collections import deque
+from typing import Dict, List, Optional, Sequence
+
+from bpmn_graph import BPMNGraph
+from prompt_budget import PROMPT_TEMPLATE_TOKENS, max_nodes_for_budget
+
+logger = logging.getLogger(__name__)
+
+# 单个分片的最大节点数（不含边界上下文节点），超过该规模的流程图才会切分
+SHARD_MAX_NODES = int(os.getenv("SHARD_MAX_NODES", "80"))
+# 同时检查的分片数上限
+SHARD_CONCURRENCY = int(os.getenv("SHARD_CONCURRENCY", "4"))
+
+
+def shard_max_nodes(budget: int, dot_tokens: int, nodes: int) -> int:
+    """
+    检测分片的节点数上限：SHARD_MAX_NODES 与模型提示词预算能放下的节点数中较小者。
+    执行计划和流程检测专家都按这里切分；预算连模板都放不下时为0。
+    """
+    return min(SHARD_MAX_NODES, max_nodes_for_budget(dot_tokens, nodes, budget - PROMPT_TEMPLATE_TOKENS))
+
+
+class Shard:
+    """流程图的一个分片：members 为本分片负责检查的节点，boundary 为相邻分片中仅作上下文的节点"""
+    __slots__ = ("members", "boundary")
+
+    def __init__(self, members: List[int], boundary: List[int]):
+        self.members = members
+        self.boundary = boundary
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+
+def _components(graph: BPMNGraph, selected: List[int]) -> List[List[int]]:
+    """selected 节点之间的弱连通分量（忽略边的方向），按节点出现顺序排列"""
+    seen = [True] * len(graph)
+    for idx in selected:
+        seen[idx] = False
+    components = []
+    for root in selected:
+        if seen[root]:
+            continue
+        seen[root] = True
+        component, queue = [], deque([root])
+        while queue:
+            idx = queue.popleft()
+            component.append(idx)
+            for nxt in graph.successors[idx] + graph.predecessors[idx]:
+                if not seen[nxt]:
+                    seen[nxt] = True
+                    queue.append(nxt)
+        components.append(sorted(component))
+    return components
+
+
+def _split_by_lane(graph: BPMNGraph, component: List[int]) -> List[List[int]]:
+    """按泳道（参与者）分组；没有泳道信息或只有一个泳道时保持原样"""
+    lanes: Dict[Optional[str], List[int]] = {}
+    for idx in component:
+        lanes.setdefault(graph.nodes[idx].lane, []).append(idx)
+    return list(lanes.values()) if len(lanes) > 1 else [component]
+
+
+def _split_bounded(graph: BPMNGraph, group: List[int], max_nodes: int) -> List[List[int]]:
+    """按流程方向做广度优先遍历，把节点切成不超过 max_nodes 的连续区域"""
+    if len(group) <= max_nodes:
+        return [group]
+    in_group = set(group)
+    roots = [i for i in group if not any(p in in_group for p in graph.predecessors[i])] or group[:1]
+    seen, order = set(), []
+    for root in roots + group:
+        if root in seen:
+            continue
+        seen.add(root)
+        queue = deque([root])
+        while queue:
+            idx = queue.popleft()
+            order.append(idx)
+            for nxt in graph.successors[idx] + graph.predecessors[idx]:
+                if nxt in in_group and nxt not in seen:
+                    seen.add(nxt)
+                    queue.append(nxt)
+    return [order[i:i + max_nodes] for i in range(0, len(order), max_nodes)]
+
+
+def _boundary(graph: BPMNGraph, members: Sequence[int]) -> List[int]:
+    member_set = set(members)
+    boundary = {nxt for idx in members for nxt in graph.successors[idx] + graph.predecessors[idx]}
+    return sorted(boundary - member_set)
+
+
+def partition_graph(graph: BPMNGraph, max_nodes: int = SHARD_MAX_NODES,
+                    members: Optional[Sequence[int]] = None) -> List[Shard]:
+    """
+    把大流程图切分为可并行检查的分片：
+    先按连通分量，过大的分量再按泳道，仍然过大的按流程方向切成有界区域；
+    过小的分组合并到同一分片，避免孤立节点各占一次模型调用。
+    每个分片带上一跳范围内的边界节点，使跨分片的连线在两侧都可见。
+    members 指定时只切分这些节点（增量分析中受修改影响的区域）。
+    """
+    selected = list(graph.iter_indices()) if members is None else sorted(set(members))
+    if not selected:
+        return []
+    if len(selected) <= max_nodes:
+        return [Shard(selected, _boundary(graph, selected))]
+
+    groups: List[List[int]] = []
+    for component in _components(graph, selected):
+        if len(component) <= max_nodes:
+            groups.append(component)
+            continue
+        for lane_group in _split_by_lane(graph, component):
+            groups.extend(_split_bounded(graph, lane_group, max_nodes))
+
+    packed: List[List[int]] = []
+    for group in groups:
+        if packed and len(packed[-1]) + len(group) <= max_nodes:
+            packed[-1] = packed[-1] + group
+        else:
+            packed.append(group)
+    return [Shard(members, _boundary(graph, members)) for members in packed]
@@ -0,0 +1,126 @@
+import json
+import logging
+import os
+from typing import List, Optional
+
+from artifact_store import ArtifactStore, get_artifact_store
+from bpmn_graph import BPMNGraph
+from bpmn_schema import ErrorInfo
+from graph_diff import GraphDiff, diff_graphs
+
+logger = logging.getLogger(__name__)
+
+# 分析基线（图结构 + 流程检测结果）保存在产物存储中，任一worker/主机都能按 run_id 读取；
+# 保留数量（由服务的定期清理任务按此清理，见 backend/main.py）
+BASELINE_ARTIFACT_PREFIX = "baseline_"
+BASELINE_KEEP = int(os.getenv("BASELINE_KEEP", "200"))
+# 受影响区域向外扩展的跳数
+INCREMENTAL_HOPS = int(os.getenv("INCREMENTAL_HOPS", "1"))
+# 受影响节点超过该比例时直接全量检查
+INCREMENTAL_MAX_RATIO = float(os.getenv("INCREMENTAL_MAX_RATIO", "0.5"))
+
+# 只有流程检测专家的语义检查结果按区域沿用；结构检查始终全量重算
+CARRIED_SOURCE = "ErrorChecker"
+
+
+class AnalysisBaseline:
+    """上一次分析的图（原始节点ID）及其流程检测结果（element_id 为原始节点ID）"""
+    __slots__ = ("run_id", "graph", "findings")
+
+    def __init__(self, run_id: str, graph: BPMNGraph, findings: List[ErrorInfo]):
+        self.run_id = run_id
+        self.graph = graph
+        self.findings = findings
+
+
+class IncrementalScope:
+    """
+    增量检查范围：members 为需要重新检查的节点下标，
+    carried 为沿用的未变化区域的检测结果（element_id 已换算为本次的短ID）。
+    """
+    __slots__ = ("baseline_run_id", "diff", "members", "carried", "changes")
+
+    def __init__(self, baseline_run_id: str, diff: GraphDiff, members: List[int],
+                 carried: List[ErrorInfo], changes: List[str]):
+        self.baseline_run_id = baseline_run_id
+        self.diff = diff
+        self.members = members
+        self.carried = carried
+        self.changes = changes
+
+    def summary(self) -> dict:
+        return {
+            "baseline_run_id": self.baseline_run_id,
+            "changes": self.changes,
+            "rechecked_nodes": len(self.members),
+            "carried_findings": len(self.carried)
+        }
+
+
+def _baseline_name(run_id: str) -> str:
+    # run_id 为 uuid4().hex，只保留字母数字以防路径穿越
+    return f"{BASELINE_ARTIFACT_PREFIX}{''.join(ch for ch in run_id if ch.isalnum())}.json"
+
+
+def save_baseline(run_id: str, graph: BPMNGraph, findings: List[dict], store: Optional[ArtifactStore] = None):
+    """
+    保存本次分析的基线。findings 为流程检测专家输出的结果，
+    其中 element_id 为发给专家的短ID，保存前换算为原始节点ID，以便跨版本对应。
+    阻塞调用，异步代码中通过 asyncio.to_thread 调用。
+    """
+    original_ids = dict(zip(graph.compact_ids(), (node.id for node in graph.nodes)))
+    saved = []
+    for item in findings:
+        if not isinstance(item, dict) or item.get("source") != CARRIED_SOURCE:
+            continue
+        item = dict(item)
+        if item.get("element_id"):
+            item["element_id"] = original_ids.get(item["element_id"], item["element_id"])
+        saved.append(item)
+    store = store or get_artifact_store()
+    try:
+        store.put(_baseline_name(run_id), json.dumps(
+            {"run_id": run_id, "graph": graph.to_dict(), "findings": saved}, ensure_ascii=False).encode("utf-8"))
+    except (OSError, ValueError) as e:
+        logger.error(f"保存分析基线失败: {str(e)}")
+
+
+def load_baseline(run_id: str, store: Optional[ArtifactStore] = None) -> Optional[AnalysisBaseline]:
+    """从产物存储读取分析基线，不存在时返回 None；阻塞调用"""
+    try:
+        raw = (store or get_artifact_store()).get(_baseline_name(run_id))
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        return AnalysisBaseline(run_id, BPMNGraph.from_dict(data["graph"]),
+                                [ErrorInfo(**item) for item in data.get("findings", [])])
+    except Exception as e:
+        logger.error(f"读取分析基线失败: {str(e)}")
+        return None
+
+
+def plan_incremental(baseline: AnalysisBaseline, graph: BPMNGraph) -> Optional[IncrementalScope]:
+    """
+    对比基线与新版本，确定需要重新检查的区域，并沿用其余区域的检测结果。
+    没有定位信息（element_id）的结果无法判断是否受影响，按原样沿用。
+    受影响节点过多时返回 None，由调用方全量检查。
+    """
+    diff = diff_graphs(baseline.graph, graph)
+    affected = diff.affected(baseline.graph, graph, hops=INCREMENTAL_HOPS)
+    if len(graph) and len(affected) > len(graph) * INCREMENTAL_MAX_RATIO:
+        return None
+
+    compact_ids = graph.compact_ids()
+    carried = []
+    for finding in baseline.findings:
+        if finding.element_id:
+            old_idx = baseline.graph.index.get(finding.element_id)
+            new_idx = diff.mapping.get(old_idx) if old_idx is not None else None
+            if old_idx is not None and (new_idx is None or new_idx in affected):
+                # 节点已删除或位于受影响区域，由本次重新检查
+                continue
+            if new_idx is not None:
+                finding = finding.copy(update={"element_id": compact_ids[new_idx]})
+        carried.append(finding)
+    return IncrementalScope(baseline.run_id, diff, sorted(affected), carried,
+                            diff.describe(baseline.graph, graph))
@@ -0,0 +1,246 @@
+import json
+import logging
+import re
+from typing import Any, List, Optional, Tuple
+
+from metrics import JSON_RECOVERY
+
+logger = logging.getLogger(__name__)
+
+_FENCE_RE = re.compile(r'```[\w-]*')
+_WORD_RE = re.compile(r'[A-Za-z_][\w-]*')
+_ERROR_TYPE_RE = re.compile(r'"error_type"\s*:\s*"((?:[^"\\]|\\.)*)"')
+# Python 风格的字面量
+_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+_decoder = json.JSONDecoder(strict=False)
+
+
+def _strip_trailing_comma(out: List[str]):
+    end = len(out)
+    while end and out[end - 1].isspace():
+        end -= 1
+    if end and out[end - 1] == ",":
+        del out[end - 1]
+
+
+def repair_json(text: str) -> str:
+    """
+    修复模型输出中常见的JSON错误：单引号字符串、结尾多余的逗号、未加引号的键、
+    True/False/None，以及输出被截断时未闭合的字符串和括号（退回到最后一个完整的元素或键值对）。
+    从第一个 { 或 [ 开始处理，顶层值结束后的文字忽略。结果仍需 json.loads 校验。
+    """
+    start = min((i for i in (text.find("{"), text.find("[")) if i >= 0), default=-1)
+    if start < 0:
+        return text
+    out: List[str] = []
+    closers: List[str] = []
+    # 最近一个可以截断的位置（逗号前或刚闭合的括号后）及当时未闭合的括号
+    cut: Optional[Tuple[int, List[str]]] = None
+    quote = None
+    i, n = start, len(text)
+    while i < n:
+        ch = text[i]
+        if quote:
+            if ch == "\\" and i + 1 < n:
+                # 单引号字符串中的 \' 在JSON中不是合法转义
+                out.append("'" if quote == "'" and text[i + 1] == "'" else text[i:i + 2])
+                i += 2
+                continue
+            if ch == quote:
+                out.append('"')
+                quote = None
+            else:
+                out.append('\\"' if ch == '"' else ch)
+        elif ch in "\"'":
+            quote = ch
+            out.append('"')
+        elif ch in "{[":
+            closers.append("}" if ch == "{" else "]")
+            out.append(ch)
+        elif ch in "}]":
+            _strip_trailing_comma(out)
+            if closers:
+                closers.pop()
+            out.append(ch)
+            cut = (len(out), list(closers))
+            if not closers:
+                break
+        elif ch == ",":
+            cut = (len(out), list(closers))
+            out.append(ch)
+        else:
+            match = _WORD_RE.match(text, i)
+            if match and (i == 0 or not (text[i - 1].isalnum() or text[i - 1] in "._-")):
+                word = match.group()
+                if word in _LITERALS:
+                    out.append(_LITERALS[word])
+                elif text[match.end():].lstrip().startswith(":"):
+                    out.append(f'"{word}"')
+                else:
+                    out.append(word)
+                i = match.end()
+                continue
+            out.append(ch)
+        i += 1
+
+    if quote or closers:
+        # 输出被截断：退回到最后一个完整元素之后，再补齐括号
+        if cut is not None:
+            del out[cut[0]:]
+            closers = cut[1]
+        elif quote:
+            out.append('"')
+        _strip_trailing_comma(out)
+        out.extend(reversed(closers))
+    return "".join(out)
+
+
+def _looks_like_json_start(text: str, pos: int) -> bool:
+    """排除说明文字中的 [Note] 之类：JSON 的括号后面跟着引号、括号、直接闭合或（未加引号的）键"""
+    rest = text[pos + 1:].lstrip()
+    if not rest or rest[0] in "\"'{[}]":
+        return True
+    return text[pos] == "{" and bool(re.match(r'[A-Za-z_]\w*\s*:', rest))
+
+
+def _largest_json(text: str) -> Tuple[Any, int]:
+    """不做修复时，文本中最长的合法JSON对象或数组及其起始位置"""
+    best, best_start, best_len = None, -1, 0
+    skip_until = 0
+    for match in re.finditer(r'[\[{]', text):
+        pos = match.start()
+        if pos < skip_until:
+            continue
+        try:
+            value, end = _decoder.raw_decode(text, pos)
+        except ValueError:
+            continue
+        if end - pos > best_len:
+            best, best_start, best_len = value, pos, end - pos
+        skip_until = end
+    return best, best_start
+
+
+def _is_report(data: Any) -> bool:
+    """顶层的检测结果：带 errors 的对象，或（可能为空的）条目数组"""
+    if isinstance(data, dict):
+        return "errors" in data
+    return isinstance(data, list) and all(isinstance(item, dict) for item in data)
+
+
+def error_entries(data: Any, error_type: Optional[str] = None) -> List[dict]:
+    """
+    把检测结果统一为条目列表，每个条目都带 error_type（条目自身的优先）。
+    兼容 {"error_type", "errors": [...]}、条目数组，以及多个报告组成的数组；
+    不是对象或缺少 description 的条目被跳过。
+    """
+    if isinstance(data, list):
+        entries = []
+        for item in data:
+            entries.extend(error_entries(item, error_type))
+        return entries
+    if not isinstance(data, dict):
+        return []
+    if "errors" in data:
+        default = data.get("error_type") or error_type
+        errors = data["errors"] if isinstance(data["errors"], list) else [data["errors"]]
+        return [entry for item in errors for entry in error_entries(item, default)]
+    if not data.get("description"):
+        return []
+    entry = dict(data)
+    if not entry.get("error_type") and error_type:
+        entry["error_type"] = error_type
+    return [entry]
+
+
+def _balanced_object(text: str, start: int) -> int:
+    """从 start 处的 { 开始找到与之匹配的 }，返回结束位置；没有闭合时返回 -1"""
+    depth, in_string, i = 0, False, start
+    while i < len(text):
+        ch = text[i]
+        if in_string:
+            if ch == "\\":
+                i += 1
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return i + 1
+        i += 1
+    return -1
+
+
+def salvage_entries(text: str) -> List[dict]:
+    """整体无法解析时，逐个提取其中能解析（或修复后能解析）且带 description 的条目"""
+    match = _ERROR_TYPE_RE.search(text)
+    error_type = match.group(1) if match else None
+    entries, pos = [], text.find("{")
+    while pos >= 0:
+        end = _balanced_object(text, pos)
+        candidate = None
+        if end > 0:
+            chunk = text[pos:end]
+            for attempt in (chunk, repair_json(chunk)):
+                try:
+                    candidate = json.loads(attempt, strict=False)
+                    break
+                except ValueError:
+                    continue
+        if isinstance(candidate, dict) and candidate.get("description") and "errors" not in candidate:
+            entries.extend(error_entries(candidate, error_type))
+            pos = text.find("{", end)
+        else:
+            pos = text.find("{", pos + 1)
+    return entries
+
+
+def recover_error_entries(text: Optional[str]) -> Tuple[Optional[List[dict]], Optional[str]]:
+    """
+    从检测专家的回复中恢复错误条目：先取最长的合法JSON，其次修复常见格式错误，
+    最后逐条抢救 errors 中可以解析的条目。
+    返回 (条目列表, None)；完全无法恢复时返回 (None, 解析错误)，由调用方决定是否请模型修复。
+    """
+    if not text or not text.strip():
+        return [], None
+    text = _FENCE_RE.sub("", text).strip()
+    try:
+        data = json.loads(text, strict=False)
+        JSON_RECOVERY.inc(outcome="ok")
+        return error_entries(data), None
+    except ValueError:
+        pass
+
+    data, start = _largest_json(text)
+    first = next((m.start() for m in re.finditer(r'[\[{]', text) if _looks_like_json_start(text, m.start())), -1)
+    if start >= 0 and start <= first and _is_report(data):
+        JSON_RECOVERY.inc(outcome="extracted")
+        return error_entries(data), None
+
+    error = "no JSON object or array found"
+    if first >= 0:
+        try:
+            repaired = json.loads(repair_json(text[first:]), strict=False)
+            if _is_report(repaired):
+                JSON_RECOVERY.inc(outcome="repaired")
+                return error_entries(repaired), None
+        except ValueError as e:
+            error = str(e)
+    if _is_report(data):
+        # 外层结构损坏，但其中的 errors 数组本身完整；外层的 error_type 仍作为默认类型
+        match = _ERROR_TYPE_RE.search(text[:start])
+        JSON_RECOVERY.inc(outcome="extracted")
+        return error_entries(data, match.group(1) if match else None), None
+
+    entries = salvage_entries(text)
+    if entries:
+        JSON_RECOVERY.inc(outcome="salvaged")
+        logger.error(f"检测结果JSON无法完整解析，抢救出 {len(entries)} 个条目: {error}")
+        return entries, None
+    JSON_RECOVERY.inc(outcome="failed")
+    return None, error
@@ -0,0 +1,262 @@
+import asyncio
+import atexit
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+from llm_scheduler import get_llm_scheduler
+from metrics import LLM_CALLS, current_role, model_label, observe, record_llm_usage
+from prompt_budget import PromptBudgetExceeded, enforce_budget
+
+logger = logging.getLogger(__name__)
+
+# 缓存配置（可通过环境变量覆盖）
+# 缓存是按主机保存的SQLite文件，同一主机的各worker共用；其他主机的缓存未命中时只会多调用一次模型
+CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite3")
+CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000"))
+CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))
+# 命中时的访问时间先记在内存中，积累到该条数（或下一次写入时）再批量写回
+CACHE_ACCESS_FLUSH = int(os.getenv("LLM_CACHE_ACCESS_FLUSH", "64"))
+
+# 模型配置中不参与缓存键计算的敏感字段（按字段名精确匹配；max_token 等影响回复的字段必须参与）
+_SECRET_FIELDS = {"api_key", "api_secret", "access_key", "secret_key", "access_token", "password"}
+
+# 单次请求级别的缓存开关，由 analyze_bpmn_flow 设置，随 asyncio 任务向下传递
+_cache_enabled: contextvars.ContextVar[bool] = contextvars.ContextVar("llm_cache_enabled", default=True)
+
+
+class LLMResponseCache:
+    """
+    基于SQLite的LLM响应持久化缓存。
+    键为 (模型配置, Action名称, 提示词哈希)，支持条目数/字节数上限、TTL过期与LRU淘汰。
+    方法都是阻塞调用，异步代码中应通过 asyncio.to_thread 调用（见 cached_aask）。
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_entries: int = CACHE_MAX_ENTRIES,
+                 max_bytes: int = CACHE_MAX_BYTES, ttl: int = CACHE_TTL_SECONDS):
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # 尚未写回的命中访问时间 key -> last_access
+        self._pending_access = {}
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS llm_cache (
+                key TEXT PRIMARY KEY,
+                action TEXT NOT NULL,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_access ON llm_cache(last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model_config: dict, action: str, prompt: str) -> str:
+        """根据模型配置、Action和提示词生成缓存键"""
+        config = {
+            k: v for k, v in sorted(model_config.items())
+            if k.lower() not in _SECRET_FIELDS
+        }
+        config_hash = hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        prompt_hash = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        return f"{config_hash[:16]}:{action}:{prompt_hash}"
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM llm_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            response, created_at = row
+            if self.ttl and now - created_at > self.ttl:
+                self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self._conn.commit()
+                self.evictions += 1
+                self.misses += 1
+                return None
+            # 命中时不单独提交事务，LRU 所需的访问时间批量写回
+            self._pending_access[key] = now
+            if len(self._pending_access) >= CACHE_ACCESS_FLUSH:
+                self._flush_access()
+                self._conn.commit()
+            self.hits += 1
+            return response
+
+    def _flush_access(self):
+        if self._pending_access:
+            self._conn.executemany("UPDATE llm_cache SET last_access = ? WHERE key = ?",
+                                   [(t, k) for k, t in self._pending_access.items()])
+            self._pending_access.clear()
+
+    def set(self, key: str, action: str, response: str):
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, action, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, action, response, size, now, now)
+            )
+            self._flush_access()
+            self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float):
+        """删除过期条目，然后按最近访问时间淘汰直到满足上限"""
+        if self.ttl:
+            cur = self._conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl,))
+            self.evictions += max(cur.rowcount, 0)
+        count, total = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM llm_cache ORDER BY last_access ASC").fetchall()
+        for key, size in rows:
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+            count -= 1
+            total -= size
+            self.evictions += 1
+
+    def flush(self):
+        """写回尚未保存的访问时间"""
+        with self._lock:
+            self._flush_access()
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._pending_access.clear()
+            self._conn.execute("DELETE FROM llm_cache")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM llm_cache"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": count,
+            "bytes": total
+        }
+
+
+_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_cache() -> LLMResponseCache:
+    """获取进程级共享缓存（首次使用时创建）"""
+    global _cache
+    if _cache is None:
+        _cache = LLMResponseCache()
+        # 退出前写回批量缓存的访问时间
+        atexit.register(_cache.flush)
+    return _cache
+
+
+@contextmanager
+def llm_cache_scope(enabled: bool = True):
+    """在当前请求范围内启用/绕过LLM缓存"""
+    token = _cache_enabled.set(enabled)
+    try:
+        yield
+    finally:
+        _cache_enabled.reset(token)
+
+
+def _model_config_of(action) -> dict:
+    """提取Action所用LLM的配置，用于区分不同模型"""
+    try:
+        return action.llm.config.model_dump()
+    except Exception:
+        return {"llm": type(getattr(action, "llm", None)).__name__}
+
+
+async def _timed_aask(action, prompt: str) -> str:
+    """调用模型并记录耗时、调用结果和估算的token用量"""
+    role = current_role()
+    model = model_label(getattr(getattr(action, "llm", None), "config", None))
+    outcome = "error"
+    try:
+        try:
+            enforce_budget(action, prompt)
+        except PromptBudgetExceeded as e:
+            # 注定超出上下文的请求不再发送给模型
+            outcome = "over_budget"
+            logger.error(f"提示词超出模型预算: {str(e)}")
+            raise
+        with observe("llm", role=role, model=model):
+            # 经调度层按模型限流，并复用共享的LLM实例
+            response = await get_llm_scheduler().aask(action, prompt)
+        outcome = "ok" if response and response.strip() else "empty"
+        record_llm_usage(model, f"{getattr(action, 'prefix', '')}\n{prompt}", response or "")
+        return response
+    except asyncio.CancelledError:
+        # 修正竞速中落败的一方会被取消
+        outcome = "cancelled"
+        raise
+    finally:
+        LLM_CALLS.inc(role=role, model=model, action=type(action).__name__, outcome=outcome)
+
+
+async def cached_aask(action, prompt: str) -> str:
+    """
+    带缓存的 _aask：命中时直接返回历史响应，未命中时调用模型并写入缓存。
+    系统提示（Action前缀）也参与键计算，保证不同角色不会共用响应。
+    """
+    if not _cache_enabled.get():
+        return await _timed_aask(action, prompt)
+
+    cache = get_llm_cache()
+    action_name = type(action).__name__
+    key = cache.make_key(_model_config_of(action), action_name, f"{getattr(action, 'prefix', '')}\n{prompt}")
+    try:
+        # SQLite 读写在线程中执行，不阻塞事件循环
+        cached = await asyncio.to_thread(cache.get, key)
+    except sqlite3.Error as e:
+        logger.error(f"读取LLM缓存失败: {str(e)}")
+        cached = None
+    if cached is not None:
+        LLM_CALLS.inc(role=current_role(), model=model_label(getattr(getattr(action, "llm", None), "config", None)),
+                      action=action_name, outcome="cache_hit")
+        return cached
+
+    response = await _timed_aask(action, prompt)
+    # 只缓存非空响应，避免把失败结果固化
+    if response and response.strip():
+        try:
+            await asyncio.to_thread(cache.set, key, action_name, response)
+        except sqlite3.Error as e:
+            logger.error(f"写入LLM缓存失败: {str(e)}")
+    return response
@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from metrics import LLM_INFLIGHT, estimate_tokens, model_label, observe
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_limits(value: str, cast: Callable = int) -> Dict[str, float]:
+    """"generalv3=2,deepseek-chat=8" → {"generalv3": 2, "deepseek-chat": 8}"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, limit = item.partition("=")
+        try:
+            limits[name.strip()] = cast(limit)
+        except ValueError:
+            logger.error(f"LLM调度配置无效: {item}")
+    return limits
+
+
+# 每个模型同时进行的调用数上限
+LLM_DEFAULT_CONCURRENCY = int(os.getenv("LLM_DEFAULT_CONCURRENCY", "4"))
+LLM_CONCURRENCY = _parse_limits(os.getenv("LLM_CONCURRENCY", ""))
+# 每个模型每分钟的请求数/估算token数上限（令牌桶），0 表示不限制
+LLM_DEFAULT_RPM = float(os.getenv("LLM_DEFAULT_RPM", "0"))
+LLM_RPM = _parse_limits(os.getenv("LLM_RPM", ""), float)
+LLM_DEFAULT_TPM = float(os.getenv("LLM_DEFAULT_TPM", "0"))
+LLM_TPM = _parse_limits(os.getenv("LLM_TPM", ""), float)
+# 同步实现的 provider 调用所用的线程数
+LLM_SYNC_WORKERS = int(os.getenv("LLM_SYNC_WORKERS", "8"))
+
+
+def _spark_completion(llm, messages: List[dict]) -> str:
+    # SparkLLM 的“异步”接口内部是阻塞的 websocket 调用，这里直接调用其同步客户端
+    from metagpt.provider.spark_api import GetMessageFromWeb
+    return GetMessageFromWeb(messages, llm.config).run()
+
+
+# 只有同步实现的 provider（类名 → 同步调用函数），在线程池中执行；其他实现通过 register_sync_provider 注册
+SYNC_PROVIDERS: Dict[str, Callable[[object, List[dict]], str]] = {
+    "SparkLLM": _spark_completion
+}
+
+
+def register_sync_provider(name: str, completion: Callable[[object, List[dict]], str]):
+    SYNC_PROVIDERS[name] = completion
+
+
+class TokenBucket:
+    """
+    令牌桶：rate 为每秒补充的令牌数，capacity 为允许的突发量。
+    acquire(cost) 在令牌不足时异步等待，等待方按到达顺序依次获取。
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, cost: float = 1.0):
+        # 超过桶容量的请求按容量计，避免永远等不到
+        cost = min(cost, self.capacity)
+        # 先预扣令牌（余额可以为负）并算出需要等待的时间，再在临界区之外等待：
+        # 预扣与计算之间没有 await，在事件循环中是原子的；后到的请求看到更多的欠额，等待更久，保持到达顺序
+        self._refill()
+        self.tokens -= cost
+        wait = -self.tokens / self.rate if self.tokens < 0 else 0.0
+        if wait <= 0:
+            return
+        try:
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            # 取消的等待方归还预扣的令牌
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + cost)
+            raise
+
+
+class ModelLimiter:
+    """单个模型的并发上限和请求/token速率限制"""
+
+    def __init__(self, model: str):
+        self.model = model
+        self.concurrency = int(LLM_CONCURRENCY.get(model, LLM_DEFAULT_CONCURRENCY))
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        rpm = LLM_RPM.get(model, LLM_DEFAULT_RPM)
+        tpm = LLM_TPM.get(model, LLM_DEFAULT_TPM)
+        # 突发量取一秒的配额（至少一个请求），token桶容量为一分钟配额
+        self.requests = TokenBucket(rpm / 60, max(rpm / 60, 1)) if rpm > 0 else None
+        self.tokens = TokenBucket(tpm / 60, tpm) if tpm > 0 else None
+        self.active = 0
+
+    async def acquire(self, prompt_tokens: int):
+        """等待并发名额和速率配额，之后必须调用 release"""
+        with observe("llm_queue", model=self.model):
+            await self._semaphore.acquire()
+            try:
+                if self.requests is not None:
+                    await self.requests.acquire()
+                if self.tokens is not None:
+                    await self.tokens.acquire(prompt_tokens)
+            except BaseException:
+                self._semaphore.release()
+                raise
+        self.active += 1
+        LLM_INFLIGHT.set(self.active, model=self.model)
+
+    def release(self):
+        self.active -= 1
+        LLM_INFLIGHT.set(self.active, model=self.model)
+        self._semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self, prompt_tokens: int):
+        await self.acquire(prompt_tokens)
+        try:
+            yield
+        finally:
+            self.release()
+
+
+def _messages(llm, prompt: str, system_msgs: Optional[List[str]]) -> List[dict]:
+    """与 BaseLLM.aask 相同的消息组装，供直接调用同步接口使用"""
+    messages = llm._system_msgs(system_msgs) if system_msgs else [llm._default_system_msg()]
+    if not llm.use_system_prompt:
+        messages = []
+    messages.append(llm._user_msg(prompt))
+    return messages
+
+
+def _check_budget(llm):
+    """与 metagpt Team 一致：角色的 cost_manager 累计费用达到 max_budget 后不再调用模型"""
+    cost_manager = getattr(llm, "cost_manager", None)
+    if cost_manager is not None and cost_manager.total_cost >= cost_manager.max_budget:
+        from metagpt.utils.common import NoMoneyException
+        raise NoMoneyException(cost_manager.total_cost, f"Insufficient funds: {cost_manager.max_budget}")
+
+
+class LLMScheduler:
+    """
+    各专家 Action 与模型之间的调度层：
+    按模型限制并发和速率；调用经由 Action 自己的LLM实例，费用计入其 cost_manager 并受 max_budget 限制，
+    LLM实例（及其HTTP连接池）随角色池中的角色跨分析复用；
+    同步实现的 provider 在线程池中直接调用其同步接口，不阻塞事件循环。
+    """
+
+    def __init__(self, sync_workers: int = LLM_SYNC_WORKERS):
+        self._limiters: Dict[Tuple[int, str], ModelLimiter] = {}
+        self._executor = ThreadPoolExecutor(max_workers=sync_workers, thread_name_prefix="llm-sync")
+
+    def limiter(self, model: str) -> ModelLimiter:
+        # asyncio 的信号量和锁绑定事件循环，按循环分别创建（命令行、测试中可能多次 asyncio.run）
+        key = (id(asyncio.get_running_loop()), model)
+        if key not in self._limiters:
+            self._limiters[key] = ModelLimiter(model)
+        return self._limiters[key]
+
+    async def aask(self, action, prompt: str) -> str:
+        """
+        在所用模型的并发和速率限制内调用 action.llm。
+        同步 provider 的调用在线程中进行，无法中途停止：调用方被取消时（如 race 策略中落败的修正专家）
+        线程仍会运行到模型返回为止，结果被丢弃，费用照常产生，并发名额也要到那时才归还。
+        """
+        llm = getattr(action, "llm", None)
+        config = getattr(llm, "config", None)
+        if config is None:
+            return await action._aask(prompt)
+        _check_budget(llm)
+        limiter = self.limiter(model_label(config))
+        system_msgs = [action.prefix] if getattr(action, "prefix", "") else None
+        prompt_tokens = estimate_tokens(f"{getattr(action, 'prefix', '')}\n{prompt}")
+        sync_completion = SYNC_PROVIDERS.get(type(llm).__name__)
+        if sync_completion is None:
+            async with limiter.slot(prompt_tokens):
+                return await llm.aask(prompt, system_msgs=system_msgs)
+
+        await limiter.acquire(prompt_tokens)
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._executor.submit(sync_completion, llm, _messages(llm, prompt, system_msgs))
+        except BaseException:
+            limiter.release()
+            raise
+        # 名额在线程真正结束时归还（调用方被取消时线程仍在运行）
+        future.add_done_callback(lambda _: _call_soon(loop, limiter.release))
+        response = await asyncio.wrap_future(future)
+        # 同步接口不返回用量，按估算的token数计入 cost_manager
+        llm._update_costs({"prompt_tokens": prompt_tokens, "completion_tokens": estimate_tokens(response or "")})
+        return response
+
+    def reset(self):
+        """丢弃限流状态（修改限流配置后使用）"""
+        self._limiters.clear()
+
+    def stats(self) -> dict:
+        return {
+            "models": {
+                model: {"concurrency": limiter.concurrency, "active": limiter.active,
+                        "rpm_limited": limiter.requests is not None, "tpm_limited": limiter.tokens is not None}
+                for (_, model), limiter in self._limiters.items()
+            }
+        }
+
+
+def _call_soon(loop: asyncio.AbstractEventLoop, callback: Callable[[], None]):
+    try:
+        loop.call_soon_threadsafe(callback)
+    except RuntimeError:
+        # 事件循环已关闭（如命令行的 asyncio.run 已结束），限流状态随之失效
+        pass
+
+
+_scheduler: Optional[LLMScheduler] = None
+
+
+def get_llm_scheduler() -> LLMScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = LLMScheduler()
+    return _scheduler
@@ -0,0 +1,294 @@
+import functools
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 默认直方图分桶（秒），覆盖从本地解析的毫秒级到LLM调用的分钟级
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+
+_CJK_RE = re.compile(r'[\u3000-\u303f\u4e00-\u9fff\uff00-\uffef]')
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 每组标签：[各分桶计数..., 总和, 总数]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.setdefault(key, [0] * len(self.buckets) + [0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def mean(self, **labels) -> Optional[float]:
+        """给定标签（未给出的标签不限）下所有观测值的平均值，没有观测时返回 None"""
+        wanted = {i: str(labels[name]) for i, name in enumerate(self.labelnames) if name in labels}
+        total, count = 0.0, 0
+        with self._lock:
+            for key, state in self._values.items():
+                if all(key[i] == value for i, value in wanted.items()):
+                    total += state[-2]
+                    count += state[-1]
+        return total / count if count else None
+
+    def _samples(self) -> Iterator[str]:
+        with self._lock:
+            items = [(key, list(state)) for key, state in self._values.items()]
+        for key, state in items:
+            for i, bound in enumerate(self.buckets):
+                labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                yield f"{self.name}_bucket{labels} {state[i]}"
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            yield f"{self.name}_bucket{labels} {state[-1]}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-2]}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}"
+
+
+REGISTRY: List[_Metric] = []
+
+STAGE_SECONDS = Histogram(
+    "bpmn_stage_seconds", "Wall time of pipeline stages (ingest, agent act, LLM call, render)",
+    ("stage", "role", "model"))
+LLM_CALLS = Counter(
+    "bpmn_llm_calls_total", "LLM calls by outcome (ok, empty, error, cancelled, over_budget, cache_hit)",
+    ("role", "model", "action", "outcome"))
+LLM_TOKENS = Counter(
+    "bpmn_llm_tokens_total", "Estimated prompt/completion tokens sent to each model",
+    ("role", "model", "type"))
+LLM_COST = Counter(
+    "bpmn_llm_cost_usd_total", "Estimated LLM cost for models with known pricing",
+    ("role", "model"))
+HTTP_SECONDS = Histogram(
+    "bpmn_http_request_seconds", "HTTP request latency",
+    ("method", "path", "status"))
+JOB_QUEUE_DEPTH = Gauge("bpmn_job_queue_depth", "Analysis jobs waiting in the queue")
+LLM_INFLIGHT = Gauge("bpmn_llm_inflight", "LLM calls currently running per model", ("model",))
+ANALYZE_COALESCED = Counter(
+    "bpmn_analyze_coalesced_total", "Analysis requests that attached to an identical in-flight analysis")
+JSON_RECOVERY = Counter(
+    "bpmn_json_recovery_total", "Checker responses by parse outcome (ok, extracted, repaired, salvaged, reasked, failed)",
+    ("outcome",))
+
+
+def render_prometheus() -> str:
+    """按 Prometheus 文本格式（0.0.4）输出全部指标"""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+# ---- 单次分析的耗时明细 ----
+
+class RunTimings:
+    """一次分析中各阶段的耗时记录，用于在报告中返回耗时明细"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.entries: List[dict] = []
+        self.tokens = {"prompt": 0, "completion": 0}
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float, role: str = "", model: str = ""):
+        with self._lock:
+            self.entries.append({"stage": stage, "role": role, "model": model, "seconds": seconds})
+
+    def add_tokens(self, prompt: int, completion: int):
+        with self._lock:
+            self.tokens["prompt"] += prompt
+            self.tokens["completion"] += completion
+
+    def summary(self) -> dict:
+        """按 (阶段, 角色, 模型) 汇总"""
+        grouped: Dict[Tuple[str, str, str], dict] = {}
+        with self._lock:
+            entries = list(self.entries)
+            tokens = dict(self.tokens)
+        for entry in entries:
+            key = (entry["stage"], entry["role"], entry["model"])
+            item = grouped.setdefault(key, {"stage": key[0], "role": key[1] or None, "model": key[2] or None,
+                                            "count": 0, "seconds": 0.0})
+            item["count"] += 1
+            item["seconds"] = round(item["seconds"] + entry["seconds"], 4)
+        return {
+            "total_seconds": round(time.perf_counter() - self.started, 4),
+            "stages": list(grouped.values()),
+            "tokens": tokens
+        }
+
+
+_run_timings: ContextVar[Optional[RunTimings]] = ContextVar("run_timings", default=None)
+_current_role: ContextVar[str] = ContextVar("current_role", default="")
+
+
+def current_run_timings() -> Optional[RunTimings]:
+    return _run_timings.get()
+
+
+def current_role() -> str:
+    return _current_role.get()
+
+
+@contextmanager
+def observe(stage: str, role: str = "", model: str = ""):
+    """记录一个阶段的耗时：写入全局直方图，并计入当前分析的耗时明细"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage, role=role, model=model)
+        timings = _run_timings.get()
+        if timings is not None:
+            timings.add(stage, elapsed, role, model)
+
+
+def record_run_timings(func):
+    """
+    装饰分析入口：为本次分析建立独立的耗时记录（子任务通过上下文继承），
+    并把汇总结果写入返回报告的 timings 字段。
+    """
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        timings = RunTimings()
+        token = _run_timings.set(timings)
+        try:
+            with observe("pipeline"):
+                report = await func(*args, **kwargs)
+        finally:
+            _run_timings.reset(token)
+        if isinstance(report, dict):
+            report["timings"] = timings.summary()
+        return report
+    return wrapper
+
+
+def model_label(llm_config) -> str:
+    """用于指标标签的模型名：优先 model，其次 domain（讯飞星火），最后是 api_type"""
+    if llm_config is None:
+        return ""
+    api_type = getattr(llm_config, "api_type", "")
+    return (getattr(llm_config, "model", None) or getattr(llm_config, "domain", None)
+            or str(getattr(api_type, "value", api_type)))
+
+
+def timed_act(func):
+    """装饰 Role._act：按角色和模型记录耗时，并让该角色发起的LLM调用带上角色标签"""
+    @functools.wraps(func)
+    async def wrapper(self, *args, **kwargs):
+        token = _current_role.set(self.name)
+        try:
+            with observe("act", role=self.name, model=model_label(getattr(self.config, "llm", None))):
+                return await func(self, *args, **kwargs)
+        finally:
+            _current_role.reset(token)
+    return wrapper
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算token数：中日韩字符按1个token计，其余按约4个字符1个token计"""
+    if not text:
+        return 0
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def record_llm_usage(model: str, prompt: str, completion: str):
+    """记录一次LLM调用的估算token数及费用（仅对有价格表的模型计费）"""
+    role = current_role()
+    prompt_tokens, completion_tokens = estimate_tokens(prompt), estimate_tokens(completion)
+    LLM_TOKENS.inc(prompt_tokens, role=role, model=model, type="prompt")
+    LLM_TOKENS.inc(completion_tokens, role=role, model=model, type="completion")
+    timings = _run_timings.get()
+    if timings is not None:
+        timings.add_tokens(prompt_tokens, completion_tokens)
+    try:
+        from metagpt.utils.token_counter import TOKEN_COSTS
+    except ImportError:
+        return
+    price = TOKEN_COSTS.get(model)
+    if price:
+        LLM_COST.inc((prompt_tokens * price["prompt"] + completion_tokens * price["completion"]) / 1000,
+                     role=role, model=model)
@@ -3,16 +3,28 @@ import re
 import random
 import logging
 import datetime
-from metagpt.actions.run_code import PROMPT_TEMPLATE
 from metagpt.roles import Role
-from graphviz import Digraph
 
 from metagpt.actions import Action
 from metagpt.schema import Message
+from metagpt.utils.common import any_to_str
 
 from metagpt.config2 import Config
+from llm_cache import cached_aask
+from metrics import JSON_RECOVERY, estimate_tokens, timed_act
+from bpmn_schema import ErrorInfo, dedupe_errors
+from bpmn_graph import BPMNGraph
+from graph_partition import SHARD_CONCURRENCY, SHARD_MAX_NODES, Shard, partition_graph, shard_max_nodes
+from graph_diff import GraphDiff, diff_graphs
+from dot_validator import normalize_dot, repair_dot
+from json_recovery import recover_error_entries
+from structural_analyzer import analyze_structure
+from corrector_strategy import CorrectionRace
+from prompt_budget import (FIT_REGION, FIT_SHARDED, FIT_SKIPPED, PROMPT_TEMPLATE_TOKENS, action_budget,
+                           budget_exceeded, completion_reserve, correction_fits, record_adjustment,
+                           region_nodes, text_check_nodes)
 from pydantic import BaseModel
-from typing import List, Dict, Optional
+from typing import Awaitable, Callable, List, Dict, Optional, Tuple
 import os
 import asyncio
 from metagpt.environment import Environment
@@ -21,21 +33,83 @@ from metagpt.schema import Message
 # 配置日志
 logger = logging.getLogger(__name__)
 
+# 修正结果DOT无效时请模型修复的最多次数
+DOT_REPAIR_ATTEMPTS = int(os.getenv("DOT_REPAIR_ATTEMPTS", "1"))
+# 检测结果JSON无法恢复时请模型修复的最多次数
+JSON_REPAIR_ATTEMPTS = int(os.getenv("JSON_REPAIR_ATTEMPTS", "1"))
+# 修复请求中附带的原始回复长度上限（字符）
+JSON_REPAIR_MAX_CHARS = 8000
+
+# 检测结果无法解析时，只把原回复和具体的解析错误发给模型修复格式，不重新执行检测
+JSON_REPAIR_PROMPT_TEMPLATE = """
+The response below should be JSON like {{"error_type": "...", "errors": [{{"element_id": "...", "description": "...", "suggestion": "..."}}]}} but does not parse: {error}
+Rewrite it as valid JSON with the same findings, and respond with the JSON only, no explanation or markdown.
+{response}
+"""
+
+# 用户输入（原始DOT）消息的 cause_by，与 team.analyze_bpmn_flow 发布消息时保持一致
+REQUIREMENT_CAUSE = "metagpt.actions.add_requirement.AddRequirement"
+# 一致性比对因提示词超出预算而跳过时发布的内容（非JSON，不计为检测结果）
+TEXT_CHECK_SKIPPED = "跳过：提示词超出预算"
+# 检测报告中引用的紧凑DOT节点ID
+_NODE_REF_RE = re.compile(r'\bn\d+\b')
+
+
+async def ask_error_entries(action: Action, prompt: str) -> Tuple[str, Optional[List[dict]]]:
+    """
+    调用检测模型并容错解析回复中的错误条目；JSON无法恢复时，用简短的修复提示请模型只修正格式。
+    返回 (最后一次的回复, 错误条目)，仍无法恢复时条目为 None。
+    """
+    response = await cached_aask(action, prompt)
+    entries, error = recover_error_entries(response)
+    for _ in range(JSON_REPAIR_ATTEMPTS):
+        if entries is not None:
+            break
+        logger.error(f"检测结果不是有效的JSON，请求模型修复: {error}")
+        JSON_RECOVERY.inc(outcome="reasked")
+        response = await cached_aask(action, JSON_REPAIR_PROMPT_TEMPLATE.format(
+            error=error, response=response.strip()[:JSON_REPAIR_MAX_CHARS]))
+        entries, error = recover_error_entries(response)
+    return response, entries
+
+
+async def run_shards(shards: List[Shard], check: Callable[[Shard], Awaitable[List[ErrorInfo]]]) -> List[ErrorInfo]:
+    """
+    并发检查各分片（最多 SHARD_CONCURRENCY 个同时进行），结果合并去重。
+    单个分片失败只丢失该分片的结果，全部失败时抛出第一个异常。
+    """
+    semaphore = asyncio.Semaphore(SHARD_CONCURRENCY)
+
+    async def run(shard) -> List[ErrorInfo]:
+        async with semaphore:
+            return await check(shard) or []
+
+    results = await asyncio.gather(*(run(shard) for shard in shards), return_exceptions=True)
+    reports = []
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error(f"分片检测失败: {str(result)}")
+            continue
+        reports.extend(result)
+    if all(isinstance(result, Exception) for result in results):
+        raise results[0]
+    return dedupe_errors(reports)
+
+
+def latest_requirement(role: Role) -> Optional[Message]:
+    """取角色记忆中最近一条用户输入的流程（原始DOT）"""
+    for msg in reversed(role.get_memories()):
+        if msg.cause_by == REQUIREMENT_CAUSE:
+            return msg
+    return None
+
 
 # # 以下是一些示例配置，分别为gpt-4-1106-preview、gpt-4-0613和gpt-3.5-turbo-1106。
 # gpt4t = Config.from_home("THUDM.yaml")  # 从`~/.metagpt`目录加载自定义配置`gpt-4-1106-preview.yaml`
 # deepseek = Config.default()  # 使用默认配置，即`config2.yaml`文件中的配置，
 # spark=Config.from_home("deepseek.yaml") 
 
-deepseek = Config.default()  # 使用默认配置，即`config2.yaml`文件中的配置，
-spark = Config.default() 
-gpt4t = Config.default()
-
-class ErrorInfo(BaseModel):
-    error_type: str  # 错误分类
-    description: str    # 错误描述
-    suggestion: str     # 错误修复建议
-    source : str        # 错误来源
+# 模型配置统一由 role_pool.MODEL_MAP 按需加载
 
 # 你是一个BPMN2.0流程检测专家。
 #     只需认真检查以下BPMN流程中存在的问题,不需要进行纠正,重点关注:
@@ -47,25 +121,21 @@ class ErrorInfo(BaseModel):
 class ErrorChecker(Action):
     PROMPT_TEMPLATE: str = """
    You are a BPMN2.0 process flow validation expert.
-Strictly analyze the following DOT code for workflow logic errors and structural violations. Output a JSON array of errors with:
-
-1. **Process Structure Errors**
-    - Orphaned nodes (nodes without input/output connections)
-    - Unreachable paths (nodes inaccessible from start event)
-    - Circular dependencies (A→B→C→A loops)
-    - Parallel gateway branch/merge mismatch (e.g., 3 branches but only 2 merges)
+Structural defects (orphaned nodes, unreachable paths, cycles, parallel gateway branch/merge mismatch) are already checked locally, do not report them again.
+If the DOT lists context-only nodes in a // comment, it is one part of a larger diagram: use those nodes only as context and report errors for the other nodes.
+Strictly analyze the following DOT code for workflow logic errors and BPMN semantic violations. Output a JSON array of errors with:
 
-2. **BPMN Element Usage Errors**
+1. **BPMN Element Usage Errors**
     - Start/End event shape violations (Start must be circle, End doublecircle)
     - Gateway type/flow mismatch (e.g., exclusive gateway missing condition expressions)
     - Undefined task types (Service Task missing implementation class)
 
-3. **Process Control Flow Errors**
+2. **Process Control Flow Errors**
     - Conflicting conditional branches (overlapping/missing branch conditions)
     - Missing default path (uncovered conditional branches)
     - Unbound signal/message event triggers
 
-4. **Organizational Policy Validation**
+3. **Organizational Policy Validation**
     - Ambiguous swimlane (Pool/Lane) ownership
     - Cross-swimlane flows without gateways
     - Resource contention nodes without locks
@@ -87,44 +157,40 @@ Strictly analyze the following DOT code for workflow logic errors and structural
     
     async def run(self, context: str) -> List[ErrorInfo]:
         prompt = self.PROMPT_TEMPLATE.format(context=context)
-        response = await self._aask(prompt)
-        error_report = self._parse_response(response)
+        response, entries = await ask_error_entries(self, prompt)
+        error_report = self._parse_response(response, entries)
         return error_report
 
     @staticmethod
-    def _parse_response(response: str):
-        try:
-            # 添加空响应过滤
-            if not response.strip():
-                return []
-            # 清理JSON响应
-            json_str = re.sub(r'```json|```', '', response).strip()
-            data = json.loads(json_str)
-
-            #解析错误条目
-            error = []
-            for e in data.get("errors", []):
+    def _parse_response(response: str, entries: Optional[List[dict]]):
+        # entries 为容错解析出的条目（见 json_recovery），None 表示回复无法解析
+        if entries is None:
+            logger.error(f"解析响应失败\n原始响应内容: {response}")  # 记录原始响应
+            return []
+
+        #解析错误条目
+        error = []
+        for e in entries:
+            try:
                 error.append(
                     ErrorInfo(
                         source = 'ErrorChecker',
-                        error_type=e.get("error_type", data.get("error_type", "unknown")),  # 优先使用条目中的错误类型
-                        description=e["description"],
-                        suggestion=e["suggestion"],
-                        
+                        error_type=str(e.get("error_type") or "unknown"),
+                        description=str(e["description"]),
+                        suggestion=str(e.get("suggestion") or ""),
+                        element_id=str(e["element_id"]) if e.get("element_id") else None
                     )
                 )
-            return error
-        except (json.JSONDecodeError, KeyError) as e:
-            logger.error(f"解析响应失败: {str(e)}\n原始响应内容: {response}")  # 记录原始响应
-            return []
-        except Exception as e:
-            logger.error(f"Unexpected error: {str(e)}")
-            return []
+            except Exception as ex:
+                # 单个条目无效时跳过，不影响其余条目
+                logger.error(f"跳过无效的检测条目: {str(ex)}")
+        return error
 
 # 在ErrorInfo类下方添加新检测器
 class BPMNTextChecker(Action):
     PROMPT_TEMPLATE : str ="""
     Compare the following BPMN process with the text description to identify inconsistencies, The corrected result does not need to be given:
+    If the DOT lists context-only nodes in a // comment, it is one part of a larger diagram: report inconsistencies only for the other nodes, and do not report steps of the description that belong to other parts.
     
     BPMN content:
     {bpmn_xml}
@@ -157,47 +223,30 @@ class BPMNTextChecker(Action):
             bpmn_xml=bpmn_xml,
             text_description=text_description
         )
-        response = await self._aask(prompt)
-        return self._parse_response(response)
+        response, entries = await ask_error_entries(self, prompt)
+        return self._parse_response(response, entries)
         
 
-    def _parse_response(self, response: str) -> List[ErrorInfo]:
-        try:
-            if not response.strip():
-                return []
-                
-            # 增强型JSON提取
-            json_str = re.search(r'\{.*\}', response, re.DOTALL)
-            if not json_str:
-                raise ValueError("未找到有效JSON结构")
-                
-            data = json.loads(json_str.group())
-            
-            errors = []
-            for e in data.get("errors", []):
-                # 添加字段默认值
-                element_id = e.get('element_id', '未知元素')
-                desc = e.get('description', '').replace('"', "'")  # 统一引号处理
-                
+    def _parse_response(self, response: str, entries: Optional[List[dict]]) -> List[ErrorInfo]:
+        # 回复无法解析（包括"未发现不一致"之类的纯文字）时不产生问题，避免修正专家为不存在的问题调用模型
+        if entries is None:
+            logger.error(f"响应解析失败\n原始响应内容: {response}")
+            return []
+
+        errors = []
+        for e in entries:
+            try:
+                desc = str(e.get('description', '')).replace('"', "'")  # 统一引号处理
+
                 errors.append(ErrorInfo(
                     source = 'BPMNTextChecker',
-                    error_type=e.get('error_type', 'Inconsistent processes'),
+                    error_type=str(e.get('error_type') or 'Inconsistent processes'),
                     description=f"{desc}",
-                    suggestion=e.get('suggestion', 'No specific suggestions')
+                    suggestion=str(e.get('suggestion') or 'No specific suggestions')
                 ))
-            return errors
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"响应解析失败，尝试提取纯文本错误：{str(e)}")
-            return [ErrorInfo(
-                source = 'BPMNTextChecker',
-                error_type="解析错误",
-                description=f"无法解析响应内容：{response[:100]}...",
-                suggestion="请检查AI返回格式是否符合要求"
-            )]
-        except Exception as e:
-            logger.error(f"意外错误: {str(e)}")
-            return []
+            except Exception as ex:
+                logger.error(f"意外错误: {str(ex)}")
+        return errors
                 
 
 class ErrorCorrector(Action):
@@ -212,17 +261,118 @@ class ErrorCorrector(Action):
     1. Modify the DOT code to correct the identified issues.
     2. Ensure the modified DOT code is valid and can be directly used by the igraph library.
     3. The modified DOT code should not contain any extra explanation or markdown formatting (no ```json).
-    4. Do not include any extra explanation or markdown formatting (no ```json).
+    4. Keep the existing node ids (n1, n2, ...) and the compact style: only label, shape, type and lane attributes, no colors or layout attributes.
+    5. Do not include any extra explanation or markdown formatting (no ```json).
     Respond with the modified DOT code only.
     
+    """
+    # 输出无法解析且无法自动修复时，只带上具体的解析错误请模型修复语法
+    REPAIR_PROMPT_TEMPLATE: str = """
+    The DOT code below does not parse: {error}
+    Fix this syntax error without changing the process, and respond with the complete DOT code only, no explanation or markdown.
+    {dot}
+    """
+    # 整张图的修正放不进预算时，只修正检测报告涉及的区域，再合并回整张图
+    REGION_PROMPT_TEMPLATE: str = """
+    You are a Dot correction expert for the BPMN2.0 process. The DOT below is one region of a larger BPMN diagram; nodes listed in the // comment are context only.
+    Region DOT:
+    {context}
+
+    Identified issues in this region:
+    {error_report}
+    Output requirements:
+    1. Modify the region to correct the identified issues. You may add or remove nodes of the region, but do not modify the context-only nodes.
+    2. Respond with the corrected region only: its nodes and every edge that starts or ends at one of its nodes (including edges to context-only nodes).
+    3. Keep the existing node ids (n1, n2, ...) and the compact style: only label, shape, type and lane attributes, no colors or layout attributes. New nodes need new ids.
+    4. Node attributes go in separate node statements, e.g. n1 [label="Start"].
+    Respond with the modified DOT code only, no explanation or markdown.
     """
     async def run(self, context: str, error_report: str) -> str:
+        if not correction_fits(action_budget(self), completion_reserve(self.llm.config),
+                               estimate_tokens(context), estimate_tokens(error_report)):
+            return await self._correct_region(context, error_report)
         prompt = self.PROMPT_TEMPLATE.format(
             context=context,
             error_report=error_report
         )
-        response = await self._aask(prompt)
-        return response.strip()
+        dot, response = await self._ask_dot(prompt)
+        # 仍然无效时原样返回，由报告阶段跳过渲染
+        return dot if dot is not None else response.strip()
+
+    async def _ask_dot(self, prompt: str) -> Tuple[Optional[str], str]:
+        """调用模型并校验回复中的DOT，无效时带上解析错误请模型修复；返回 (DOT或None, 最后一次的回复)"""
+        response = await cached_aask(self, prompt)
+        dot, error = normalize_dot(response)
+        for _ in range(DOT_REPAIR_ATTEMPTS):
+            if error is None:
+                break
+            logger.error(f"修正结果不是有效的DOT，请求模型修复: {error}")
+            response = await cached_aask(self, self.REPAIR_PROMPT_TEMPLATE.format(error=error, dot=repair_dot(response)))
+            dot, error = normalize_dot(response)
+        return dot, response
+
+    async def _correct_region(self, context: str, error_report: str) -> str:
+        """
+        区域修正：以检测报告引用的节点及其一跳邻居为区域，在预算内请模型只修正该区域，
+        再用修正后的片段替换原图中的区域。报告过长时只保留引用了节点的条目，并按预算截断。
+        """
+        graph = BPMNGraph.from_dot(context)
+        entries = []
+        for line in error_report.splitlines():
+            try:
+                items = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(items, list):
+                entries.extend(item for item in items
+                               if isinstance(item, dict) and self._referenced_nodes(graph, json.dumps(item)))
+        budget, reserve = action_budget(self), completion_reserve(self.llm.config)
+        # 报告最多占去模板之外预算的四分之一，其余留给区域DOT
+        report_budget = (budget - PROMPT_TEMPLATE_TOKENS) // 4
+        kept, report_tokens = [], 0
+        for item in entries:
+            tokens = estimate_tokens(json.dumps(item, ensure_ascii=False))
+            if kept and report_tokens + tokens > report_budget:
+                break
+            kept.append(item)
+            report_tokens += tokens
+        seeds = self._referenced_nodes(graph, json.dumps(kept))
+        dot_tokens = estimate_tokens(context)
+        limit = region_nodes(budget, reserve, dot_tokens, len(graph), report_tokens) if seeds else 0
+        if not limit:
+            reason = "no findings reference diagram nodes" if not seeds else "no region fits the budget"
+            record_adjustment("correction", FIT_SKIPPED, f"{len(graph)} nodes, {reason}")
+            raise budget_exceeded(self, dot_tokens + estimate_tokens(error_report) + PROMPT_TEMPLATE_TOKENS)
+
+        # 先放入报告引用的节点，再放入它们的邻居，区域连同上下文节点不超过 limit
+        candidates = list(dict.fromkeys(
+            seeds + [nxt for idx in seeds for nxt in graph.successors[idx] + graph.predecessors[idx]]))
+        members, around = [], set()
+        for idx in candidates:
+            grown = around | set(graph.successors[idx] + graph.predecessors[idx])
+            if members and len(set(members) | {idx} | grown) > limit:
+                break
+            members.append(idx)
+            around = grown
+        member_set = set(members)
+        boundary = sorted(around - member_set)
+        record_adjustment("correction", FIT_REGION,
+                          f"{len(members)} of {len(graph)} nodes, {len(kept)} of {len(entries)} findings")
+
+        prompt = self.REGION_PROMPT_TEMPLATE.format(
+            context=graph.to_compact_dot(members, boundary, keep_ids=True),
+            error_report=json.dumps(kept, ensure_ascii=False)
+        )
+        dot, response = await self._ask_dot(prompt)
+        if dot is None:
+            return response.strip()
+        return graph.replace_region(members, BPMNGraph.from_dot(dot)).to_compact_dot(keep_ids=True)
+
+    @staticmethod
+    def _referenced_nodes(graph: BPMNGraph, text: str) -> List[int]:
+        """文本中引用的图节点（按出现顺序去重）"""
+        refs = (graph.index.get(node_id) for node_id in _NODE_REF_RE.findall(text))
+        return list(dict.fromkeys(idx for idx in refs if idx is not None))
 
 # 流程检测专家
 class CheckerAgent(Role):
@@ -233,14 +383,28 @@ class CheckerAgent(Role):
         super().__init__(config = config,**kwargs)
         self.set_actions([ErrorChecker])
         self._watch([Message])  # 改为监听所有消息类型
+        # 增量分析时由 analyze_bpmn_flow 设置（IncrementalScope），只重新检查受修改影响的区域
+        self.incremental = None
+    @timed_act
     async def _act(self) -> Message:
         todo = self.rc.todo  # 获取待办事项
-        msg = self.get_memories(k=1)[0]
+        msg = latest_requirement(self) or self.get_memories(k=1)[0]
      
+        graph = BPMNGraph.from_dot(msg.content)
+        # 先在本地完成确定性的结构检查（始终针对整张图），LLM只负责语义检查
+        structural_report = analyze_structure(graph)
         # 添加类型转换和错误处理
         try:
-            error_report = await todo.run(msg.content)
+            scope = self.incremental
+            if scope is None:
+                error_report = await self._check_shards(todo, graph, msg.content)
+            else:
+                error_report = await self._check_shards(todo, graph, msg.content, members=scope.members)
+                if error_report is not None:
+                    # 未变化区域沿用上一次的检测结果
+                    error_report = dedupe_errors(scope.carried + error_report)
             if error_report is not None:
+                error_report = structural_report + error_report
                 # 将ErrorInfo列表序列化为JSON字符串
                 json_report = json.dumps([e.dict() for e in error_report], ensure_ascii=False)
                 return Message(content=json_report, role=self.profile, cause_by=todo)
@@ -249,8 +413,36 @@ class CheckerAgent(Role):
                 return Message(content="检测结果为空，无法生成报告", role=self.profile, cause_by=todo)
         except Exception as e:
             logger.error(f"检测流程失败: {str(e)}")
+            if structural_report:
+                # LLM失败时仍返回本地结构检查结果
+                json_report = json.dumps([item.dict() for item in structural_report], ensure_ascii=False)
+                return Message(content=json_report, role=self.profile, cause_by=todo)
             return Message(content="检测失败", role=self.profile, cause_by=todo)
 
+    async def _check_shards(self, todo: Action, graph: BPMNGraph, dot: str,
+                            members: Optional[List[int]] = None) -> Optional[List[ErrorInfo]]:
+        """
+        大流程图切分为分片并发检查，耗时取决于最大的分片而不是整张图；
+        分片大小同时受 SHARD_MAX_NODES 和模型提示词预算限制。
+        各分片结果合并去重。单个分片失败只丢失该分片的结果。
+        members 指定时只检查这些节点（及其边界上下文）。
+        """
+        limit = shard_max_nodes(action_budget(todo), estimate_tokens(dot), len(graph))
+        selected = len(graph) if members is None else len(members)
+        if not limit:
+            record_adjustment("check", FIT_SKIPPED, f"{selected} nodes, the prompt template alone exceeds the budget")
+            raise budget_exceeded(todo, estimate_tokens(dot) + PROMPT_TEMPLATE_TOKENS)
+        shards = partition_graph(graph, max_nodes=limit, members=members)
+        if not shards:
+            return []
+        if members is None and len(shards) == 1:
+            return await todo.run(dot)
+        if limit < SHARD_MAX_NODES and selected > limit:
+            record_adjustment("check", FIT_SHARDED, f"{selected} nodes in {len(shards)} shards of <= {limit}")
+
+        logger.info(f"流程图共 {len(graph)} 个节点，切分为 {len(shards)} 个分片并发检查")
+        return await run_shards(shards, lambda shard: todo.run(graph.to_compact_dot(shard.members, shard.boundary)))
+
 # 文本一致性检测专家
 # 在CheckerAgent类下方添加新角色
 class BPMNTextAgent(Role):
@@ -261,14 +453,33 @@ class BPMNTextAgent(Role):
         super().__init__(config = config, **kwargs)
         self.set_actions([BPMNTextChecker])
         self.text_description = text_description
-        self._watch([ErrorChecker])  # 添加对CheckerAgent消息的监听
+        # 与流程检测专家并行：直接接收原始DOT，不再等待 ErrorChecker 的结果
+        self._watch([REQUIREMENT_CAUSE])
 
+    @timed_act
     async def _act(self) -> Message:
         todo = self.rc.todo
-        msg = self.get_memories(k=1)[0]  # 获取BPMN内容
+        msg = latest_requirement(self) or self.get_memories(k=1)[0]  # 获取BPMN内容
+        if not (self.text_description or "").strip():
+            # 没有文本描述时无可比对，直接给出空结果，修正专家无需等待模型调用
+            return Message(content="[]", role=self.profile, cause_by=todo)
         
         try:
-            error_report = await todo.run(msg.content, self.text_description)
+            graph = BPMNGraph.from_dot(msg.content)
+            limit = text_check_nodes(action_budget(todo), estimate_tokens(msg.content), len(graph),
+                                     estimate_tokens(self.text_description))
+            if not limit:
+                record_adjustment("text_check", FIT_SKIPPED, "the text description alone exceeds the budget")
+                return Message(content=TEXT_CHECK_SKIPPED, role=self.profile, cause_by=todo)
+            if limit >= len(graph):
+                error_report = await todo.run(msg.content, self.text_description)
+            else:
+                # 整张图放不进预算时按分片比对，每个分片都带上完整的文本描述
+                shards = partition_graph(graph, max_nodes=limit)
+                record_adjustment("text_check", FIT_SHARDED,
+                                  f"{len(graph)} nodes in {len(shards)} shards of <= {limit}")
+                error_report = await run_shards(shards, lambda shard: todo.run(
+                    graph.to_compact_dot(shard.members, shard.boundary), self.text_description))
             json_report = json.dumps([e.dict() for e in error_report], ensure_ascii=False)
             return Message(content=json_report, role=self.profile, cause_by=todo)
         except Exception as e:
@@ -278,29 +489,61 @@ class BPMNTextAgent(Role):
 
 class BaseCorrectorAgent(Role):
     """修正专家基类"""
-    def __init__(self,  **kwargs):
+    # 需要等待的检测报告，全部到齐后才开始修正
+    expected_reports: List[str] = [any_to_str(ErrorChecker), any_to_str(BPMNTextChecker)]
+
+    def __init__(self, race: Optional[CorrectionRace] = None, **kwargs):
         super().__init__(**kwargs)
         self.set_actions([ErrorCorrector()])
         self._watch([ErrorChecker, BPMNTextChecker])
         self.modification_history = []
+        # race 策略下与另一位修正专家共享的协调器
+        self.race = race
+
+    def _reports_ready(self) -> bool:
+        received = {msg.cause_by for msg in self.get_memories()}
+        return all(cause in received for cause in self.expected_reports)
+
+    async def _observe(self, ignore_memory=False) -> int:
+        """两个检测专家并行运行，只有在所有检测报告到齐后才触发修正"""
+        news = await super()._observe(ignore_memory)
+        if news and not self._reports_ready():
+            # 消息已存入记忆，清空news使角色保持空闲，等待下一份报告
+            self.rc.news = []
+            return 0
+        return news
+
+    @timed_act
     async def _act(self) -> Message:
         todo = self.rc.todo
         # 收集所有错误报告
-        reports = [msg for msg in self.get_memories() if "error_type" in msg.content]
+        reports = [
+            msg for msg in self.get_memories()
+            if msg.cause_by in self.expected_reports and self._count_findings(msg.content)
+        ]
         
         if not reports:
+            # 检测专家都没有发现问题时不调用模型
             logger.info("未发现需要修正的错误")
             return Message(content="流程无需修正", role=self.profile)
             
         try:
             combined_report = "\n".join([msg.content for msg in reports])
-            original_bpmn = self.get_memories(k=1)[-1].content
+            requirement = latest_requirement(self)
+            original_bpmn = requirement.content if requirement else self.get_memories(k=1)[-1].content
             
             # 参数修正（context -> bpmn_xml 改为保持context）
-            corrected_bpmn = await todo.run(
+            correction = todo.run(
                 context=original_bpmn,
                 error_report=combined_report
             )
+            if self.race is not None:
+                corrected_bpmn = await self.race.run(self.profile, correction)
+                if corrected_bpmn is None:
+                    # 已被另一位修正专家抢先，不再发布结果
+                    return None
+            else:
+                corrected_bpmn = await correction
             
             # 生成修改摘要
             modification_summary = self._generate_summary(original_bpmn, corrected_bpmn)
@@ -322,18 +565,32 @@ class BaseCorrectorAgent(Role):
             logger.error(f"综合修正失败: {str(e)}")
             return Message(content="修正失败", role=self.profile)
 
+    @staticmethod
+    def _count_findings(content: str) -> int:
+        """检测报告中的问题数；检测失败等非JSON消息计为0"""
+        try:
+            findings = json.loads(content)
+        except (json.JSONDecodeError, TypeError):
+            return 0
+        return sum(1 for item in findings if isinstance(item, dict)) if isinstance(findings, list) else 0
+
     def _generate_summary(self, original: str, corrected: str) -> dict:
-        """生成修改摘要的对比逻辑"""
-        diff_count = sum(1 for o, c in zip(original, corrected) if o != c)
+        """按图结构对比修正前后的流程，统计修改的节点和连线"""
+        try:
+            before, after = BPMNGraph.from_dot(original), BPMNGraph.from_dot(corrected or "")
+            diff = diff_graphs(before, after)
+        except Exception as e:
+            logger.error(f"对比修正前后流程失败: {str(e)}")
+            return {"modified_elements": 0, "change_details": []}
         return {
-            "modified_elements": diff_count,
-            "change_details": self._find_xml_changes(original, corrected)
+            "modified_elements": len(diff),
+            "change_details": self._find_xml_changes(diff, before, after)
         }
 
-    def _find_xml_changes(self, original: str, corrected: str) -> List[str]:
-        """简单的XML差异对比实现"""
-        # 这里可以集成专业的XML diff工具
-        return ["检测到流程结构修改", "元素属性更新"]
+    @staticmethod
+    def _find_xml_changes(diff: GraphDiff, before: BPMNGraph, after: BPMNGraph) -> List[str]:
+        """逐项列出新增/删除/修改的节点和连线"""
+        return diff.describe(before, after)
 
 class ErrorCorrectorAgent(BaseCorrectorAgent):
     """GPT-4修正专家"""
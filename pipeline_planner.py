@@ -0,0 +1,253 @@
+import logging
+import math
+import os
+from typing import Dict, List, Optional
+
+from bpmn_graph import BPMNGraph
+from corrector_strategy import STRATEGY_FAST_THEN_UPGRADE, STRATEGY_RACE, STRATEGY_SINGLE
+from graph_partition import SHARD_CONCURRENCY, SHARD_MAX_NODES, partition_graph, shard_max_nodes
+from metrics import STAGE_SECONDS, estimate_tokens, model_label
+from prompt_budget import (FIT_FULL, FIT_REGION, FIT_SHARDED, FIT_SKIPPED, PROMPT_TEMPLATE_TOKENS,
+                           completion_reserve, correction_fits, prompt_budget, text_check_nodes)
+
+logger = logging.getLogger(__name__)
+
+# 规划配置（可通过环境变量覆盖）
+# 节点数不超过该值的流程图全部交给快速模型，只运行一个修正专家
+PLANNER_SMALL_NODES = int(os.getenv("PLANNER_SMALL_NODES", "30"))
+# 节点数达到该值的流程图由强模型检测和修正
+PLANNER_LARGE_NODES = int(os.getenv("PLANNER_LARGE_NODES", "200"))
+# 快速/强模型，未配置时取请求中的快速修正专家/综合修正专家模型
+PLANNER_FAST_MODEL = os.getenv("PLANNER_FAST_MODEL", "")
+PLANNER_STRONG_MODEL = os.getenv("PLANNER_STRONG_MODEL", "")
+# 尚无观测数据时单次LLM调用的预估耗时（秒）
+PLANNER_DEFAULT_CALL_SECONDS = float(os.getenv("PLANNER_DEFAULT_CALL_SECONDS", "15"))
+
+# 检测/比对提示词模板本身的估算token数（与各专家按预算切分时使用同一数值），以及检测结果的估算token数
+CHECK_TEMPLATE_TOKENS = PROMPT_TEMPLATE_TOKENS
+CHECK_COMPLETION_TOKENS = 600
+
+SIZE_SMALL = "small"
+SIZE_MEDIUM = "medium"
+SIZE_LARGE = "large"
+
+CORRECTION_PLANNED = "planned"
+CORRECTION_DISABLED = "disabled"            # 为满足时延/费用预算不做修正
+CORRECTION_SKIPPED = "skipped_no_findings"  # 检测专家没有发现问题，修正专家未调用模型
+CORRECTION_OVER_BUDGET = FIT_SKIPPED        # 修正提示词即使按区域修正也超出模型预算
+
+
+class PipelinePlan:
+    """一次分析的执行计划：各专家使用的模型、修正策略、是否修正，以及预估的时延和费用"""
+
+    def __init__(self, size: str, nodes: int, agent_configs: Dict[str, str], corrector_strategy: str,
+                 text_check: bool, correction: str = CORRECTION_PLANNED):
+        self.size = size
+        self.nodes = nodes
+        self.agent_configs = agent_configs
+        self.corrector_strategy = corrector_strategy
+        self.text_check = text_check
+        self.correction = correction
+        self.estimate: Dict[str, float] = {}
+        self.budget: Dict[str, Optional[float]] = {}
+        self.within_budget = True
+        self.reasons: List[str] = []
+        # 各阶段按模型提示词预算预计的执行方式：full / sharded / region / skipped_over_budget
+        self.prompt_fit: Dict[str, str] = {}
+        # 运行中各阶段为适应预算实际做出的调整，由 analyze_bpmn_flow 设置
+        self.adjustments: List[dict] = []
+
+    @property
+    def correct(self) -> bool:
+        return self.correction == CORRECTION_PLANNED
+
+    def summary(self) -> dict:
+        return {
+            "size": self.size,
+            "nodes": self.nodes,
+            "models": dict(self.agent_configs),
+            "corrector_strategy": self.corrector_strategy,
+            "text_check": self.text_check,
+            "correction": self.correction,
+            "estimate": dict(self.estimate),
+            "budget": dict(self.budget),
+            "within_budget": self.within_budget,
+            "reasons": list(self.reasons),
+            "prompt_fit": dict(self.prompt_fit),
+            "prompt_budget": self.budget_adjustments()
+        }
+
+    def budget_adjustments(self) -> List[dict]:
+        """运行中实际的预算调整，同一阶段的同一种调整只保留一次（race 下两位修正专家会各记录一次）"""
+        seen, unique = set(), []
+        for item in self.adjustments:
+            key = (item["stage"], item["fit"])
+            if key not in seen:
+                seen.add(key)
+                unique.append(dict(item))
+        return unique
+
+
+def _llm_config(model: str):
+    from role_pool import MODEL_MAP
+    try:
+        return MODEL_MAP[model].llm
+    except KeyError:
+        return None
+
+
+def _call_seconds(model: str) -> float:
+    """模型单次调用的预估耗时：取本进程内该模型LLM调用的平均耗时"""
+    observed = STAGE_SECONDS.mean(stage="llm", model=model_label(_llm_config(model)))
+    return observed if observed is not None else PLANNER_DEFAULT_CALL_SECONDS
+
+
+def _token_price(model: str) -> Optional[dict]:
+    try:
+        from metagpt.utils.token_counter import TOKEN_COSTS
+    except ImportError:
+        return None
+    return TOKEN_COSTS.get(model_label(_llm_config(model)))
+
+
+def _prompt_fit(plan: PipelinePlan, graph: BPMNGraph, members: Optional[List[int]], dot_tokens: int,
+                description_tokens: int) -> tuple:
+    """
+    按各专家所用模型的提示词预算，用与专家运行时相同的估算预测每个阶段的执行方式，
+    写入 plan.prompt_fit，返回 (检测分片数, 一致性比对分片数)
+    """
+    models, nodes = plan.agent_configs, plan.nodes
+    limit = shard_max_nodes(prompt_budget(_llm_config(models["checker"])), dot_tokens, len(graph))
+    shards = len(partition_graph(graph, max_nodes=limit, members=members)) if nodes and limit else 0
+    plan.prompt_fit["check"] = FIT_SKIPPED if not limit else \
+        FIT_SHARDED if limit < SHARD_MAX_NODES and nodes > limit else FIT_FULL
+
+    text_shards = 0
+    if plan.text_check:
+        limit = text_check_nodes(prompt_budget(_llm_config(models["text_checker"])), dot_tokens, len(graph),
+                                 description_tokens)
+        text_shards = 0 if not limit else 1 if limit >= len(graph) else len(partition_graph(graph, max_nodes=limit))
+        plan.prompt_fit["text_check"] = FIT_SKIPPED if not limit else FIT_FULL if text_shards == 1 else FIT_SHARDED
+
+    if plan.correct:
+        correctors = [models["corrector"]]
+        if plan.corrector_strategy != STRATEGY_SINGLE:
+            correctors.append(models["fast_corrector"])
+        configs = [_llm_config(model) for model in correctors]
+        plan.prompt_fit["correction"] = FIT_FULL if all(
+            correction_fits(prompt_budget(config), completion_reserve(config), dot_tokens, 2 * CHECK_COMPLETION_TOKENS)
+            for config in configs) else FIT_REGION
+    return shards, text_shards
+
+
+def _estimate(plan: PipelinePlan, shards: int, dot_tokens: int, description_tokens: int,
+              text_shards: int = 1) -> Dict[str, float]:
+    """按分片数和DOT大小估算计划的关键路径时延、LLM调用次数和费用（只计有价格表的模型）"""
+    models = plan.agent_configs
+    calls: List[tuple] = [(models["checker"], dot_tokens + CHECK_TEMPLATE_TOKENS * shards,
+                           CHECK_COMPLETION_TOKENS * shards)] if shards else []
+    latency = math.ceil(shards / max(SHARD_CONCURRENCY, 1)) * _call_seconds(models["checker"]) if shards else 0.0
+    if plan.text_check and text_shards:
+        calls.append((models["text_checker"], dot_tokens + (description_tokens + CHECK_TEMPLATE_TOKENS) * text_shards,
+                      CHECK_COMPLETION_TOKENS * text_shards))
+        latency = max(latency, math.ceil(text_shards / max(SHARD_CONCURRENCY, 1))
+                      * _call_seconds(models["text_checker"]))
+    if plan.correct:
+        correctors = [models["corrector"]]
+        if plan.corrector_strategy != STRATEGY_SINGLE:
+            correctors.append(models["fast_corrector"])
+        for model in correctors:
+            calls.append((model, dot_tokens + CHECK_TEMPLATE_TOKENS + 2 * CHECK_COMPLETION_TOKENS, dot_tokens))
+        if plan.corrector_strategy == STRATEGY_RACE:
+            latency += min(_call_seconds(model) for model in correctors)
+        elif plan.corrector_strategy == STRATEGY_FAST_THEN_UPGRADE:
+            latency += _call_seconds(models["fast_corrector"])
+        else:
+            latency += _call_seconds(models["corrector"])
+
+    cost, priced = 0.0, True
+    for model, prompt_tokens, completion_tokens in calls:
+        price = _token_price(model)
+        if not price:
+            priced = False
+            continue
+        cost += (prompt_tokens * price["prompt"] + completion_tokens * price["completion"]) / 1000
+    return {
+        "latency_seconds": round(latency, 2),
+        # 检测专家和一致性检测专家每个分片调用一次，修正专家各一次
+        "llm_calls": len(calls) + max(shards - 1, 0) + (max(text_shards - 1, 0) if plan.text_check else 0),
+        "cost_usd": round(cost, 6),
+        "cost_complete": priced
+    }
+
+
+def _fits(estimate: Dict[str, float], max_latency: Optional[float], max_cost: Optional[float]) -> bool:
+    if max_latency is not None and estimate["latency_seconds"] > max_latency:
+        return False
+    if max_cost is not None and estimate["cost_usd"] > max_cost:
+        return False
+    return True
+
+
+def plan_pipeline(graph: BPMNGraph, dot: str, agent_configs: Dict[str, str], corrector_strategy: Optional[str],
+                  text_description: str = "", members: Optional[List[int]] = None, adaptive: bool = False,
+                  max_latency: Optional[float] = None, max_cost: Optional[float] = None) -> PipelinePlan:
+    """
+    为一次分析选择执行计划。
+    adaptive 时按（需要检查的）节点数选择模型：小图全部使用快速模型，未指定修正策略时只运行一个修正专家，
+    大图的检测和修正使用强模型；显式指定的 corrector_strategy 始终保留（None 表示未指定，默认 race）。给出 max_latency（秒）/max_cost（美元）时，
+    依次降级为快速模型、单个修正专家、只检测不修正，直到预估值满足预算。
+    检测专家没有发现问题时跳过修正由修正专家在运行时判断（见 BaseCorrectorAgent）。
+    """
+    nodes = len(graph) if members is None else len(members)
+    size = SIZE_SMALL if nodes <= PLANNER_SMALL_NODES else SIZE_LARGE if nodes >= PLANNER_LARGE_NODES else SIZE_MEDIUM
+    fast = PLANNER_FAST_MODEL or agent_configs["fast_corrector"]
+    strong = PLANNER_STRONG_MODEL or agent_configs["corrector"]
+    text_check = bool(text_description and text_description.strip())
+
+    configs = dict(agent_configs)
+    strategy = corrector_strategy or STRATEGY_RACE
+    reasons = []
+    if adaptive and size == SIZE_SMALL:
+        configs = {key: fast for key in configs}
+        if corrector_strategy is None:
+            strategy = STRATEGY_SINGLE
+            reasons.append(f"{nodes} nodes <= {PLANNER_SMALL_NODES}: fast model, single corrector")
+        else:
+            reasons.append(f"{nodes} nodes <= {PLANNER_SMALL_NODES}: fast model")
+    elif adaptive and size == SIZE_LARGE:
+        configs.update(checker=strong, corrector=strong)
+        reasons.append(f"{nodes} nodes >= {PLANNER_LARGE_NODES}: strong model for checking and correction")
+    if not text_check:
+        reasons.append("no text description: consistency check skipped")
+
+    dot_tokens = estimate_tokens(dot)
+    description_tokens = estimate_tokens(text_description or "")
+
+    # 候选计划按质量从高到低排列，取第一个满足预算的
+    candidates = [PipelinePlan(size, nodes, configs, strategy, text_check)]
+    if max_latency is not None or max_cost is not None:
+        fast_configs = {key: fast for key in configs}
+        candidates.append(PipelinePlan(size, nodes, fast_configs, strategy, text_check))
+        candidates.append(PipelinePlan(size, nodes, fast_configs, STRATEGY_SINGLE, text_check))
+        candidates.append(PipelinePlan(size, nodes, fast_configs, STRATEGY_SINGLE, text_check, CORRECTION_DISABLED))
+    for candidate in candidates:
+        shards, text_shards = _prompt_fit(candidate, graph, members, dot_tokens, description_tokens)
+        candidate.estimate = _estimate(candidate, shards, dot_tokens, description_tokens, text_shards)
+    plan = next((c for c in candidates if _fits(c.estimate, max_latency, max_cost)), None)
+    if plan is None:
+        plan = candidates[-1]
+        plan.within_budget = False
+        reasons.append("no plan fits the budget, using the cheapest one")
+    elif plan is not candidates[0]:
+        reasons.append("downgraded to fit the budget: "
+                       + ", ".join(f"{k}={v}" for k, v in (("max_latency", max_latency), ("max_cost", max_cost))
+                                   if v is not None))
+    if max_cost is not None and not plan.estimate["cost_complete"]:
+        reasons.append("cost is estimated only for models with known pricing")
+    for stage, fit in plan.prompt_fit.items():
+        if fit != FIT_FULL:
+            reasons.append(f"{stage}: {fit} to fit the prompt budget")
+    plan.budget = {"max_latency": max_latency, "max_cost": max_cost}
+    plan.reasons = reasons
+    return plan
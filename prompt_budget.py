@@ -0,0 +1,152 @@
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from metrics import estimate_tokens, model_label
+
+logger = logging.getLogger(__name__)
+
+# 常用模型的上下文窗口（token）
+MODEL_CONTEXT_WINDOWS: Dict[str, int] = {
+    "generalv3": 8192,
+    "generalv3.5": 8192,
+    "4.0Ultra": 8192,
+    "deepseek-chat": 65536,
+    "deepseek-coder": 65536,
+    "gpt-3.5-turbo": 16385,
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "glm-4": 128000,
+}
+DEFAULT_CONTEXT_WINDOW = int(os.getenv("LLM_DEFAULT_CONTEXT_WINDOW", "8192"))
+# 为模型回复预留的token数（未配置 max_token 时）
+DEFAULT_COMPLETION_RESERVE = 2048
+# 按平均每节点token数估算分片/区域大小时留出的余量（边界节点、连线分布不均）
+BUDGET_SAFETY = 0.7
+# 检测/比对/修正提示词模板（含系统提示）预留的token数，执行计划和各专家按同一数值切分
+PROMPT_TEMPLATE_TOKENS = 700
+
+# 为适应预算做出的调整（分片、区域修正、跳过）
+FIT_FULL = "full"
+FIT_SHARDED = "sharded"
+FIT_REGION = "region"
+FIT_SKIPPED = "skipped_over_budget"
+
+
+def _parse_overrides(value: str) -> Dict[str, int]:
+    """LLM_PROMPT_BUDGETS="generalv3=6000,deepseek-chat=40000" """
+    overrides = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, budget = item.partition("=")
+        try:
+            overrides[name.strip()] = int(budget)
+        except ValueError:
+            logger.error(f"LLM_PROMPT_BUDGETS 配置无效: {item}")
+    return overrides
+
+
+PROMPT_BUDGET_OVERRIDES = _parse_overrides(os.getenv("LLM_PROMPT_BUDGETS", ""))
+
+
+class PromptBudgetExceeded(Exception):
+    """提示词的估算token数超过了模型的预算"""
+
+    def __init__(self, model: str, tokens: int, budget: int):
+        super().__init__(f"Prompt for {model} is ~{tokens} tokens, budget is {budget}")
+        self.model = model
+        self.tokens = tokens
+        self.budget = budget
+
+
+def prompt_budget(llm_config) -> int:
+    """模型可用于提示词的token预算：显式配置优先，否则为上下文窗口减去回复预留"""
+    model = model_label(llm_config)
+    if model in PROMPT_BUDGET_OVERRIDES:
+        return PROMPT_BUDGET_OVERRIDES[model]
+    window = MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+    return max(window - completion_reserve(llm_config), 0)
+
+
+def completion_reserve(llm_config) -> int:
+    """为模型回复预留的token数，修正结果（完整或区域DOT）也需要放得下"""
+    window = MODEL_CONTEXT_WINDOWS.get(model_label(llm_config), DEFAULT_CONTEXT_WINDOW)
+    reserve = getattr(llm_config, "max_token", None) or DEFAULT_COMPLETION_RESERVE
+    return min(reserve, window // 2)
+
+
+def action_budget(action) -> int:
+    """Action 所用模型的提示词预算，已扣除系统提示（Action前缀）"""
+    llm_config = getattr(getattr(action, "llm", None), "config", None)
+    return prompt_budget(llm_config) - estimate_tokens(f"{getattr(action, 'prefix', '')}\n")
+
+
+def fits_budget(action, prompt: str) -> bool:
+    return estimate_tokens(prompt) <= action_budget(action)
+
+
+def budget_exceeded(action, tokens: int) -> PromptBudgetExceeded:
+    """阶段即使切分也放不进 action 所用模型的预算时抛出的异常"""
+    return PromptBudgetExceeded(model_label(getattr(getattr(action, "llm", None), "config", None)),
+                                tokens, action_budget(action))
+
+
+def max_nodes_for_budget(dot_tokens: int, nodes: int, available: int) -> int:
+    """按整张图DOT的平均每节点token数，估算 available 个token内能放下的节点数（放不下任何节点时为0）"""
+    if available <= 0:
+        return 0
+    per_node = dot_tokens / max(nodes, 1)
+    return max(int(available * BUDGET_SAFETY / per_node), 1) if per_node else nodes
+
+
+def text_check_nodes(budget: int, dot_tokens: int, nodes: int, description_tokens: int) -> int:
+    """一致性比对每次调用能放下的节点数：整张图放得下时为全部节点，文本描述本身超出预算时为0"""
+    available = budget - PROMPT_TEMPLATE_TOKENS - description_tokens
+    if dot_tokens <= available:
+        return nodes
+    return max_nodes_for_budget(dot_tokens, nodes, available)
+
+
+def correction_fits(budget: int, reserve: int, dot_tokens: int, report_tokens: int) -> bool:
+    """整张图的修正提示词放得进预算，且修正后的完整DOT放得进回复"""
+    return dot_tokens + report_tokens + PROMPT_TEMPLATE_TOKENS <= budget and dot_tokens <= reserve
+
+
+def region_nodes(budget: int, reserve: int, dot_tokens: int, nodes: int, report_tokens: int) -> int:
+    """区域修正时区域（含上下文节点）的节点数上限：提示词和修正后的区域DOT都要放得下"""
+    return min(max_nodes_for_budget(dot_tokens, nodes, budget - PROMPT_TEMPLATE_TOKENS - report_tokens),
+               max_nodes_for_budget(dot_tokens, nodes, reserve))
+
+
+# 本次分析中为适应预算做出的调整，由 analyze_bpmn_flow 建立，随 asyncio 任务向下传递
+_adjustments: ContextVar[Optional[List[dict]]] = ContextVar("prompt_budget_adjustments", default=None)
+
+
+@contextmanager
+def budget_adjustments_scope():
+    """收集本次分析中各阶段为适应提示词预算所做的调整（分片、区域修正、跳过）"""
+    adjustments: List[dict] = []
+    token = _adjustments.set(adjustments)
+    try:
+        yield adjustments
+    finally:
+        _adjustments.reset(token)
+
+
+def record_adjustment(stage: str, fit: str, detail: str):
+    logger.info(f"提示词超出预算，{stage} 改为 {fit}: {detail}")
+    adjustments = _adjustments.get()
+    if adjustments is not None:
+        adjustments.append({"stage": stage, "fit": fit, "detail": detail})
+
+
+def enforce_budget(action, prompt: str, llm_config: Optional[object] = None) -> int:
+    """调用模型前检查提示词（含系统提示）的估算token数，超出预算时抛出 PromptBudgetExceeded"""
+    llm_config = llm_config or getattr(getattr(action, "llm", None), "config", None)
+    tokens = estimate_tokens(f"{getattr(action, 'prefix', '')}\n{prompt}")
+    budget = prompt_budget(llm_config)
+    if tokens > budget:
+        raise PromptBudgetExceeded(model_label(llm_config), tokens, budget)
+    return tokens
@@ -0,0 +1,109 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from typing import Dict, Optional
+
+from artifact_store import ArtifactStore, get_artifact_store
+from dot_validator import DotSyntaxError, validate_dot
+
+logger = logging.getLogger(__name__)
+
+# 渲染配置（可通过环境变量覆盖），SVG 写入产物存储（见 artifact_store）
+RENDER_CONCURRENCY = int(os.getenv("RENDER_CONCURRENCY", "4"))
+RENDER_TIMEOUT = float(os.getenv("RENDER_TIMEOUT", "30"))
+DOT_BINARY = os.getenv("DOT_BINARY", "dot")
+SVG_ARTIFACT_PREFIX = "bpmn_"
+
+_semaphore: Optional[asyncio.Semaphore] = None
+# 同一份DOT正在渲染时，后来的请求等待同一个结果（只在本进程内去重；
+# 其他worker上的重复渲染写入同一个按内容哈希命名的产物，结果一致）
+_inflight: Dict[str, "asyncio.Future[Optional[str]]"] = {}
+
+
+def prepare_dot(dot_code: str) -> str:
+    """渲染前的预处理：中文标签转义"""
+    return re.sub(r'label="([\u4e00-\u9fa5]+)"',
+                  lambda m: 'label="' + ''.join('\\u{:04x}'.format(ord(c)) for c in m.group(1)) + '"',
+                  dot_code)
+
+
+def dot_digest(dot_code: str) -> str:
+    return hashlib.sha256(dot_code.encode("utf-8")).hexdigest()
+
+
+def svg_name_for(dot_code: str) -> str:
+    """按DOT内容哈希命名输出产物，相同的DOT总是对应同一个SVG"""
+    return f"{SVG_ARTIFACT_PREFIX}{dot_digest(prepare_dot(dot_code))[:32]}.svg"
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(RENDER_CONCURRENCY)
+    return _semaphore
+
+
+async def _run_dot(dot_code: str) -> Optional[bytes]:
+    async with _get_semaphore():
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                DOT_BINARY, "-Tsvg",
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except FileNotFoundError:
+            logger.error(f"DOT图渲染失败: 找不到 Graphviz 可执行文件 {DOT_BINARY}")
+            return None
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(dot_code.encode("utf-8")), RENDER_TIMEOUT)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            logger.error(f"DOT图渲染超时（{RENDER_TIMEOUT}s）")
+            return None
+        if proc.returncode != 0:
+            logger.error(f"DOT图渲染失败: {stderr.decode('utf-8', 'replace')}\nProblematic DOT code:\n{dot_code}")
+            return None
+    return stdout
+
+
+async def render_svg(dot_code: str, store: Optional[ArtifactStore] = None) -> Optional[str]:
+    """
+    异步将DOT渲染为SVG：在 dot 子进程中执行，不阻塞事件循环。
+    SVG 按内容哈希命名写入产物存储（其他worker渲染过的直接复用），返回产物引用；
+    并行渲染数受 RENDER_CONCURRENCY 限制。
+    """
+    try:
+        validate_dot(dot_code)
+    except DotSyntaxError as e:
+        logger.error(f"DOT语法错误，跳过渲染: {str(e)}")
+        return None
+    store = store or get_artifact_store()
+    name = svg_name_for(dot_code)
+    dot_code = prepare_dot(dot_code)
+    if await asyncio.to_thread(store.exists, name):
+        return store.ref(name)
+
+    key = f"{id(store)}:{name}"
+    if key in _inflight:
+        return await asyncio.shield(_inflight[key])
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
+    result = None
+    try:
+        svg = await _run_dot(dot_code)
+        if svg is not None:
+            await asyncio.to_thread(store.put, name, svg)
+            result = store.ref(name)
+        return result
+    except Exception as e:
+        logger.error(f"DOT图渲染失败: {e}")
+        return None
+    finally:
+        _inflight.pop(key, None)
+        if not future.done():
+            future.set_result(result)
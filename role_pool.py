@@ -0,0 +1,213 @@
+import logging
+import os
+import threading
+from collections.abc import Mapping
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 每种模型组合最多保留的空闲角色组数
+ROLE_POOL_SIZE = int(os.getenv("ROLE_POOL_SIZE", "4"))
+
+# 模型名 → ~/.metagpt 下的配置文件，None 表示使用默认的 config2.yaml
+# spark=Config.from_home("spark.yaml")
+# gpt4t = Config.from_home("THUDM.yaml")
+MODEL_CONFIG_FILES: Dict[str, Optional[str]] = {
+    "GPT": None,
+    "Deepseek": None,
+    "Spark": None
+}
+
+AGENT_CONFIG_KEYS = ("checker", "text_checker", "corrector", "fast_corrector")
+
+
+class _LazyModelMap(Mapping):
+    """
+    模型名 → metagpt Config，首次使用时才加载配置文件。
+    同一个配置文件只加载一次，名称不区分大小写（spark 与 Spark 等价）。
+    """
+
+    def __init__(self, files: Dict[str, Optional[str]]):
+        self._files = files
+        self._loaded: Dict[Optional[str], object] = {}
+        self._lock = threading.Lock()
+
+    def _resolve(self, name: str) -> str:
+        if name in self._files:
+            return name
+        for key in self._files:
+            if key.lower() == str(name).lower():
+                return key
+        raise KeyError(name)
+
+    def __getitem__(self, name: str):
+        config_file = self._files[self._resolve(name)]
+        with self._lock:
+            if config_file not in self._loaded:
+                from metagpt.config2 import Config
+                self._loaded[config_file] = Config.from_home(config_file) if config_file else Config.default()
+            return self._loaded[config_file]
+
+    def __contains__(self, name) -> bool:
+        try:
+            self._resolve(name)
+            return True
+        except KeyError:
+            return False
+
+    def __iter__(self):
+        return iter(self._files)
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+
+MODEL_MAP = _LazyModelMap(MODEL_CONFIG_FILES)
+
+
+def pool_key(agent_configs: dict) -> Tuple[str, ...]:
+    return tuple(str(agent_configs[key]).lower() for key in AGENT_CONFIG_KEYS)
+
+
+class RoleSet:
+    """一次分析所需的四个专家角色"""
+    __slots__ = ("key", "checker", "text_checker", "strong_corrector", "fast_corrector")
+
+    def __init__(self, key: Tuple[str, ...], checker, text_checker, strong_corrector, fast_corrector):
+        self.key = key
+        self.checker = checker
+        self.text_checker = text_checker
+        self.strong_corrector = strong_corrector
+        self.fast_corrector = fast_corrector
+
+    def roles(self) -> list:
+        return [self.checker, self.text_checker, self.strong_corrector, self.fast_corrector]
+
+
+def reset_role(role):
+    """清空角色的运行状态（记忆、消息缓冲、待办），保留已创建的LLM实例和Action"""
+    role.rc.memory.clear()
+    role.rc.working_memory.clear()
+    role.rc.msg_buffer.pop_all()
+    role.rc.news = []
+    role.rc.env = None
+    role._set_state(-1)
+    role.latest_observed_msg = None
+    role.recovered = False
+    if hasattr(role, "race"):
+        role.race = None
+    if hasattr(role, "incremental"):
+        role.incremental = None
+    if hasattr(role, "modification_history"):
+        role.modification_history = []
+    # 角色的LLM实例跨分析复用，cost_manager 的累计费用按单次分析计算，max_budget 即每次分析的费用上限
+    cost_manager = getattr(role.llm, "cost_manager", None)
+    if cost_manager is not None:
+        cost_manager.total_cost = 0
+        cost_manager.total_prompt_tokens = 0
+        cost_manager.total_completion_tokens = 0
+
+
+class RolePool:
+    """
+    按 agent_configs 模型组合缓存预先构建好的角色组。
+    分析开始时取出一组，Environment 运行结束后重置并放回，
+    避免每次请求重新构建角色、Action 和 LLM 客户端。
+    """
+
+    def __init__(self, max_idle: int = ROLE_POOL_SIZE):
+        self.max_idle = max_idle
+        self._idle: Dict[Tuple[str, ...], List[RoleSet]] = {}
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def _build(self, agent_configs: dict) -> RoleSet:
+        from mutil_agent import BPMNTextAgent, CheckerAgent, ErrorCorrectorAgent, FastCorrectorAgent
+        role_set = RoleSet(
+            pool_key(agent_configs),
+            CheckerAgent(config=MODEL_MAP[agent_configs["checker"]]),
+            BPMNTextAgent(config=MODEL_MAP[agent_configs["text_checker"]], text_description=""),
+            ErrorCorrectorAgent(config=MODEL_MAP[agent_configs["corrector"]]),
+            FastCorrectorAgent(config=MODEL_MAP[agent_configs["fast_corrector"]])
+        )
+        # 提前创建各角色的LLM客户端（随角色在池中复用），使取出的角色组可以直接运行
+        for role in role_set.roles():
+            _ = role.llm
+        with self._lock:
+            self.created += 1
+        return role_set
+
+    def acquire(self, agent_configs: dict) -> RoleSet:
+        key = pool_key(agent_configs)
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self.reused += 1
+                return idle.pop()
+        return self._build(agent_configs)
+
+    def release(self, role_set: RoleSet, reusable: bool = True):
+        """归还角色组；运行失败或被取消的角色组直接丢弃"""
+        if not reusable:
+            return
+        try:
+            for role in role_set.roles():
+                reset_role(role)
+        except Exception as e:
+            logger.error(f"重置角色失败，丢弃该角色组: {str(e)}")
+            return
+        with self._lock:
+            idle = self._idle.setdefault(role_set.key, [])
+            if len(idle) < self.max_idle:
+                idle.append(role_set)
+
+    def warm(self, agent_configs: dict, count: int = 1):
+        """预先为指定模型组合构建角色组"""
+        for _ in range(count):
+            self.release(self._build(agent_configs))
+
+    def clear(self):
+        """丢弃所有空闲的角色组（切换 provider 或模型配置后使用）"""
+        with self._lock:
+            self._idle.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "created": self.created,
+                "reused": self.reused,
+                "idle": {"/".join(key): len(sets) for key, sets in self._idle.items()}
+            }
+
+
+_pool: Optional[RolePool] = None
+
+
+def get_role_pool() -> RolePool:
+    global _pool
+    if _pool is None:
+        _pool = RolePool()
+    return _pool
+
+
+
+def warm_from_env():
+    """
+    进程启动后在后台预热：导入 metagpt 与各专家角色，并按 ROLE_POOL_WARM 预建角色组。
+    ROLE_POOL_WARM 格式为 "checker,text_checker,corrector,fast_corrector"，多个组合用分号分隔，
+    如 "Spark,Spark,Spark,Spark;Deepseek,Deepseek,Spark,Spark"。
+    """
+    import mutil_agent  # noqa: F401
+    import run_collector  # noqa: F401
+
+    pool = get_role_pool()
+    for combo in filter(None, (c.strip() for c in os.getenv("ROLE_POOL_WARM", "").split(";"))):
+        models = [m.strip() for m in combo.split(",")]
+        if len(models) != len(AGENT_CONFIG_KEYS):
+            logger.error(f"ROLE_POOL_WARM 配置无效: {combo}")
+            continue
+        try:
+            pool.warm(dict(zip(AGENT_CONFIG_KEYS, models)))
+        except Exception as e:
+            logger.error(f"角色池预热失败 {combo}: {str(e)}")
@@ -0,0 +1,125 @@
+import asyncio
+import json
+import logging
+from typing import Callable, Dict, List, Optional
+
+from metagpt.environment import Environment
+from metagpt.schema import Message
+from pydantic import Field
+
+logger = logging.getLogger(__name__)
+
+# 各专家的 profile，用于区分检测结果与修正结果
+CHECKER_ROLES = ("流程检测专家", "一致性检测专家")
+CORRECTOR_ROLES = ("修正专家",)
+
+
+class RunResultCollector:
+    """
+    单次分析运行的结果收集器。
+    直接从 Environment 接收各专家发布的 Message，不再回读日志文件，
+    因此分析开销只与本次运行有关，并发运行之间也不会共享状态。
+    """
+
+    def __init__(self):
+        self.messages: List[Message] = []
+        # 按专家存储最新建议/修正（与原日志解析逻辑一致，只保留最后一次）
+        self.latest_suggestions: Dict[str, dict] = {}
+        self.latest_corrections: Dict[str, dict] = {}
+        # 各检测专家最近一次的完整检测结果（含 element_id），用于保存增量分析基线
+        self.latest_findings: Dict[str, List[dict]] = {}
+        # 各专家首条消息到达的事件，供 fast-then-upgrade 等策略等待
+        self._arrived: Dict[str, asyncio.Event] = {}
+        # 进度监听者：每当专家产生结果时收到一个事件字典（用于SSE推送）
+        self.listeners: List[Callable[[dict], None]] = []
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        self.listeners.append(listener)
+
+    def _emit(self, event: dict):
+        for listener in self.listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logger.error(f"推送进度事件失败: {str(e)}")
+
+    def _event(self, role: str) -> asyncio.Event:
+        if role not in self._arrived:
+            self._arrived[role] = asyncio.Event()
+        return self._arrived[role]
+
+    async def wait_for_role(self, role: str):
+        """等待指定专家发布消息（无论成功与否）"""
+        await self._event(role).wait()
+
+    def collect(self, message: Message):
+        """记录一条消息，并按专家类型更新结果"""
+        self.messages.append(message)
+        role = message.role or ""
+        content = message.content or ""
+        self._event(role).set()
+
+        # 更新流程检测建议（只保留最后一次）
+        if any(key in role for key in CHECKER_ROLES):
+            try:
+                suggestion_list = json.loads(content)
+            except (json.JSONDecodeError, TypeError):
+                return
+            if not isinstance(suggestion_list, list):
+                return
+            self._emit({"event": "findings", "expert": role, "findings": suggestion_list})
+            self.latest_findings[role] = suggestion_list
+            for item in suggestion_list:
+                if isinstance(item, dict):
+                    self.latest_suggestions[role] = {
+                        "expert": role,
+                        "error_type": item.get("error_type"),
+                        "description": item.get("description"),
+                        "suggestion": item.get("suggestion"),
+                        "element_id": item.get("element_id")
+                    }
+
+        # 更新修正专家结果（只保留最后一次）
+        elif any(key in role for key in CORRECTOR_ROLES):
+            try:
+                bpmn_info = json.loads(content)
+            except (json.JSONDecodeError, TypeError):
+                return
+            if not isinstance(bpmn_info, dict):
+                return
+            self._emit({
+                "event": "correction",
+                "expert": role,
+                "corrected_bpmn": bpmn_info.get("corrected_bpmn", ""),
+                "modifications": bpmn_info.get("modifications", {})
+            })
+            self.latest_corrections[role] = {
+                "expert": role,
+                "bpmn": bpmn_info.get("corrected_bpmn", ""),
+                "modifications": bpmn_info.get("modifications", {})
+            }
+
+    @property
+    def suggestions(self) -> List[dict]:
+        return list(self.latest_suggestions.values())
+
+    @property
+    def corrections(self) -> List[dict]:
+        return list(self.latest_corrections.values())
+
+    def final_bpmn(self, prefer: Optional[str] = None) -> Optional[str]:
+        """返回最后一个修正专家给出的BPMN（DOT）；指定 prefer 时优先返回该专家的结果"""
+        if prefer and prefer in self.latest_corrections:
+            return self.latest_corrections[prefer]["bpmn"]
+        corrections = self.corrections
+        return corrections[-1]["bpmn"] if corrections else None
+
+
+class CollectingEnvironment(Environment):
+    """在发布消息的同时把消息交给本次运行的收集器"""
+
+    collector: RunResultCollector = Field(default_factory=RunResultCollector, exclude=True)
+
+    def publish_message(self, message: Message, *args, **kwargs) -> bool:
+        self.collector.collect(message)
+        return super().publish_message(message, *args, **kwargs)
@@ -0,0 +1,216 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 运行历史配置（可通过环境变量覆盖）
+# 运行历史是按主机保存的SQLite文件：同一主机的各worker共用，多台主机之间不共享
+# （SQLite 不适合放在网络共享卷上），/api/runs 只列出本主机的运行；跨主机共享的产物见 artifact_store
+HISTORY_PATH = os.getenv("RUN_HISTORY_PATH", "reports/run_history.sqlite3")
+HISTORY_MAX_RUNS = int(os.getenv("RUN_HISTORY_MAX_RUNS", "5000"))
+HISTORY_TTL_SECONDS = int(os.getenv("RUN_HISTORY_TTL", str(90 * 24 * 3600)))
+HISTORY_MAX_PAGE_SIZE = 100
+
+STATUS_COMPLETED = "completed"
+STATUS_UPGRADE_PENDING = "upgrade_pending"
+
+# 列表接口返回的摘要字段；详情接口额外返回检测结果、修正DOT、完整报告等
+_SUMMARY_COLUMNS = ("run_id", "created_at", "updated_at", "status", "input_hash", "diagram_path",
+                    "corrector_strategy", "baseline_run_id", "diagram_svg", "total_seconds")
+_JSON_COLUMNS = ("models", "findings", "timings", "report")
+
+
+def input_hash(diagram_path: str, description: str) -> str:
+    """输入哈希：流程图文件内容 + 文本描述，用于查找同一输入的历史运行"""
+    digest = hashlib.sha256()
+    with open(diagram_path, "rb") as f:
+        for chunk in iter(lambda: f.read(256 * 1024), b""):
+            digest.update(chunk)
+    digest.update(b"\0")
+    digest.update((description or "").encode("utf-8"))
+    return digest.hexdigest()
+
+
+class RunHistoryStore:
+    """
+    基于SQLite的分析运行历史：输入哈希、模型、各专家消息、检测结果、修正DOT、SVG路径和耗时。
+    按时间、输入哈希和模型建立索引，写入时按条数上限和保留时长自动清理旧记录。
+    """
+
+    def __init__(self, path: str = HISTORY_PATH, max_runs: int = HISTORY_MAX_RUNS,
+                 ttl: int = HISTORY_TTL_SECONDS):
+        self.path = Path(path)
+        self.max_runs = max_runs
+        self.ttl = ttl
+        self.pruned = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                status TEXT NOT NULL,
+                input_hash TEXT NOT NULL,
+                diagram_path TEXT,
+                description TEXT,
+                models TEXT NOT NULL,
+                corrector_strategy TEXT,
+                baseline_run_id TEXT,
+                findings TEXT,
+                corrected_dot TEXT,
+                diagram_svg TEXT,
+                total_seconds REAL,
+                timings TEXT,
+                report TEXT
+            );
+            CREATE TABLE IF NOT EXISTS run_models (
+                run_id TEXT NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+                agent TEXT NOT NULL,
+                model TEXT NOT NULL,
+                PRIMARY KEY (run_id, agent)
+            );
+            CREATE TABLE IF NOT EXISTS run_messages (
+                run_id TEXT NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+                seq INTEGER NOT NULL,
+                role TEXT,
+                cause_by TEXT,
+                sent_from TEXT,
+                content TEXT,
+                PRIMARY KEY (run_id, seq)
+            );
+            CREATE INDEX IF NOT EXISTS idx_runs_created ON runs(created_at);
+            CREATE INDEX IF NOT EXISTS idx_runs_input ON runs(input_hash, created_at);
+            CREATE INDEX IF NOT EXISTS idx_run_models_model ON run_models(model, run_id);
+            """
+        )
+        self._conn.commit()
+
+    def record(self, run_id: str, *, input_hash: str, diagram_path: str, description: str,
+               models: Dict[str, str], corrector_strategy: str, report: dict,
+               findings: List[dict], messages: Iterable[dict], baseline_run_id: Optional[str] = None):
+        """写入或更新（fast-then-upgrade 的升级结果）一次运行"""
+        now = time.time()
+        status = STATUS_UPGRADE_PENDING if report.get("upgrade_pending") else STATUS_COMPLETED
+        timings = report.get("timings") or {}
+        row = (run_id, now, now, status, input_hash, diagram_path, description,
+               json.dumps(models, ensure_ascii=False), corrector_strategy, baseline_run_id,
+               json.dumps(findings, ensure_ascii=False), report.get("corrected_dot"), report.get("diagram_svg"),
+               timings.get("total_seconds"), json.dumps(timings, ensure_ascii=False),
+               json.dumps(report, ensure_ascii=False, default=str))
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO runs (run_id, created_at, updated_at, status, input_hash, diagram_path, description, "
+                "models, corrector_strategy, baseline_run_id, findings, corrected_dot, diagram_svg, "
+                "total_seconds, timings, report) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(run_id) DO UPDATE SET updated_at = excluded.updated_at, status = excluded.status, "
+                "findings = excluded.findings, corrected_dot = excluded.corrected_dot, "
+                "diagram_svg = excluded.diagram_svg, total_seconds = excluded.total_seconds, "
+                "timings = excluded.timings, report = excluded.report",
+                row
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO run_models (run_id, agent, model) VALUES (?, ?, ?)",
+                [(run_id, agent, str(model).lower()) for agent, model in models.items()]
+            )
+            self._conn.execute("DELETE FROM run_messages WHERE run_id = ?", (run_id,))
+            self._conn.executemany(
+                "INSERT INTO run_messages (run_id, seq, role, cause_by, sent_from, content) VALUES (?, ?, ?, ?, ?, ?)",
+                [(run_id, seq, m.get("role"), m.get("cause_by"), m.get("sent_from"), m.get("content"))
+                 for seq, m in enumerate(messages)]
+            )
+            self._prune(now)
+            self._conn.commit()
+
+    def _prune(self, now: float):
+        """删除超过保留时长的运行，再按时间淘汰超出条数上限的最旧运行（消息随之级联删除）"""
+        if self.ttl:
+            cur = self._conn.execute("DELETE FROM runs WHERE created_at < ?", (now - self.ttl,))
+            self.pruned += max(cur.rowcount, 0)
+        count = self._conn.execute("SELECT COUNT(*) FROM runs").fetchone()[0]
+        if count > self.max_runs:
+            cur = self._conn.execute(
+                "DELETE FROM runs WHERE run_id IN (SELECT run_id FROM runs ORDER BY created_at ASC LIMIT ?)",
+                (count - self.max_runs,)
+            )
+            self.pruned += max(cur.rowcount, 0)
+
+    def list_runs(self, page: int = 1, page_size: int = 20, input_hash: Optional[str] = None,
+                  model: Optional[str] = None, since: Optional[float] = None,
+                  until: Optional[float] = None) -> dict:
+        """按时间倒序分页查询运行摘要，可按输入哈希、模型（任一专家）和时间范围过滤"""
+        page = max(page, 1)
+        page_size = min(max(page_size, 1), HISTORY_MAX_PAGE_SIZE)
+        clauses, params = [], []
+        if input_hash:
+            clauses.append("input_hash = ?")
+            params.append(input_hash)
+        if model:
+            clauses.append("run_id IN (SELECT run_id FROM run_models WHERE model = ?)")
+            params.append(model.lower())
+        if since is not None:
+            clauses.append("created_at >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            params.append(until)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            total = self._conn.execute(f"SELECT COUNT(*) FROM runs{where}", params).fetchone()[0]
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_SUMMARY_COLUMNS)}, models FROM runs{where} "
+                f"ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                params + [page_size, (page - 1) * page_size]
+            ).fetchall()
+        items = []
+        for row in rows:
+            item = dict(zip(_SUMMARY_COLUMNS, row[:-1]))
+            item["models"] = json.loads(row[-1])
+            items.append(item)
+        return {"items": items, "page": page, "page_size": page_size, "total": total}
+
+    def get_run(self, run_id: str, include_messages: bool = False) -> Optional[dict]:
+        with self._lock:
+            cur = self._conn.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,))
+            row = cur.fetchone()
+            if row is None:
+                return None
+            run = dict(zip((column[0] for column in cur.description), row))
+            if include_messages:
+                run["messages"] = [
+                    dict(zip(("seq", "role", "cause_by", "sent_from", "content"), message))
+                    for message in self._conn.execute(
+                        "SELECT seq, role, cause_by, sent_from, content FROM run_messages "
+                        "WHERE run_id = ? ORDER BY seq", (run_id,))
+                ]
+        for column in _JSON_COLUMNS:
+            if run.get(column):
+                run[column] = json.loads(run[column])
+        return run
+
+    def stats(self) -> dict:
+        with self._lock:
+            count, oldest = self._conn.execute("SELECT COUNT(*), MIN(created_at) FROM runs").fetchone()
+        return {"runs": count, "oldest": oldest, "pruned": self.pruned, "max_runs": self.max_runs}
+
+
+_store: Optional[RunHistoryStore] = None
+
+
+def get_run_history() -> RunHistoryStore:
+    """获取进程级共享的运行历史（首次使用时创建）"""
+    global _store
+    if _store is None:
+        _store = RunHistoryStore()
+    return _store
@@ -0,0 +1,224 @@
+import logging
+from collections import deque
+from typing import List, Optional, Set, Union
+
+from bpmn_graph import BPMNGraph
+from bpmn_schema import ErrorInfo
+
+logger = logging.getLogger(__name__)
+
+SOURCE = "StructuralAnalyzer"
+
+
+def _find_orphans(graph: BPMNGraph) -> List[ErrorInfo]:
+    """孤立节点：既没有入边也没有出边"""
+    if len(graph.nodes) <= 1:
+        return []
+    errors = []
+    for idx in graph.iter_indices():
+        if not graph.predecessors[idx] and not graph.successors[idx]:
+            errors.append(ErrorInfo(
+                source=SOURCE,
+                error_type="Orphaned node",
+                description=f"节点 {graph.label(idx)}（{graph.nodes[idx].id}）没有任何输入或输出连接",
+                suggestion=f"将 {graph.label(idx)} 连接到流程中，或删除该节点",
+                element_id=graph.nodes[idx].id
+            ))
+    return errors
+
+
+def _reachable_from(graph: BPMNGraph, starts: List[int]) -> Set[int]:
+    seen = set(starts)
+    queue = deque(starts)
+    while queue:
+        idx = queue.popleft()
+        for nxt in graph.successors[idx]:
+            if nxt not in seen:
+                seen.add(nxt)
+                queue.append(nxt)
+    return seen
+
+
+def _find_unreachable(graph: BPMNGraph) -> List[ErrorInfo]:
+    """从开始事件出发无法到达的节点（孤立节点已单独报告）"""
+    starts = graph.start_nodes()
+    if not starts:
+        return []
+    reachable = _reachable_from(graph, starts)
+    errors = []
+    for idx in graph.iter_indices():
+        if idx in reachable:
+            continue
+        if not graph.predecessors[idx] and not graph.successors[idx]:
+            continue
+        errors.append(ErrorInfo(
+            source=SOURCE,
+            error_type="Unreachable path",
+            description=f"节点 {graph.label(idx)}（{graph.nodes[idx].id}）无法从开始事件 "
+                        f"{', '.join(graph.label(s) for s in starts)} 到达",
+            suggestion=f"为 {graph.label(idx)} 补充来自主流程的顺序流",
+            element_id=graph.nodes[idx].id
+        ))
+    return errors
+
+
+def _strongly_connected_components(graph: BPMNGraph) -> List[List[int]]:
+    """Tarjan算法（迭代实现，避免大图递归过深）"""
+    size = len(graph)
+    index = [-1] * size
+    low = [0] * size
+    on_stack = [False] * size
+    stack = []
+    components = []
+    counter = 0
+
+    for root in graph.iter_indices():
+        if index[root] >= 0:
+            continue
+        work = [(root, 0)]
+        while work:
+            idx, child = work.pop()
+            if child == 0:
+                index[idx] = low[idx] = counter
+                counter += 1
+                stack.append(idx)
+                on_stack[idx] = True
+            successors = graph.successors[idx]
+            if child < len(successors):
+                work.append((idx, child + 1))
+                nxt = successors[child]
+                if index[nxt] < 0:
+                    work.append((nxt, 0))
+                elif on_stack[nxt]:
+                    low[idx] = min(low[idx], index[nxt])
+                continue
+            if low[idx] == index[idx]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == idx:
+                        break
+                components.append(component)
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[idx])
+    return components
+
+
+def _find_cycles(graph: BPMNGraph) -> List[ErrorInfo]:
+    """循环依赖：规模大于1的强连通分量或自环"""
+    errors = []
+    for component in _strongly_connected_components(graph):
+        members = set(component)
+        if len(component) == 1 and component[0] not in graph.successors[component[0]]:
+            continue
+        has_exit = any(nxt not in members for m in component for nxt in graph.successors[m])
+        labels = " → ".join(graph.label(m) for m in reversed(component))
+        if has_exit:
+            description = f"节点 {labels} 构成循环，需确认循环的退出条件"
+            suggestion = "在循环出口处使用带条件表达式的排他网关，明确退出条件"
+        else:
+            description = f"节点 {labels} 构成没有出口的循环，流程将无法结束"
+            suggestion = "为该循环增加通往结束事件的出口路径"
+        errors.append(ErrorInfo(
+            source=SOURCE,
+            error_type="Circular dependency",
+            description=description,
+            suggestion=suggestion,
+            element_id=graph.nodes[component[-1]].id
+        ))
+    return errors
+
+
+def _find_parallel_mismatch(graph: BPMNGraph) -> List[ErrorInfo]:
+    """并行网关分支/汇聚不匹配：每个分支应到达同一个汇聚网关，且汇聚入边数与分支数一致"""
+    errors = []
+    # 嵌套层数不会超过并行网关的数量，有环时也不会无限增长
+    max_depth = sum(1 for i in graph.iter_indices() if graph.is_parallel_gateway(i))
+    for split in graph.iter_indices():
+        branches = graph.successors[split]
+        if len(branches) < 2 or not graph.is_parallel_gateway(split):
+            continue
+        joins = set()
+        unmerged = []
+        for branch in branches:
+            join = _first_parallel_join(graph, branch, split, max_depth)
+            if join is None:
+                unmerged.append(branch)
+            else:
+                joins.add(join)
+        label = graph.label(split)
+        if unmerged:
+            errors.append(ErrorInfo(
+                source=SOURCE,
+                error_type="Parallel gateway mismatch",
+                description=f"并行网关 {label} 的分支 {', '.join(graph.label(b) for b in unmerged)} 没有汇聚到并行网关",
+                suggestion=f"为 {label} 的所有分支添加对应的并行汇聚网关",
+                element_id=graph.nodes[split].id
+            ))
+        elif len(joins) > 1:
+            errors.append(ErrorInfo(
+                source=SOURCE,
+                error_type="Parallel gateway mismatch",
+                description=f"并行网关 {label} 的分支汇聚到了不同的网关 {', '.join(graph.label(j) for j in joins)}",
+                suggestion=f"让 {label} 的全部分支汇聚到同一个并行网关",
+                element_id=graph.nodes[split].id
+            ))
+        elif joins:
+            join = joins.pop()
+            merged = len(graph.predecessors[join])
+            if merged != len(branches):
+                errors.append(ErrorInfo(
+                    source=SOURCE,
+                    error_type="Parallel gateway mismatch",
+                    description=f"并行网关 {label} 有 {len(branches)} 个分支，"
+                                f"但汇聚网关 {graph.label(join)} 有 {merged} 个入口",
+                    suggestion="使分支数与汇聚数保持一致",
+                    element_id=graph.nodes[split].id
+                ))
+    return errors
+
+
+def _first_parallel_join(graph: BPMNGraph, start: int, split: int, max_depth: int) -> Optional[int]:
+    """
+    沿分支向前搜索与 split 对应的并行汇聚网关：
+    途中经过的并行拆分网关使嵌套层数加一，其对应的汇聚网关只减一层并继续向前，层数为0时遇到的汇聚网关即为所求
+    """
+    seen = set()
+    queue = deque([(start, 0)])
+    while queue:
+        idx, depth = queue.popleft()
+        if idx == split or (idx, depth) in seen:
+            continue
+        seen.add((idx, depth))
+        if graph.is_parallel_gateway(idx):
+            if len(graph.predecessors[idx]) > 1:
+                if depth == 0:
+                    return idx
+                depth -= 1
+            if len(graph.successors[idx]) > 1:
+                depth = min(depth + 1, max_depth)
+        queue.extend((nxt, depth) for nxt in graph.successors[idx])
+    return None
+
+
+def analyze_structure(dot: Union[str, BPMNGraph]) -> List[ErrorInfo]:
+    """
+    对DOT描述的流程做确定性的结构检查：
+    孤立节点、不可达节点、循环依赖、并行网关分支/汇聚不匹配。
+    """
+    try:
+        graph = dot if isinstance(dot, BPMNGraph) else BPMNGraph.from_dot(dot)
+    except Exception as e:
+        logger.error(f"结构分析解析DOT失败: {str(e)}")
+        return []
+    if not graph.nodes:
+        return []
+    return (
+        _find_orphans(graph)
+        + _find_unreachable(graph)
+        + _find_cycles(graph)
+        + _find_parallel_mismatch(graph)
+    )
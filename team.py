@@ -1,19 +1,28 @@
-
 import asyncio
 import datetime
 import json
 import logging
-import re
+import sqlite3
+import time
 from typing import Optional
 from pathlib import Path
-from metagpt.environment import Environment
-from metagpt.schema import Message
-from mutil_agent import CheckerAgent, BPMNTextAgent, ErrorCorrectorAgent, FastCorrectorAgent,ErrorInfo
-from graphviz import Source
-from typing import List, Dict, Union, Optional
-from metagpt.config2 import Config
+from llm_cache import llm_cache_scope
+from metrics import current_run_timings, observe, record_run_timings
+from render_service import render_svg
+from dot_validator import normalize_dot
+from bpmn_reader import is_bpmn_file, read_bpmn
+from bpmn_graph import BPMNGraph, render_dot
+from corrector_strategy import (CORRECTOR_STRATEGIES, STRATEGY_FAST_THEN_UPGRADE, STRATEGY_RACE,
+                                STRATEGY_SINGLE, CorrectionRace)
+from role_pool import AGENT_CONFIG_KEYS, MODEL_MAP, get_role_pool
+from run_history import get_run_history, input_hash
+from incremental import load_baseline, plan_incremental, save_baseline
+from pipeline_planner import CORRECTION_OVER_BUDGET, CORRECTION_SKIPPED, PipelinePlan, plan_pipeline
+from prompt_budget import FIT_SKIPPED, budget_adjustments_scope
+from workspace import RunWorkspace
+from typing import List, Dict, Union, Optional, Awaitable, Callable
 import xml.etree.ElementTree as ET
-from graphviz import Digraph
+# metagpt、graphviz 和各专家角色较重，在首次分析时才导入，加快API进程和命令行的启动
 
 # 日志设置
 logger = logging.getLogger(__name__)
@@ -28,54 +37,10 @@ logging.getLogger("httpx").setLevel(logging.CRITICAL)
 Path("logs").mkdir(parents=True, exist_ok=True)
 Path("reports").mkdir(parents=True, exist_ok=True)
 
-# 新增模型映射配置
-# spark=Config.from_home("spark.yaml") 
-# gpt4t = Config.from_home("THUDM.yaml")  # 从`~/.metagpt`目录加载自定义配置`gpt-4-1106-preview.yaml`
-deepseek = Config.default()  # 使用默认配置，即`config2.yaml`文件中的配置，
-spark = Config.default() 
-gpt4t = Config.default()
-
-MODEL_MAP = {
-    "GPT": gpt4t,  # 需确保从mutil_agent导入这些配置
-    "Deepseek": deepseek,
-    "Spark": spark
-}
+# 模型映射配置（MODEL_MAP）见 role_pool.py，首次使用某个模型时才加载其配置文件
 
 logger = logging.getLogger(__name__)
 
-# 将DOT渲染为SVG文件
-def extract_svg_from_dot(dot_code: str, output_path: str = "static/reports/bpmn_diagram.svg") -> Optional[str]:
-    """将 DOT 渲染为 SVG 文件"""
-    try:
-        # 新增预处理步骤
-        dot_code = re.sub(r'label="([\u4e00-\u9fa5]+)"', 
-                          lambda m: 'label="' + ''.join('\\u{:04x}'.format(ord(c)) for c in m.group(1)) + '"', 
-                          dot_code)
-        
-        src = Source(dot_code)
-        svg_path = Path(output_path)
-        src.render(svg_path.stem, directory=svg_path.parent, format='svg', cleanup=True)
-        return str(svg_path)
-    except Exception as e:
-        logger.error(f"DOT图渲染失败: {e}\nProblematic DOT code:\n{dot_code}")  # 记录错误代码
-def extract_publish_messages(log_text):
-    """
-    从日志中提取所有 publish_message: 后的内容。
-    参数:
-        log_text (str): 日志文本
-    返回:
-        List[str]: 所有提取出的 publish_message JSON 内容
-    """
-    pattern = r'publish_message:\s+(.*?)(?=\n\d{4}-\d{2}-\d{2}|\Z)'
-    matches = re.findall(pattern, log_text, re.DOTALL)
-    return [match.strip() for match in matches]
-# 日志清空函数
-def clear_log_file(log_path: str):
-    try:
-        with open(log_path, 'w') as f:
-            f.truncate(0)
-    except Exception as e:
-        logger.error(f"日志清空失败: {str(e)}")
 # 将SVG转换为DOT的函数（示例实现）
 
 def svg_to_dot(svg_path: str) -> str:
@@ -83,6 +48,7 @@ def svg_to_dot(svg_path: str) -> str:
     将BPMN SVG文件转换为Graphviz DOT语言
     支持元素：任务(Task)、事件(Event)、网关(Gateway)、连接线(Sequence Flow)
     """
+    from graphviz import Digraph
     # 加载SVG文件
     tree = ET.parse(svg_path)
     root = tree.getroot()
@@ -144,141 +110,338 @@ def svg_to_dot(svg_path: str) -> str:
     
     return dot.source
 
+def load_graph(diagram_path: str) -> BPMNGraph:
+    """读取流程图为图模型：BPMN XML 使用流式读取器，其余按SVG处理"""
+    if is_bpmn_file(diagram_path):
+        with observe("bpmn_reader"):
+            return read_bpmn(diagram_path)
+    with observe("svg_to_dot"):
+        return BPMNGraph.from_dot(svg_to_dot(diagram_path))
+
+def load_dot(diagram_path: str) -> str:
+    """根据输入文件类型生成带渲染样式的DOT"""
+    return load_graph(diagram_path).to_dot()
+
+async def run_until_idle(env, max_rounds: int = 8):
+    """
+    反复执行 env.run() 直到所有角色空闲。
+    第一轮两个检测专家并行运行，修正专家在两份报告都到齐后的下一轮启动。
+    """
+    for _ in range(max_rounds):
+        await env.run()
+        if env.is_idle:
+            return
+    logger.error(f"Environment 在 {max_rounds} 轮后仍未空闲，提前结束")
+
+async def _build_report(collector, prefer: Optional[str] = None, workspace: Optional[RunWorkspace] = None) -> dict:
+    """根据收集器中的结果生成报告并渲染修正后的流程图（写入工作区的产物存储）"""
+    suggestions = collector.suggestions
+    corrected_bpmns = collector.corrections
+
+    # 校验最终DOT（必要时自动修复），无效的DOT不交给 Graphviz 渲染
+    final_bpmn, dot_error = normalize_dot(collector.final_bpmn(prefer=prefer))
+    if dot_error and collector.corrections:
+        logger.error(f"修正结果不是有效的DOT，跳过渲染: {dot_error}")
+
+    diagram_svg = None
+    if final_bpmn:
+        # 在 dot 子进程中异步渲染，按内容哈希命名输出文件，避免并发请求互相覆盖
+        with observe("render"):
+            diagram_svg = await render_svg(render_dot(final_bpmn), workspace.artifacts if workspace else None)
+
+    report = {
+        "diagram_svg": diagram_svg,
+        "suggestions": suggestions or ["没有发现问题"],
+        "corrections": corrected_bpmns or ["没有发现修正"],
+        "dot_error": dot_error if collector.corrections else None,
+        "corrected_dot": final_bpmn
+    }
+    return report
+
+async def _record_history(run_id: str, report: dict, collector, inputs: dict):
+    """把本次运行写入运行历史（取代 latest_report.json 和按日期的日志文件）；SQLite 写入在线程中执行"""
+    findings = [
+        {"expert": expert, **item}
+        for expert, items in collector.latest_findings.items() for item in items if isinstance(item, dict)
+    ]
+    messages = [
+        {"role": m.role, "cause_by": m.cause_by, "sent_from": m.sent_from, "content": m.content}
+        for m in collector.messages
+    ]
+    try:
+        with observe("history"):
+            await asyncio.to_thread(lambda: get_run_history().record(
+                run_id, report=report, findings=findings, messages=messages, **inputs))
+    except (OSError, sqlite3.Error) as e:
+        logger.error(f"写入运行历史失败: {str(e)}")
+
+def _settle_correction(plan: PipelinePlan, collector):
+    """运行结束后按实际结果更新计划中的修正状态：没有发现问题，或修正提示词超出预算而跳过"""
+    if not plan.correct or collector.corrections:
+        return
+    if not any(collector.latest_findings.values()):
+        plan.correction = CORRECTION_SKIPPED
+    elif any(item["stage"] == "correction" and item["fit"] == FIT_SKIPPED for item in plan.adjustments):
+        plan.correction = CORRECTION_OVER_BUDGET
+
+# 后台升级任务的引用，防止任务在完成前被回收
+_background_tasks = set()
+
+async def _deliver_upgrade(env_task: asyncio.Task, collector, workspace: RunWorkspace, prefer: str,
+                           on_upgrade: Optional[Callable[[dict], Awaitable[None]]], inputs: dict,
+                           plan: PipelinePlan):
+    """fast-then-upgrade：综合修正专家完成后再生成一次报告并回调"""
+    try:
+        await env_task
+    except Exception as e:
+        # 仍然送达已收集到的结果，避免等待方一直挂起
+        logger.error(f"综合修正后台任务失败: {str(e)}")
+    _settle_correction(plan, collector)
+    report = await _build_report(collector, prefer=prefer, workspace=workspace)
+    report.update({"run_id": workspace.run_id, "corrector_strategy": STRATEGY_FAST_THEN_UPGRADE, "upgrade_pending": False,
+                   "plan": plan.summary()})
+    # 后台任务继承了本次分析的耗时记录，此时已包含综合修正专家的耗时
+    timings = current_run_timings()
+    if timings is not None:
+        report["timings"] = timings.summary()
+    await _record_history(workspace.run_id, report, collector, inputs)
+    workspace.cleanup()
+    if on_upgrade is not None:
+        try:
+            await on_upgrade(report)
+        except Exception as e:
+            logger.error(f"升级结果回调失败: {str(e)}")
+
+@record_run_timings
 async def analyze_bpmn_flow(text_description: str, dot_input: Optional[str] = None, image_path: Optional[str] = None,
             agent_configs: dict = {
                 "checker": "deepseek",
                 "text_checker": "deepseek",
                 "corrector": "gpt4",
                 "fast_corrector": "gpt35"
-            }):
-    log_path = f"logs/{datetime.datetime.now().strftime('%Y%m%d')}.txt"
-
-    env = Environment()
-    env.add_roles([
-        CheckerAgent(config=MODEL_MAP[agent_configs["checker"]]),
-        BPMNTextAgent(config=MODEL_MAP[agent_configs["text_checker"]], text_description=text_description),
-        ErrorCorrectorAgent(config=MODEL_MAP[agent_configs["corrector"]]),
-        FastCorrectorAgent(config=MODEL_MAP[agent_configs["fast_corrector"]])
-    ])
+            },
+            use_cache: bool = True,
+            corrector_strategy: Optional[str] = None,
+            upgrade_deadline: float = 30.0,
+            on_upgrade: Optional[Callable[[dict], Awaitable[None]]] = None,
+            on_event: Optional[Callable[[dict], None]] = None,
+            baseline_run_id: Optional[str] = None,
+            adaptive: bool = False,
+            max_latency: Optional[float] = None,
+            max_cost: Optional[float] = None):
+    """
+    corrector_strategy:
+        race              两个修正专家同时运行，返回第一个有效的修正结果并取消另一个调用
+        fast-then-upgrade 等待综合修正专家至 upgrade_deadline 秒，超时则先返回快速修正结果，
+                          综合修正结果完成后通过 on_upgrade 回调送达
+        single            只运行综合修正专家
+        未指定时为 race（adaptive 下的小图为 single）
+    on_event: 每当检测/修正专家产生结果时被调用，用于向客户端流式推送进度
+    baseline_run_id: 上一次分析的 run_id。指定时与上一版本做图结构对比，流程检测专家只重新检查
+                     受修改影响的区域，其余区域沿用上一次的检测结果（报告中的 incremental 字段）
+    adaptive: 按流程图大小选择模型（小图只用快速模型，大图使用强模型），未指定 corrector_strategy 时
+              小图只运行一个修正专家；默认关闭，按 agent_configs 和 corrector_strategy 执行
+    max_latency/max_cost: 本次分析的时延（秒）/费用（美元）预算，预估超出时降级计划
+    报告中的 plan 字段记录实际选择的执行计划及其预估值
+    返回的报告包含 timings：按阶段/角色/模型汇总的耗时明细及估算token数
+    """
+    if corrector_strategy is not None and corrector_strategy not in CORRECTOR_STRATEGIES:
+        raise ValueError(f"未知的修正策略: {corrector_strategy}")
+    # 每次运行有自己的 run_id 和临时目录，产物写入各worker共用的产物存储
+    workspace = RunWorkspace()
+    run_id = workspace.run_id
+    started = time.monotonic()
 
     dot_inputh = dot_input
-    # Convert SVG to DOT using a placeholder function (to be implemented)
-    print("dot_input地址:", dot_input)  # 打印 dot_input
-    dot_input = svg_to_dot(dot_inputh)
+    # .bpmn 文件直接流式读取XML，SVG 仍走 svg_to_dot；
+    # 发给各专家的是紧凑DOT（短ID、无样式和布局属性），样式在渲染时再补回
+    logger.debug(f"dot_input地址: {dot_input}")
+    # 上传到其他worker/主机的流程图从产物存储取回
+    local_input = await asyncio.to_thread(workspace.resolve_input, dot_inputh)
+    graph = await asyncio.to_thread(load_graph, local_input)
+    dot_input = graph.to_compact_dot()
+
+    scope = None
+    if baseline_run_id:
+        baseline = await asyncio.to_thread(load_baseline, baseline_run_id, workspace.artifacts)
+        if baseline is None:
+            logger.error(f"未找到分析基线 {baseline_run_id}，改为全量分析")
+        else:
+            with observe("graph_diff"):
+                scope = plan_incremental(baseline, graph)
+
+    # 按流程图大小和预算选择模型、修正策略以及是否修正
+    with observe("plan"):
+        plan = plan_pipeline(graph, dot_input, agent_configs, corrector_strategy, text_description,
+                             members=scope.members if scope is not None else None, adaptive=adaptive,
+                             max_latency=max_latency, max_cost=max_cost)
+    agent_configs, corrector_strategy = plan.agent_configs, plan.corrector_strategy
+    if max_latency is not None:
+        upgrade_deadline = min(upgrade_deadline, max_latency)
     
-    print("dot_input:", dot_input)  # 打印 dot_inpu
-    print("text_description:", text_description)  # 打印 text_description
+    logger.debug(f"dot_input: {dot_input}\ntext_description: {text_description}")
+
+    from metagpt.schema import Message
+    from mutil_agent import REQUIREMENT_CAUSE
+    from run_collector import CollectingEnvironment
+
+    # 从角色池取出该模型组合的一组角色，Environment 运行结束后重置并放回
+    role_pool = get_role_pool()
+    role_set = role_pool.acquire(agent_configs)
+    role_set.text_checker.text_description = text_description
+    role_set.checker.incremental = scope
+    strong_corrector, fast_corrector = role_set.strong_corrector, role_set.fast_corrector
+    if corrector_strategy == STRATEGY_RACE:
+        race = CorrectionRace()
+        strong_corrector.race = race
+        fast_corrector.race = race
+
+    # 每次运行使用独立的收集器，结果直接来自 Environment，而不是回读当天日志
+    env = CollectingEnvironment()
+    if on_event is not None:
+        env.collector.add_listener(on_event)
+    env.add_roles([role_set.checker, role_set.text_checker])
+    if plan.correct:
+        env.add_roles([strong_corrector])
+        if corrector_strategy != STRATEGY_SINGLE:
+            env.add_roles([fast_corrector])
    
+    # 扇出：原始DOT同时发给两个检测专家（并行检测），修正专家也需要原始DOT
     env.publish_message(Message(
         content=dot_input,
         role="user",
-        cause_by="metagpt.actions.add_requirement.AddRequirement",
+        cause_by=REQUIREMENT_CAUSE,
         sent_from="SYSTEM",
-        send_to=["Checker"]
+        send_to=["Checker", "TextChecker", "ErrorCorrector", "FastCorrector"]
     ))
 
-    await env.run()
+    # use_cache=False 时本次请求绕过LLM响应缓存；
+    # 各专家为适应提示词预算所做的调整（分片、区域修正、跳过）记入计划
+    with llm_cache_scope(use_cache), budget_adjustments_scope() as adjustments:
+        env_task = asyncio.create_task(run_until_idle(env))
+    plan.adjustments = adjustments
+    # 正常结束的角色组放回池中；失败或被取消时丢弃，避免复用残留状态
+    env_task.add_done_callback(
+        lambda task: role_pool.release(role_set, reusable=not task.cancelled() and task.exception() is None))
 
-    # 提取结果
-    # results = parse_agent_outputs(log_path)
-    with open(log_path, "r", encoding="utf-8") as f:
-        log_text = f.read()
-
-    message_list = extract_publish_messages(log_text)
-    suggestions = []
-    corrected_bpmns = []
-    # 修改为字典存储最新建议
-    latest_suggestions = {}
-    latest_corrections = {}
-
-    # 处理每条消息
-    for message in message_list:
-        # 提取 JSON 部分（可能带有 Message N: 前缀）
-        json_text = re.search(r'{.*}', message, re.DOTALL)
-        if not json_text:
-            continue
-        data = json.loads(json_text.group())
-
-        role = data.get("role", "")
-        content = data.get("content", "")
-
-        # 更新流程检测建议（只保留最后一次）
-        if "流程检测专家" in role or "一致性检测专家" in role:
-            try:
-                suggestion_list = json.loads(content)
-                for item in suggestion_list:
-                    if isinstance(item, dict):
-                        # 按专家类型存储最后一条建议
-                        latest_suggestions[role] = {
-                            "expert": role,
-                            "error_type": item.get("error_type"),
-                            "description": item.get("description"),
-                            "suggestion": item.get("suggestion")
-                        }
-            except:
-                pass
-
-        # 更新修正专家结果（只保留最后一次）
-        if "修正专家" in role:
-            try:
-                bpmn_info = json.loads(content)
-                latest_corrections[role] = {
-                    "expert": role,
-                    "bpmn": bpmn_info.get("corrected_bpmn", ""),
-                    "modifications": bpmn_info.get("modifications", {})
-                }
-            except:
-                pass
-
-    # 转换字典为列表
-    suggestions = list(latest_suggestions.values())
-    corrected_bpmns = list(latest_corrections.values())
-            
+    collector = env.collector
+    upgrade_pending = False
+    if corrector_strategy == STRATEGY_FAST_THEN_UPGRADE:
+        # 先等快速修正专家（或整个流程结束），再给综合修正专家留到截止时间
+        fast_done = asyncio.create_task(collector.wait_for_role(fast_corrector.profile))
+        await asyncio.wait([env_task, fast_done], return_when=asyncio.FIRST_COMPLETED)
+        fast_done.cancel()
+        remaining = max(upgrade_deadline - (time.monotonic() - started), 0)
+        await asyncio.wait([env_task], timeout=remaining)
+        upgrade_pending = not env_task.done()
+    if not upgrade_pending:
+        await env_task
 
-    print("\n======= 修正后的BPMN图（最后一个专家） =======")
-    # 在获取最终BPMN时增加清洗逻辑
-    final_bpmn = corrected_bpmns[-1]["bpmn"] if corrected_bpmns else None
-    if final_bpmn:
-        # 移除DOT代码块标记和转义字符
-        final_bpmn = re.sub(r'^```\w+\s*', '', final_bpmn, flags=re.MULTILINE)
-        final_bpmn = final_bpmn.replace('\\n', '\n').replace('```', '').strip()
+    if not upgrade_pending:
+        _settle_correction(plan, collector)
 
-    report = {
-        "diagram_svg": extract_svg_from_dot(final_bpmn) if final_bpmn else None,
-        "suggestions": suggestions or ["没有发现问题"],
-        "corrections": corrected_bpmns or ["没有发现修正"]
+    # 提取结果
+    report = await _build_report(collector, prefer=strong_corrector.profile, workspace=workspace)
+    report.update({
+        "run_id": run_id,
+        "corrector_strategy": corrector_strategy,
+        "upgrade_pending": upgrade_pending,
+        "incremental": scope.summary() if scope is not None else None,
+        "plan": plan.summary()
+    })
+    # 保存本次的图和检测结果，供下一版本增量分析
+    await asyncio.to_thread(save_baseline, run_id, graph,
+                            collector.latest_findings.get(role_set.checker.profile, []), workspace.artifacts)
+    inputs = {
+        "input_hash": input_hash(local_input, text_description),
+        "diagram_path": str(dot_inputh),
+        "description": text_description,
+        "models": {key: agent_configs[key] for key in AGENT_CONFIG_KEYS},
+        "corrector_strategy": corrector_strategy,
+        "baseline_run_id": baseline_run_id
     }
-    
-    Path("static/reports/latest_report.json").write_text(json.dumps(report, ensure_ascii=False, indent=2))
+    # 耗时明细由 record_run_timings 在返回后写入，这里先记录当前的汇总
+    timings = current_run_timings()
+    await _record_history(run_id, {**report, "timings": timings.summary() if timings else None}, collector, inputs)
+    if upgrade_pending:
+        task = asyncio.create_task(_deliver_upgrade(env_task, collector, workspace, strong_corrector.profile,
+                                                    on_upgrade, inputs, plan))
+        _background_tasks.add(task)
+        task.add_done_callback(_background_tasks.discard)
+    else:
+        workspace.cleanup()
     return report
 
 # 命令行入口
 if __name__ == "__main__":
     import typer
+    from batch_runner import discover_items, load_manifest, run_batch
     app = typer.Typer()
 
-    @app.command()
+    @app.command("analyze")
     def main(
         bpmn_path: str = typer.Argument(..., help="BPMN文件路径"),
         description_path: str = typer.Argument(..., help="流程文本描述文件路径"),
         checker_model: str = typer.Option("spark", help="流程检测专家模型 (gpt4/deepseek/gpt35)"),
         text_model: str = typer.Option("deepseek", help="文本检测专家模型"),
         corrector_model: str = typer.Option("spark", help="综合修正专家模型"), 
-        fast_model: str = typer.Option("spark", help="快速修正专家模型")
+        fast_model: str = typer.Option("spark", help="快速修正专家模型"),
+        use_cache: bool = typer.Option(True, help="是否使用LLM响应缓存"),
+        corrector_strategy: Optional[str] = typer.Option(None, help="修正策略 (race/fast-then-upgrade/single)，默认 race"),
+        baseline_run: Optional[str] = typer.Option(None, help="上一次分析的 run_id，只重新检查修改过的区域"),
+        adaptive: bool = typer.Option(False, help="按流程图大小选择模型（未指定修正策略时小图只运行一个修正专家）"),
+        max_latency: Optional[float] = typer.Option(None, help="时延预算（秒），预估超出时降级执行计划"),
+        max_cost: Optional[float] = typer.Option(None, help="费用预算（美元），预估超出时降级执行计划")
     ):
         async def _main():
-            bpmn_content = Path(bpmn_path).read_text(encoding="utf-8")
             desc_content = Path(description_path).read_text(encoding="utf-8")
-            report = await analyze_bpmn_flow(bpmn_content, desc_content,
+            # analyze_bpmn_flow 接收流程图文件路径，由其自行读取并转换为DOT
+            report = await analyze_bpmn_flow(desc_content, bpmn_path,
              agent_configs={
                 "checker": checker_model,
                 "text_checker": text_model,
                 "corrector": corrector_model,
                 "fast_corrector": fast_model
-            })
+            }, use_cache=use_cache, corrector_strategy=corrector_strategy, baseline_run_id=baseline_run,
+             adaptive=adaptive, max_latency=max_latency, max_cost=max_cost)
             print(json.dumps(report, ensure_ascii=False, indent=2))
 
         asyncio.run(_main())
 
-    app()
+    @app.command("batch")
+    def batch(
+        source: str = typer.Argument(..., help="样例目录（如 test_sample）或清单文件（JSON/JSONL）"),
+        output: str = typer.Option("reports/batch_results.jsonl", help="结果输出文件，每行一个JSON报告"),
+        concurrency: int = typer.Option(4, help="同时运行的分析数"),
+        resume: bool = typer.Option(True, help="跳过输出文件中已成功的项，从中断处继续"),
+        retry_failed: bool = typer.Option(True, help="续跑时是否重试失败的项"),
+        item_timeout: Optional[float] = typer.Option(None, help="单项分析超时时间（秒）"),
+        checker_model: str = typer.Option("spark", help="流程检测专家模型"),
+        text_model: str = typer.Option("deepseek", help="文本检测专家模型"),
+        corrector_model: str = typer.Option("spark", help="综合修正专家模型"),
+        fast_model: str = typer.Option("spark", help="快速修正专家模型"),
+        use_cache: bool = typer.Option(True, help="是否使用LLM响应缓存"),
+        corrector_strategy: str = typer.Option(STRATEGY_RACE, help="修正策略 (race/single)")
+    ):
+        """批量分析：一个进程内并发处理目录或清单中的全部流程，只加载一次模型配置"""
+        if corrector_strategy == STRATEGY_FAST_THEN_UPGRADE:
+            # 批量模式没有接收升级结果的客户端，逐项等待综合修正即可
+            raise typer.BadParameter("批量模式不支持 fast-then-upgrade，请使用 race 或 single")
+        items = load_manifest(source) if Path(source).is_file() else discover_items(source)
+        agent_configs = {
+            "checker": checker_model,
+            "text_checker": text_model,
+            "corrector": corrector_model,
+            "fast_corrector": fast_model
+        }
 
+        async def analyze(item):
+            desc_content = Path(item.description).read_text(encoding="utf-8")
+            return await analyze_bpmn_flow(desc_content, item.diagram, agent_configs=agent_configs,
+                                           use_cache=use_cache, corrector_strategy=corrector_strategy)
+
+        stats = asyncio.run(run_batch(items, output, analyze, concurrency=concurrency, resume=resume,
+                                      retry_failed=retry_failed, item_timeout=item_timeout))
+        print(json.dumps(stats, ensure_ascii=False))
+
+    app()
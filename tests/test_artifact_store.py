@@ -0,0 +1,30 @@
+import os
+
+from artifact_store import LocalArtifactStore, prune_artifacts
+
+
+def _put(store, name, mtime):
+    store.put(name, b"x")
+    os.utime(store.root / name, (mtime, mtime))
+
+
+def test_prune_keeps_newest_and_removes_derived_artifacts_together(tmp_path):
+    store = LocalArtifactStore(tmp_path)
+    for i in range(3):
+        _put(store, f"report_{i}.json", 1000 + i)
+        _put(store, f"report_{i}.json.gz", 1000 + i)
+    _put(store, "job_a.json", 900)
+
+    store.prune("report_", 2)
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "job_a.json", "report_1.json", "report_1.json.gz", "report_2.json", "report_2.json.gz"]
+
+
+def test_prune_artifacts_applies_each_prefix(tmp_path):
+    store = LocalArtifactStore(tmp_path)
+    for i in range(3):
+        _put(store, f"job_{i}.json", 1000 + i)
+        _put(store, f"upload_{i}.bpmn", 1000 + i)
+
+    prune_artifacts({"job_": 1, "upload_": 0}, store)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["job_2.json"]
@@ -0,0 +1,42 @@
+from bpmn_graph import BPMNGraph
+from dot_validator import validate_dot
+
+DOT = ('digraph G { start [label="Start", shape=circle]; check [label="Check \\"order\\""]; '
+       'gw [label="ok?", shape=diamond]; end [shape=doublecircle]; '
+       'start -> check -> gw; gw -> end [label="yes"]; gw -> check [label="no"] }')
+
+
+def test_to_dot_is_valid_and_round_trips():
+    graph = BPMNGraph.from_dot(DOT)
+    dot = graph.to_dot()
+    assert validate_dot(dot) == len(graph.nodes) + len(graph.edges)
+    assert 'splines="ortho";' in dot and 'ranksep="1.5 equally";' in dot
+    again = BPMNGraph.from_dot(dot)
+    assert [n.id for n in again.nodes] == [n.id for n in graph.nodes]
+    assert [n.label for n in again.nodes] == [n.label or n.id for n in graph.nodes]
+    assert [(e.source, e.target, e.label) for e in again.edges] == \
+        [(e.source, e.target, e.label) for e in graph.edges]
+
+
+def test_compact_dot_uses_short_ids_and_keeps_structure():
+    graph = BPMNGraph.from_dot(DOT)
+    compact = graph.to_compact_dot()
+    validate_dot(compact)
+    assert "fillcolor" not in compact
+    parsed = BPMNGraph.from_dot(compact)
+    assert [n.id for n in parsed.nodes] == graph.compact_ids()
+    assert len(parsed.edges) == len(graph.edges)
+
+
+def test_replace_region_merges_corrected_fragment():
+    graph = BPMNGraph.from_dot(BPMNGraph.from_dot('digraph { a -> b -> c -> d; b -> e }').to_compact_dot())
+    # n2 (b) is the region; n1/n3/n5 are context, n4 is outside
+    fragment = BPMNGraph.from_dot('digraph { n2 [label="B2"]; x1 [label="new"]; n3 [label="changed"]; '
+                                  'n1 -> n2 -> x1 -> n3; n3 -> n4 }')
+    merged = graph.replace_region([1], fragment)
+    assert {n.id: n.label for n in merged.nodes} == \
+        {"n1": "a", "n2": "B2", "x1": "new", "n3": "c", "n4": "d", "n5": "e"}
+    edges = {(merged.nodes[e.source].id, merged.nodes[e.target].id) for e in merged.edges}
+    # n2 -> n5 is dropped by the fragment, the context-only edge n3 -> n4 is kept once
+    assert edges == {("n1", "n2"), ("n2", "x1"), ("x1", "n3"), ("n3", "n4")}
+    assert merged.to_compact_dot(keep_ids=True).count("n3 -> n4") == 1
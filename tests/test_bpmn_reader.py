@@ -0,0 +1,71 @@
+import codecs
+import io
+
+from bpmn_reader import read_bpmn
+
+# 使用 bpmn: 前缀但没有声明命名空间（很多导出文件如此）
+_UNDECLARED = '''<bpmn:definitions>
+  <bpmn:process id="p1">
+    <bpmn:laneSet>
+      <bpmn:lane id="l1" name="申请人"><bpmn:flowNodeRef>start</bpmn:flowNodeRef><bpmn:flowNodeRef>apply</bpmn:flowNodeRef></bpmn:lane>
+      <bpmn:lane id="l2" name="审批人"><bpmn:flowNodeRef>gw</bpmn:flowNodeRef><bpmn:flowNodeRef>end</bpmn:flowNodeRef></bpmn:lane>
+    </bpmn:laneSet>
+    <bpmn:startEvent id="start" name="开始"/>
+    <bpmn:userTask id="apply" name="提交申请"/>
+    <bpmn:exclusiveGateway id="gw" name="是否通过"/>
+    <bpmn:endEvent id="end" name="结束"/>
+    <bpmn:sequenceFlow id="f1" sourceRef="start" targetRef="apply"/>
+    <bpmn:sequenceFlow id="f2" sourceRef="apply" targetRef="gw"/>
+    <bpmn:sequenceFlow id="f3" sourceRef="gw" targetRef="end">
+      <bpmn:conditionExpression>${approved}</bpmn:conditionExpression>
+    </bpmn:sequenceFlow>
+    <bpmn:sequenceFlow id="f4" sourceRef="gw" targetRef="apply" name="驳回"/>
+  </bpmn:process>
+  <bpmndi:BPMNDiagram id="d1"><bpmndi:BPMNPlane id="pl1" bpmnElement="p1"/></bpmndi:BPMNDiagram>
+</bpmn:definitions>'''
+
+
+def _read(data: bytes):
+    return read_bpmn(io.BytesIO(data))
+
+
+def test_undeclared_prefix_nodes_and_kinds():
+    graph = _read(_UNDECLARED.encode("utf-8"))
+    assert [(n.id, n.kind, n.label) for n in graph.nodes] == [
+        ("start", "startEvent", "开始"), ("apply", "userTask", "提交申请"),
+        ("gw", "exclusiveGateway", "是否通过"), ("end", "endEvent", "结束")]
+
+
+def test_lanes_are_assigned_to_nodes():
+    graph = _read(_UNDECLARED.encode("utf-8"))
+    assert {n.id: n.lane for n in graph.nodes} == {"start": "申请人", "apply": "申请人", "gw": "审批人", "end": "审批人"}
+
+
+def test_condition_expression_and_name_become_edge_labels():
+    graph = _read(_UNDECLARED.encode("utf-8"))
+    labels = {(graph.nodes[e.source].id, graph.nodes[e.target].id): e.label for e in graph.edges}
+    assert labels == {("start", "apply"): None, ("apply", "gw"): None,
+                      ("gw", "end"): "${approved}", ("gw", "apply"): "驳回"}
+
+
+def test_utf8_bom_with_declaration():
+    data = codecs.BOM_UTF8 + ('<?xml version="1.0" encoding="UTF-8"?>\n' + _UNDECLARED).encode("utf-8")
+    assert len(_read(data).nodes) == 4
+
+
+def test_declared_gbk_encoding_is_decoded():
+    data = ('<?xml version="1.0" encoding="GBK"?>\n' + _UNDECLARED).encode("gbk")
+    assert [n.label for n in _read(data).nodes] == ["开始", "提交申请", "是否通过", "结束"]
+
+
+def test_multibyte_characters_split_across_chunks():
+    # 正文远大于一个读取块，GBK 双字节字符会落在块边界上
+    tasks = "".join(f'<bpmn:task id="t{i}" name="处理步骤{i}"/>' for i in range(5000))
+    data = f'<?xml version="1.0" encoding="GBK"?><bpmn:definitions><bpmn:process id="p">{tasks}</bpmn:process></bpmn:definitions>'
+    graph = _read(data.encode("gbk"))
+    assert len(graph.nodes) == 5000 and graph.nodes[-1].label == "处理步骤4999"
+
+
+def test_doctype_is_skipped():
+    data = ('<?xml version="1.0"?>\n<!DOCTYPE definitions>\n' + _UNDECLARED).encode("utf-8")
+    assert len(_read(data).nodes) == 4
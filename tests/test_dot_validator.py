@@ -0,0 +1,100 @@
+import pytest
+
+from dot_validator import DotSyntaxError, is_valid_dot, normalize_dot, repair_dot, validate_dot
+
+
+def test_validate_counts_statements():
+    assert validate_dot('digraph G { a -> b; c [label="C"]; rankdir=LR }') == 2
+
+
+@pytest.mark.parametrize("dot, message", [
+    ('digraph { a -> b', "expected '}'"),
+    ('digraph { a [label="x" }', "expected an attribute name"),
+    ('digraph { a [Start] }', "expected '=' after attribute 'Start'"),
+    ('digraph { a -- b }', "'--' is not allowed in a digraph"),
+    ('graph { a -> b }', "'->' is not allowed in an undirected graph"),
+    ('digraph { a.b -> c }', "invalid id 'a.b'"),
+    ('digraph { a -> b } extra', "after the closing"),
+    ('a -> b', "expected 'digraph' or 'graph'"),
+])
+def test_validate_reports_position(dot, message):
+    with pytest.raises(DotSyntaxError) as excinfo:
+        validate_dot(dot)
+    assert message in str(excinfo.value)
+    assert excinfo.value.line == 1
+
+
+def test_error_line_and_column():
+    with pytest.raises(DotSyntaxError) as excinfo:
+        validate_dot('digraph {\n  a -> ;\n}')
+    assert (excinfo.value.line, excinfo.value.column) == (2, 8)
+
+
+def test_valid_dot_is_returned_unchanged():
+    dot = 'digraph { a -> b [label="yes"] }'
+    assert normalize_dot(dot) == (dot + "\n", None)
+
+
+@pytest.mark.parametrize("text", [
+    'A[Start] -> B',
+    'A[Start] -> B[End] -> C',
+    'digraph {\n  A[label="Start"] -> B\n}',
+    '```dot\ndigraph { a -> b }\n```',
+    'Here is the corrected graph:\ndigraph { a -> b }\nI fixed the gateway.',
+    'digraph { a [label=Start Event]; a -> b }',
+    'digraph {\n  a [label="x";\n  a -> b\n}',
+    'digraph { a -> b',
+    'digraph { a -> b }}',
+    'digraph { a -- b }',
+    'digraph { a [label=“Start”] -> b }',
+    'digraph {\\n  a -> b\\n}',
+])
+def test_repairable_output(text):
+    dot, error = normalize_dot(text)
+    assert error is None, error
+    assert validate_dot(dot) > 0
+
+
+def test_bare_label_becomes_node_declaration():
+    dot, _ = normalize_dot('A[Start] -> B[End] -> C')
+    assert 'A [label="Start"];' in dot
+    assert 'B [label="End"];' in dot
+    assert "A -> B -> C" in dot
+
+
+def test_trailing_edge_attributes_are_kept_on_the_edge():
+    dot, _ = normalize_dot('digraph {\n  a -> b [label="yes"]\n  c[Start] -> a\n}')
+    assert 'a -> b [label="yes"]' in dot
+    assert 'c [label="Start"]; c -> a' in dot
+
+
+def test_prose_lines_are_dropped():
+    dot, error = normalize_dot('digraph {\n  a -> b\n  Note that I added an end event\n}')
+    assert error is None and "Note" not in dot
+
+
+def test_opening_brace_on_its_own_line():
+    text = 'digraph G\n{\n  rankdir=LR\n  subgraph cluster_x\n  {\n    label="Lane"\n    a -> b\n  }\n  b -> c\n}'
+    assert normalize_dot(text) == (text + "\n", None)
+    # 需要修复时也保留图名、图属性和子图
+    dot, error = normalize_dot("Here is the graph:\n" + text.replace("b -> c", "b -> c [label=done"))
+    assert error is None
+    assert dot.startswith("digraph G\n{") and "rankdir=LR" in dot and "subgraph cluster_x" in dot
+
+
+def test_escaped_newlines_inside_labels_are_kept():
+    dot = 'digraph {\n  a [label="line1\\nline2"]\n}'
+    assert repair_dot(dot) == dot + "\n"
+
+
+@pytest.mark.parametrize("text, message", [
+    (None, "empty output"),
+    ("   ", "empty output"),
+    ("I could not find any issues.", "no 'digraph"),
+    ("digraph { }", "no nodes or edges"),
+    ('digraph { a -> [ }', "line"),
+])
+def test_unrepairable_output(text, message):
+    dot, error = normalize_dot(text)
+    assert dot is None and message in error
+    assert not is_valid_dot(text)
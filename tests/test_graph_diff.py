@@ -0,0 +1,95 @@
+from bpmn_graph import BPMNGraph
+from graph_diff import diff_graphs
+
+
+def _graph(body):
+    return BPMNGraph.from_dot(f"digraph G {{ {body} }}")
+
+
+BASE = ('a [label="Start"]; b [label="Review", shape=box]; c [label="Approve", shape=box]; '
+        'd [label="End"]; a -> b; b -> c; c -> d')
+
+
+def test_identical_graphs_have_no_diff():
+    old, new = _graph(BASE), _graph(BASE)
+    diff = diff_graphs(old, new)
+    assert len(diff) == 0
+    assert diff.mapping == {0: 0, 1: 1, 2: 2, 3: 3}
+    assert diff.affected(old, new) == set()
+
+
+def test_renumbered_ids_match_by_label_and_kind():
+    old = _graph(BASE)
+    new = _graph('x [label="Start"]; y [label="Review", shape=box]; c [label="Approve", shape=box]; '
+                 'd [label="End"]; x -> y; y -> c; c -> d')
+    diff = diff_graphs(old, new)
+    assert diff.added_nodes == [] and diff.removed_nodes == []
+    assert len(diff) == 0
+
+
+def test_ambiguous_labels_are_not_matched():
+    old = _graph('p [label="Task"]; q [label="Task"]; p -> q')
+    new = _graph('r [label="Task"]; s [label="Task"]; r -> s')
+    diff = diff_graphs(old, new)
+    assert sorted(diff.removed_nodes) == [0, 1]
+    assert sorted(diff.added_nodes) == [0, 1]
+
+
+def test_unlabelled_nodes_only_match_by_id():
+    old, new = _graph("p -> q"), _graph("r -> q")
+    diff = diff_graphs(old, new)
+    assert diff.removed_nodes == [old.index["p"]] and diff.added_nodes == [new.index["r"]]
+
+
+def test_label_change_is_a_changed_node():
+    old = _graph(BASE)
+    new = _graph(BASE.replace('"Approve"', '"Sign off"'))
+    diff = diff_graphs(old, new)
+    assert diff.changed_nodes == [new.index["c"]]
+    assert any("Approve → Sign off" in line for line in diff.describe(old, new))
+
+
+def test_added_node_and_edges():
+    old = _graph(BASE)
+    new = _graph(BASE + '; e [label="Notify", shape=box]; c -> e; e -> d')
+    diff = diff_graphs(old, new)
+    e = new.index["e"]
+    assert diff.added_nodes == [e]
+    assert sorted(diff.added_edges) == sorted([(new.index["c"], e, None), (e, new.index["d"], None)])
+    assert diff.removed_edges == []
+    assert diff.affected(old, new, hops=0) == {new.index["c"], e, new.index["d"]}
+
+
+def test_removed_node_marks_neighbours():
+    old = _graph(BASE)
+    new = _graph('a [label="Start"]; b [label="Review", shape=box]; d [label="End"]; a -> b; b -> d')
+    diff = diff_graphs(old, new)
+    assert diff.removed_nodes == [old.index["c"]]
+    assert len(diff.removed_edges) == 2
+    assert (new.index["b"], new.index["d"], None) in diff.added_edges
+    assert diff.affected(old, new, hops=0) == {new.index["b"], new.index["d"]}
+
+
+def test_parallel_edges_are_compared_as_multiset():
+    old = _graph("p -> q; p -> q")
+    new = _graph("p -> q")
+    diff = diff_graphs(old, new)
+    assert diff.removed_edges == [(0, 1, None)]
+    assert diff.added_edges == []
+
+
+def test_edge_label_change():
+    old = _graph('p -> q [label="yes"]')
+    new = _graph('p -> q [label="no"]')
+    diff = diff_graphs(old, new)
+    assert diff.added_edges == [(0, 1, "no")]
+    assert diff.removed_edges == [(0, 1, "yes")]
+
+
+def test_affected_expands_by_hops():
+    chain = " -> ".join(f"n{i}" for i in range(10))
+    old = _graph(chain)
+    new = _graph(chain + '; n5 [label="changed"]')
+    diff = diff_graphs(old, new)
+    assert diff.affected(old, new, hops=0) == {5}
+    assert diff.affected(old, new, hops=2) == {3, 4, 5, 6, 7}
@@ -0,0 +1,88 @@
+from bpmn_graph import BPMNGraph
+from graph_partition import partition_graph
+
+
+def _chain(n, prefix="n"):
+    return " ".join(f"{prefix}{i} -> {prefix}{i + 1};" for i in range(n - 1))
+
+
+def _graph(body):
+    return BPMNGraph.from_dot(f"digraph G {{ {body} }}")
+
+
+def _assert_covers(graph, shards, max_nodes, selected=None):
+    members = [idx for shard in shards for idx in shard.members]
+    expected = sorted(graph.iter_indices()) if selected is None else sorted(selected)
+    assert sorted(members) == expected  # 每个节点恰好属于一个分片
+    for shard in shards:
+        assert 0 < len(shard) <= max_nodes
+        assert not set(shard.boundary) & set(shard.members)
+
+
+def test_empty_graph_has_no_shards():
+    assert partition_graph(BPMNGraph()) == []
+
+
+def test_small_graph_is_one_shard_without_boundary():
+    graph = _graph(_chain(10))
+    shards = partition_graph(graph, max_nodes=10)
+    assert len(shards) == 1
+    assert shards[0].members == list(range(10))
+    assert shards[0].boundary == []
+
+
+def test_long_chain_is_split_into_bounded_contiguous_shards():
+    graph = _graph(_chain(25))
+    shards = partition_graph(graph, max_nodes=10)
+    _assert_covers(graph, shards, 10)
+    assert [len(s) for s in shards] == [10, 10, 5]
+    # 相邻分片之间的连线在两侧都可见
+    first, second = shards[0], shards[1]
+    assert set(first.boundary) & set(second.members)
+    assert set(second.boundary) & set(first.members)
+
+
+def test_boundary_is_one_hop():
+    graph = _graph(_chain(30))
+    for shard in partition_graph(graph, max_nodes=10):
+        members = set(shard.members)
+        for idx in shard.boundary:
+            assert any(n in members for n in graph.successors[idx] + graph.predecessors[idx])
+
+
+def test_small_components_are_packed_together():
+    body = " ".join(_chain(3, prefix=f"c{k}_") for k in range(6))
+    graph = _graph(body)
+    shards = partition_graph(graph, max_nodes=10)
+    _assert_covers(graph, shards, 10)
+    assert [len(s) for s in shards] == [9, 9]
+    assert all(s.boundary == [] for s in shards)
+
+
+def test_lanes_split_large_component():
+    graph = BPMNGraph()
+    for i in range(12):
+        graph.add_node(f"a{i}", {"lane": "A"})
+        graph.add_node(f"b{i}", {"lane": "B"})
+    for i in range(11):
+        graph.add_edge(f"a{i}", f"a{i + 1}")
+        graph.add_edge(f"b{i}", f"b{i + 1}")
+    graph.add_edge("a11", "b0")
+    shards = partition_graph(graph, max_nodes=12)
+    _assert_covers(graph, shards, 12)
+    for shard in shards:
+        assert len({graph.nodes[i].lane for i in shard.members}) == 1
+
+
+def test_members_restricts_partition():
+    graph = _graph(_chain(40))
+    selected = list(range(5, 28))
+    shards = partition_graph(graph, max_nodes=10, members=selected)
+    _assert_covers(graph, shards, 10, selected)
+    assert partition_graph(graph, members=[]) == []
+
+
+def test_shard_boundary_for_members_includes_unselected_neighbours():
+    graph = _graph(_chain(10))
+    shards = partition_graph(graph, max_nodes=10, members=[3, 4, 5])
+    assert len(shards) == 1 and shards[0].boundary == [2, 6]
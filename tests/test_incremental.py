@@ -0,0 +1,17 @@
+from artifact_store import LocalArtifactStore
+from bpmn_graph import BPMNGraph
+from incremental import load_baseline, save_baseline
+
+
+def test_baseline_round_trips_through_the_artifact_store(tmp_path):
+    store = LocalArtifactStore(tmp_path)
+    graph = BPMNGraph.from_dot("digraph { start -> review -> end }")
+    findings = [{"source": "ErrorChecker", "error_type": "x", "element_id": "n2", "description": "d", "suggestion": "s"},
+                {"source": "BPMNTextChecker", "error_type": "y", "element_id": "n1", "description": "d", "suggestion": "s"}]
+    save_baseline("a" * 32, graph, findings, store)
+
+    baseline = load_baseline("a" * 32, store)
+    assert [n.id for n in baseline.graph.nodes] == ["start", "review", "end"]
+    # only checker findings are carried, with the short id mapped back to the original node id
+    assert [(f.source, f.element_id) for f in baseline.findings] == [("ErrorChecker", "review")]
+    assert load_baseline("b" * 32, store) is None
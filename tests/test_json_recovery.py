@@ -0,0 +1,110 @@
+import json
+
+import pytest
+
+from json_recovery import error_entries, recover_error_entries, repair_json, salvage_entries
+
+REPORT = {"error_type": "Gateway", "errors": [
+    {"description": "d1", "suggestion": "s1"},
+    {"description": "d2", "suggestion": "s2", "error_type": "Own"},
+]}
+
+
+def _descriptions(entries):
+    return [e["description"] for e in entries]
+
+
+@pytest.mark.parametrize("broken, expected", [
+    ("{'a': 'b'}", {"a": "b"}),
+    ('{"a": [1, 2,], }', {"a": [1, 2]}),
+    ('{a: 1, b_c: "x"}', {"a": 1, "b_c": "x"}),
+    ('{"a": True, "b": None, "c": False}', {"a": True, "b": None, "c": False}),
+    ("{'it\\'s': 'x \"q\"'}", {"it's": 'x "q"'}),
+    ('Here you go: {"a": 1} hope it helps', {"a": 1}),
+])
+def test_repair_common_mistakes(broken, expected):
+    assert json.loads(repair_json(broken)) == expected
+
+
+def test_repair_truncated_output_keeps_complete_pairs():
+    text = '{"errors": [{"description": "d1"}, {"description": "d2", "sugg'
+    assert json.loads(repair_json(text)) == {"errors": [{"description": "d1"}, {"description": "d2"}]}
+
+
+def test_repair_truncated_value_is_dropped():
+    text = '{"errors": [{"description": "d1"}, {"description": "half a sent'
+    assert json.loads(repair_json(text)) == {"errors": [{"description": "d1"}]}
+
+
+def test_repair_truncated_inside_string_without_cut_point():
+    assert json.loads(repair_json('["abc')) == ["abc"]
+
+
+def test_repair_leaves_words_inside_identifiers():
+    assert json.loads(repair_json('{"a": "None of these"}')) == {"a": "None of these"}
+
+
+def test_repair_without_json_returns_text():
+    assert repair_json("no json here") == "no json here"
+
+
+def test_error_entries_normalizes_shapes():
+    assert error_entries(REPORT) == [
+        {"description": "d1", "suggestion": "s1", "error_type": "Gateway"},
+        {"description": "d2", "suggestion": "s2", "error_type": "Own"},
+    ]
+    assert _descriptions(error_entries([REPORT, {"errors": {"description": "d3"}}])) == ["d1", "d2", "d3"]
+    assert error_entries([{"description": ""}, "text", 3, {"suggestion": "x"}]) == []
+
+
+@pytest.mark.parametrize("text", [
+    json.dumps(REPORT),
+    "```json\n" + json.dumps(REPORT) + "\n```",
+    "Analysis [Note]: found issues.\n" + json.dumps(REPORT) + "\nLet me know.",
+    json.dumps(REPORT).replace('"', "'"),
+    json.dumps(REPORT)[:-2] + ",]}",
+])
+def test_recover_full_report(text):
+    entries, error = recover_error_entries(text)
+    assert error is None
+    assert _descriptions(entries) == ["d1", "d2"]
+
+
+def test_recover_truncated_report_keeps_complete_entries():
+    text = json.dumps(REPORT)[:-30]
+    entries, error = recover_error_entries(text)
+    assert error is None and entries == [{"description": "d1", "suggestion": "s1", "error_type": "Gateway"},
+                                         {"description": "d2", "error_type": "Gateway"}]
+
+
+def test_recover_prefers_outer_report_over_inner_list():
+    text = '{"error_type": "X", "errors": [{"description": "d1", "ids": [1, 2]}], oops}'
+    entries, _ = recover_error_entries(text)
+    assert _descriptions(entries) == ["d1"] and entries[0]["error_type"] == "X"
+
+
+def test_recover_empty_and_no_findings():
+    assert recover_error_entries("") == ([], None)
+    assert recover_error_entries("[]") == ([], None)
+    assert recover_error_entries('{"errors": []}') == ([], None)
+
+
+def test_salvage_entries_from_broken_structure():
+    text = ('{"error_type": "Flow", "errors": [{"description": "d1", "suggestion": "s1"} '
+            '{"description": "d2" "suggestion": "s2"}, {"no_description": 1}')
+    assert _descriptions(salvage_entries(text)) == ["d1"]
+    entries, error = recover_error_entries(text)
+    assert error is None
+    assert _descriptions(entries) == ["d1"] and entries[0]["error_type"] == "Flow"
+
+
+def test_salvage_repairs_individual_entries():
+    text = "errors: {'description': 'd1',} and then {description: 'd2'} garbage ]]"
+    assert _descriptions(salvage_entries(text)) == ["d1", "d2"]
+
+
+def test_recover_fails_without_any_entry():
+    entries, error = recover_error_entries("I could not analyse this diagram.")
+    assert entries is None and error
+    entries, error = recover_error_entries('{"errors": [{"desc')
+    assert entries is None or entries == []
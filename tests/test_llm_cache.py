@@ -0,0 +1,69 @@
+import asyncio
+import time
+
+import llm_cache
+from llm_cache import LLMResponseCache, cached_aask, llm_cache_scope
+
+
+def _cache(tmp_path, **kwargs):
+    return LLMResponseCache(str(tmp_path / "cache.sqlite3"), **kwargs)
+
+
+def test_key_depends_on_config_action_and_prompt():
+    config = {"model": "generalv3", "max_token": 512, "api_key": "a"}
+    key = LLMResponseCache.make_key(config, "ErrorChecker", "p")
+    assert key != LLMResponseCache.make_key({**config, "max_token": 4096}, "ErrorChecker", "p")
+    assert key != LLMResponseCache.make_key({**config, "model": "generalv3.5"}, "ErrorChecker", "p")
+    assert key != LLMResponseCache.make_key(config, "ErrorCorrector", "p")
+    assert key != LLMResponseCache.make_key(config, "ErrorChecker", "q")
+    # 密钥不参与键计算，更换密钥后仍能命中
+    assert key == LLMResponseCache.make_key({**config, "api_key": "b", "api_secret": "s"}, "ErrorChecker", "p")
+
+
+def test_entries_expire_after_ttl(tmp_path, monkeypatch):
+    cache = _cache(tmp_path, ttl=60)
+    cache.set("k", "A", "response")
+    assert cache.get("k") == "response"
+    now = time.time()
+    monkeypatch.setattr(llm_cache.time, "time", lambda: now + 61)
+    assert cache.get("k") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entry_is_evicted(tmp_path, monkeypatch):
+    cache = _cache(tmp_path, max_entries=2)
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(llm_cache.time, "time", lambda: next(clock))
+    cache.set("a", "A", "1")
+    cache.set("b", "A", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "A", "3")
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+
+
+class _Action:
+    prefix = "You are a checker"
+    llm = None
+
+
+def test_scope_bypasses_the_cache(tmp_path, monkeypatch):
+    cache = _cache(tmp_path)
+    calls = []
+
+    async def fake_aask(action, prompt):
+        calls.append(prompt)
+        return f"reply {len(calls)}"
+
+    monkeypatch.setattr(llm_cache, "get_llm_cache", lambda: cache)
+    monkeypatch.setattr(llm_cache, "_timed_aask", fake_aask)
+
+    async def run():
+        first = await cached_aask(_Action(), "p")
+        cached = await cached_aask(_Action(), "p")
+        with llm_cache_scope(False):
+            bypassed = await cached_aask(_Action(), "p")
+        return first, cached, bypassed
+
+    assert asyncio.run(run()) == ("reply 1", "reply 1", "reply 2")
+    assert len(calls) == 2
@@ -0,0 +1,40 @@
+import asyncio
+import time
+
+from llm_scheduler import TokenBucket
+
+
+def test_token_bucket_waiters_sleep_concurrently_in_arrival_order():
+    async def main():
+        bucket = TokenBucket(rate=20, capacity=1)
+        started = time.monotonic()
+        done = []
+
+        async def take(name):
+            await bucket.acquire()
+            done.append((name, time.monotonic() - started))
+
+        await asyncio.gather(*(take(name) for name in "abc"))
+        return done
+
+    done = asyncio.run(main())
+    assert [name for name, _ in done] == ["a", "b", "c"]
+    # a is immediate, b and c wait 0.05s and 0.1s for their reserved tokens
+    assert done[0][1] < 0.03
+    assert 0.04 < done[2][1] < 0.2
+
+
+def test_token_bucket_refunds_a_cancelled_waiter():
+    async def main():
+        bucket = TokenBucket(rate=10, capacity=1)
+        await bucket.acquire()
+        waiter = asyncio.ensure_future(bucket.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        started = time.monotonic()
+        await bucket.acquire()
+        return time.monotonic() - started
+
+    # without the refund the next caller would also wait for the cancelled reservation (~0.2s)
+    assert asyncio.run(main()) < 0.15
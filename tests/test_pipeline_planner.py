@@ -0,0 +1,26 @@
+from bpmn_graph import BPMNGraph
+from corrector_strategy import STRATEGY_FAST_THEN_UPGRADE, STRATEGY_RACE, STRATEGY_SINGLE
+from pipeline_planner import plan_pipeline
+
+CONFIGS = {"checker": "m-check", "text_checker": "m-text", "corrector": "m-strong", "fast_corrector": "m-fast"}
+
+
+def _small_graph():
+    graph = BPMNGraph.from_dot("digraph { a -> b -> c }")
+    return graph, graph.to_compact_dot()
+
+
+def test_plan_keeps_requested_models_and_strategy_by_default():
+    graph, dot = _small_graph()
+    plan = plan_pipeline(graph, dot, CONFIGS, STRATEGY_FAST_THEN_UPGRADE)
+    assert plan.agent_configs == CONFIGS
+    assert plan.corrector_strategy == STRATEGY_FAST_THEN_UPGRADE
+    assert plan_pipeline(graph, dot, CONFIGS, None).corrector_strategy == STRATEGY_RACE
+
+
+def test_adaptive_small_graph_keeps_an_explicit_strategy():
+    graph, dot = _small_graph()
+    plan = plan_pipeline(graph, dot, CONFIGS, STRATEGY_RACE, adaptive=True)
+    assert set(plan.agent_configs.values()) == {"m-fast"}
+    assert plan.corrector_strategy == STRATEGY_RACE
+    assert plan_pipeline(graph, dot, CONFIGS, None, adaptive=True).corrector_strategy == STRATEGY_SINGLE
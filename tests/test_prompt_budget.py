@@ -0,0 +1,32 @@
+from prompt_budget import (FIT_REGION, FIT_SKIPPED, PROMPT_TEMPLATE_TOKENS, budget_adjustments_scope,
+                           correction_fits, max_nodes_for_budget, record_adjustment, region_nodes,
+                           text_check_nodes)
+
+
+def test_max_nodes_for_budget_scales_with_available_tokens():
+    assert max_nodes_for_budget(1000, 100, 0) == 0
+    assert max_nodes_for_budget(1000, 100, -5) == 0
+    assert max_nodes_for_budget(1000, 100, 500) == 35
+    assert max_nodes_for_budget(1000, 100, 5) == 1
+
+
+def test_text_check_nodes_full_sharded_or_skipped():
+    template = PROMPT_TEMPLATE_TOKENS
+    assert text_check_nodes(template + 1100, 1000, 100, 100) == 100
+    assert 0 < text_check_nodes(template + 600, 1000, 100, 100) < 100
+    assert text_check_nodes(template + 100, 1000, 100, 100) == 0
+
+
+def test_correction_needs_room_for_the_prompt_and_the_corrected_dot():
+    assert correction_fits(PROMPT_TEMPLATE_TOKENS + 1200, 2000, 1000, 200)
+    assert not correction_fits(PROMPT_TEMPLATE_TOKENS + 1000, 2000, 1000, 200)
+    assert not correction_fits(PROMPT_TEMPLATE_TOKENS + 5000, 500, 1000, 200)
+    assert region_nodes(PROMPT_TEMPLATE_TOKENS + 5000, 500, 1000, 100, 200) == 35
+
+
+def test_adjustments_are_collected_only_inside_a_scope():
+    record_adjustment("correction", FIT_REGION, "outside")
+    with budget_adjustments_scope() as adjustments:
+        record_adjustment("check", FIT_SKIPPED, "too large")
+    record_adjustment("check", FIT_REGION, "after")
+    assert adjustments == [{"stage": "check", "fit": FIT_SKIPPED, "detail": "too large"}]
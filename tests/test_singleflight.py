@@ -0,0 +1,116 @@
+import asyncio
+
+import pytest
+
+from backend.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    async def main():
+        flight = SingleFlight()
+        calls = []
+
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"ok": True}
+
+        results = await asyncio.gather(*(flight.run("k", work) for _ in range(5)))
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert flight.stats() == {"inflight": 0, "started": 1, "coalesced": 4}
+
+
+def test_different_keys_run_separately():
+    async def main():
+        flight = SingleFlight()
+
+        async def work(value):
+            await asyncio.sleep(0.01)
+            return value
+
+        return await asyncio.gather(flight.run("a", lambda: work(1)), flight.run("b", lambda: work(2))), flight
+
+    results, flight = asyncio.run(main())
+    assert results == [1, 2] and flight.started == 2
+
+
+def test_key_is_released_after_completion():
+    async def main():
+        flight = SingleFlight()
+        counter = []
+
+        async def work():
+            counter.append(1)
+            return len(counter)
+
+        first = await flight.run("k", work)
+        second = await flight.run("k", work)
+        return first, second, len(flight)
+
+    assert asyncio.run(main()) == (1, 2, 0)
+
+
+def test_exception_is_shared_and_key_released():
+    async def main():
+        coalesced = []
+        flight = SingleFlight(on_coalesced=lambda: coalesced.append(1))
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(*(flight.run("k", fail) for _ in range(3)), return_exceptions=True)
+        return results, coalesced, len(flight)
+
+    results, coalesced, inflight = asyncio.run(main())
+    assert all(isinstance(r, ValueError) for r in results)
+    assert len(coalesced) == 2 and inflight == 0
+
+
+def test_cancelling_one_waiter_does_not_cancel_shared_task():
+    async def main():
+        flight = SingleFlight()
+        finished = []
+
+        async def work():
+            await asyncio.sleep(0.05)
+            finished.append(1)
+            return "done"
+
+        first = asyncio.create_task(flight.run("k", work))
+        second = asyncio.create_task(flight.run("k", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await second, finished
+
+    assert asyncio.run(main()) == ("done", [1])
+
+
+def test_unawaited_failure_does_not_warn():
+    async def main():
+        flight = SingleFlight()
+
+        async def fail():
+            await asyncio.sleep(0.02)
+            raise RuntimeError("lost")
+
+        waiter = asyncio.create_task(flight.run("k", fail))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0.05)
+        return len(flight)
+
+    errors = []
+    loop = asyncio.new_event_loop()
+    loop.set_exception_handler(lambda _, context: errors.append(context))
+    try:
+        assert loop.run_until_complete(main()) == 0
+    finally:
+        loop.close()
+    assert errors == []
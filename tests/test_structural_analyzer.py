@@ -0,0 +1,101 @@
+from structural_analyzer import analyze_structure
+
+
+def _types(dot):
+    return sorted(e.error_type for e in analyze_structure(dot))
+
+
+def test_linear_flow_has_no_findings():
+    assert analyze_structure('digraph G { start -> a -> b -> end }') == []
+
+
+def test_orphan_node():
+    errors = analyze_structure('digraph G { start -> a -> end; lonely }')
+    assert [(e.error_type, e.element_id) for e in errors] == [("Orphaned node", "lonely")]
+
+
+def test_single_node_is_not_orphan():
+    assert analyze_structure('digraph G { start }') == []
+
+
+def test_unreachable_node_with_edges():
+    errors = analyze_structure('digraph G { start -> a -> end; x -> y; y -> end }')
+    assert {e.element_id for e in errors if e.error_type == "Unreachable path"} == {"x", "y"}
+
+
+def test_cycle_with_exit():
+    errors = analyze_structure('digraph G { start -> a -> b -> a; b -> end }')
+    cycles = [e for e in errors if e.error_type == "Circular dependency"]
+    assert len(cycles) == 1
+    assert "退出条件" in cycles[0].description
+
+
+def test_cycle_without_exit():
+    errors = analyze_structure('digraph G { start -> a -> b -> c -> a; start -> end }')
+    cycles = [e for e in errors if e.error_type == "Circular dependency"]
+    assert len(cycles) == 1
+    assert "没有出口" in cycles[0].description
+
+
+def test_self_loop_is_a_cycle():
+    assert "Circular dependency" in _types('digraph G { start -> a -> a; a -> end }')
+
+
+def test_separate_cycles_are_reported_separately():
+    dot = 'digraph G { start -> a -> b -> a; b -> c -> d -> c; d -> end }'
+    assert _types(dot).count("Circular dependency") == 2
+
+
+def test_deep_chain_does_not_recurse():
+    chain = " -> ".join(f"n{i}" for i in range(5000))
+    assert analyze_structure(f'digraph G {{ start -> {chain} -> end }}') == []
+
+
+def _parallel(body):
+    return ('digraph G { start; split [label="parallel split", shape=diamond]; '
+            'join [label="parallel join", shape=diamond]; join2 [label="parallel join 2", shape=diamond]; '
+            + body + ' }')
+
+
+def test_parallel_split_and_join_match():
+    dot = _parallel('start -> split; split -> a; split -> b; a -> join; b -> join; join -> end')
+    assert "Parallel gateway mismatch" not in _types(dot)
+
+
+def test_parallel_branch_not_merged():
+    dot = _parallel('start -> split; split -> a; split -> b; a -> join; c -> join; b -> end; join -> end')
+    errors = [e for e in analyze_structure(dot) if e.error_type == "Parallel gateway mismatch"]
+    assert len(errors) == 1 and "没有汇聚" in errors[0].description
+
+
+def test_parallel_branches_merge_into_different_joins():
+    dot = _parallel('start -> split; split -> a; split -> b; a -> join; x -> join; '
+                    'b -> join2; y -> join2; join -> end; join2 -> end')
+    errors = [e for e in analyze_structure(dot) if e.error_type == "Parallel gateway mismatch"]
+    assert len(errors) == 1 and "不同的网关" in errors[0].description
+
+
+def test_parallel_join_has_extra_inputs():
+    dot = _parallel('start -> split; split -> a; split -> b; a -> join; b -> join; c -> join; join -> end')
+    errors = [e for e in analyze_structure(dot) if e.error_type == "Parallel gateway mismatch"]
+    assert len(errors) == 1 and "2 个分支" in errors[0].description
+
+
+def test_invalid_dot_returns_no_findings():
+    assert analyze_structure("") == []
+
+
+def test_nested_parallel_gateways_match():
+    dot = ('digraph G { start; '
+           'split_a [label="parallel split A", shape=diamond]; join_a [label="parallel join A", shape=diamond]; '
+           'split_c [label="parallel split C", shape=diamond]; join_c [label="parallel join C", shape=diamond]; '
+           'start -> split_a; split_a -> b; split_a -> split_c; split_c -> d; split_c -> e; '
+           'd -> join_c; e -> join_c; b -> join_a; join_c -> join_a; join_a -> end }')
+    assert "Parallel gateway mismatch" not in _types(dot)
+
+
+def test_chinese_parallel_gateway_label():
+    dot = ('digraph G { 开始; split [label="并行网关", shape=diamond]; join [label="并行汇聚", shape=diamond]; '
+           '开始 -> split; split -> a; split -> b; a -> join; b -> 结束; join -> 结束 }')
+    errors = [e for e in analyze_structure(dot) if e.error_type == "Parallel gateway mismatch"]
+    assert len(errors) == 1 and "没有汇聚" in errors[0].description
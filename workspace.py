@@ -0,0 +1,93 @@
+import logging
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from artifact_store import ArtifactStore, get_artifact_store
+
+logger = logging.getLogger(__name__)
+
+# 工作区配置（可通过环境变量覆盖）
+# 每次分析的临时目录位于 WORKSPACE_ROOT/<run_id>，只属于本进程的这次分析
+WORKSPACE_ROOT = Path(os.getenv("WORKSPACE_ROOT", str(Path(tempfile.gettempdir()) / "bpmn_workspaces")))
+# 从产物存储取回的上传文件按内容哈希命名，同一主机上的各worker共用
+INPUT_CACHE_DIR = WORKSPACE_ROOT / "inputs"
+
+UPLOAD_ARTIFACT_PREFIX = "upload_"
+# 上传接口保存的文件名：sha256 + 可选的扩展名（见 backend/uploads.py）
+_UPLOAD_NAME_RE = re.compile(r'^[0-9a-f]{64}(?:\.[A-Za-z0-9]{1,10})?$')
+
+
+def upload_artifact_name(filename: str) -> str:
+    return f"{UPLOAD_ARTIFACT_PREFIX}{filename}"
+
+
+def input_available(path: str, store: Optional[ArtifactStore] = None) -> bool:
+    """流程图在本机存在，或是已发布到产物存储的上传文件"""
+    if Path(path).is_file():
+        return True
+    name = Path(path).name
+    return bool(_UPLOAD_NAME_RE.match(name)) and (store or get_artifact_store()).exists(upload_artifact_name(name))
+
+
+def resolve_input(path: str, store: Optional[ArtifactStore] = None) -> str:
+    """
+    返回可在本机读取的流程图路径。
+    本机存在的文件直接使用；上传到其他worker/主机的文件按文件名从产物存储取回，
+    放入本机的输入缓存（按内容哈希命名，取回一次后各次分析共用）。
+    """
+    if Path(path).is_file():
+        return path
+    name = Path(path).name
+    if not _UPLOAD_NAME_RE.match(name):
+        raise FileNotFoundError(path)
+    cached = INPUT_CACHE_DIR / name
+    if cached.is_file():
+        return str(cached)
+    data = (store or get_artifact_store()).get(upload_artifact_name(name))
+    if data is None:
+        raise FileNotFoundError(path)
+    INPUT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = cached.with_name(f".{name}.{uuid.uuid4().hex}.tmp")
+    tmp_path.write_bytes(data)
+    os.replace(tmp_path, cached)
+    return str(cached)
+
+
+class RunWorkspace:
+    """
+    一次分析的工作区：run_id、只属于本次运行的临时目录，以及存放SVG/报告等产物的存储。
+    临时目录在首次使用时创建，cleanup 后删除；产物存储由所有worker共用。
+    """
+
+    def __init__(self, run_id: Optional[str] = None, root: Path = WORKSPACE_ROOT,
+                 artifacts: Optional[ArtifactStore] = None):
+        self.run_id = run_id or uuid.uuid4().hex
+        self.scratch_dir = Path(root) / self.run_id
+        self.artifacts = artifacts or get_artifact_store()
+
+    def scratch(self, name: str = "") -> Path:
+        """临时目录（或其中的文件路径）"""
+        self.scratch_dir.mkdir(parents=True, exist_ok=True)
+        return self.scratch_dir / name if name else self.scratch_dir
+
+    def resolve_input(self, path: str) -> str:
+        return resolve_input(path, self.artifacts)
+
+    def cleanup(self):
+        try:
+            shutil.rmtree(self.scratch_dir, ignore_errors=False)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(f"清理工作区失败: {str(e)}")
+
+    def __enter__(self) -> "RunWorkspace":
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()